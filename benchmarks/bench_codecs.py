@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+"""
+Compares the serialization codecs available to DCCs on the payloads they actually publish: an IoTCC add_stats
+message and an AWS IoT metric payload with enclosed metadata, each carrying a batch of samples.  Codecs whose
+package is not installed are reported as such.
+
+    python benchmarks/bench_codecs.py [samples_per_message] [iterations]
+"""
+
+import json
+import sys
+import time
+
+from bench_env import setup_liota_conf, cleanup, timed, report
+
+
+def iotcc_add_stats(samples):
+    now = int(time.time() * 1000)
+    return {
+        "type": "add_stats",
+        "version": 20171118,
+        "body": {
+            "kind": "SimulatedDevice",
+            "id": "0c3a5b8e-8c5e-5f51-9a4c-6bd2a0f3e7d1",
+            "name": "Device-Thermostat-01",
+            "metric_data": [{
+                "statKey": "room_temperature",
+                "timestamps": [now + i * 5000 for i in range(samples)],
+                "data": [21.0 + (i % 40) * 0.125 for i in range(samples)]
+            }],
+        }
+    }
+
+
+def aws_payload(samples):
+    now = int(time.time() * 1000)
+    return {
+        "edge_system_name": "EdgeSystem-Gateway-01",
+        "device_name": "Device-Thermostat-01",
+        "metric_name": "room_temperature",
+        "metric_data": [{"value": 21.0 + (i % 40) * 0.125, "timestamp": now + i * 5000} for i in range(samples)],
+        "unit": "degC"
+    }
+
+
+def main(samples=10, iterations=20000):
+    work_dir = setup_liota_conf()
+    try:
+        from liota.lib.utilities.serialization import get_codec
+
+        rows = [("payload", "codec", "bytes", "encode(us)", "decode(us)")]
+        for payload_name, payload in (("iotcc add_stats", iotcc_add_stats(samples)),
+                                      ("aws metric", aws_payload(samples))):
+            for name in ("json", "fast_json", "msgpack", "cbor"):
+                try:
+                    codec = get_codec(name)
+                except ValueError:
+                    rows.append((payload_name, name, "not installed", "-", "-"))
+                    continue
+                if name == "fast_json" and codec._backend is json:
+                    name = "fast_json (stdlib fallback)"
+                message = codec.encode(payload)
+                encode_elapsed, _ = timed(lambda: [codec.encode(payload) for _ in xrange(iterations)])
+                decode_elapsed, _ = timed(lambda: [codec.decode(message) for _ in xrange(iterations)])
+                rows.append((payload_name, name, len(message), "%.1f" % (encode_elapsed / iterations * 1e6),
+                             "%.1f" % (decode_elapsed / iterations * 1e6)))
+        report("Codec cost per message (%d samples per message)" % samples, rows)
+    finally:
+        cleanup(work_dir)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
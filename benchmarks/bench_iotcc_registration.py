@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+"""
+Compares sequential IoTCC onboarding (register + set_properties per device, one blocking round trip at a time)
+with the pipelined register_many/set_properties_many helpers, against the in-process fake IoTCC server. The
+"warm restart" row repeats the sequential onboarding in a new IotControlCenter sharing the registration cache.
+
+    python benchmarks/bench_iotcc_registration.py [num_devices] [rtt_ms]
+"""
+
+import sys
+
+from bench_env import setup_liota_conf, cleanup, timed, report
+
+
+def main(num_devices=500, rtt_ms=5.0):
+    work_dir = setup_liota_conf()
+    try:
+        from tests.fake_iotcc import FakeIotccComms
+        from liota.dccs.iotcc import IotControlCenter
+        from liota.entities.devices.simulated_device import SimulatedDevice
+
+        rows = [("mode", "devices", "rtt(ms)", "seconds", "devices/s", "max in flight")]
+        for mode in ("sequential", "pipelined", "warm restart"):
+            comms = FakeIotccComms(rtt=rtt_ms / 1000.0)
+            iotcc = IotControlCenter(comms)
+            # The warm restart onboards the devices of the sequential run again
+            prefix = "sequential" if mode == "warm restart" else mode
+            devices = [SimulatedDevice("%s-device-%d" % (prefix, i), "BenchDevice") for i in range(num_devices)]
+
+            if mode != "pipelined":
+                def onboard():
+                    for device in devices:
+                        reg_device = iotcc.register(device)
+                        iotcc.set_properties(reg_device, {"location": "bench"})
+            else:
+                def onboard():
+                    reg_devices = iotcc.register_many(devices)
+                    iotcc.set_properties_many([(reg_device, {"location": "bench"}) for reg_device in reg_devices])
+
+            elapsed, _ = timed(onboard)
+            rows.append((mode, num_devices, rtt_ms, "%.2f" % elapsed, "%.0f" % (num_devices / elapsed),
+                         comms.max_outstanding))
+        report("IoTCC onboarding (register + set_properties per device)", rows)
+    finally:
+        cleanup(work_dir)
+
+
+if __name__ == "__main__":
+    main(*[float(arg) if i else int(arg) for i, arg in enumerate(sys.argv[1:])])
@@ -0,0 +1,104 @@
+"""
+Measures gateway startup: the time to connect several Mqtt transports, as a gateway does for its DCC and discovery
+connections, to a local broker stand-in which delays each CONNACK like a remote broker would.  Connections are made
+one after the other and in parallel with call_in_parallel(), over TCP and TLS, with the shared SSLContext cache
+cleared before every connection (every transport builds its own context) and kept warm.
+
+The TLS rows need the openssl command line tool to create a self-signed certificate.
+
+    python benchmarks/bench_mqtt_connect.py [connections] [connack_delay_ms]
+"""
+
+import os
+import subprocess
+import sys
+import types
+
+from bench_env import setup_liota_conf, cleanup, timed, report
+from tests.fake_mqtt_broker import FakeMqttBroker
+
+
+def create_certificate(work_dir):
+    cert = os.path.join(work_dir, "broker.pem")
+    key = os.path.join(work_dir, "broker.key")
+    try:
+        with open(os.devnull, "w") as devnull:
+            subprocess.check_call(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                                   "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                                   "-keyout", key, "-out", cert], stdout=devnull, stderr=devnull)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return cert, key
+
+
+def main(connections=8, connack_delay_ms=50):
+    work_dir = setup_liota_conf()
+    try:
+        from liota.lib.transports import mqtt
+        from liota.lib.utilities.future import call_in_parallel
+        from liota.lib.utilities.identity import Identity
+        from liota.lib.utilities.tls_conf import TLSConf
+
+        cert, key = create_certificate(work_dir)
+        plain_broker = FakeMqttBroker(connack_delay=connack_delay_ms / 1000.0)
+        tls_broker = FakeMqttBroker(connack_delay=connack_delay_ms / 1000.0, certfile=cert, keyfile=key) \
+            if cert else None
+        counter = [0]
+
+        def connect(broker, tls, cached):
+            def create():
+                if tls and not cached:
+                    getattr(mqtt, "_ssl_contexts", {}).clear()
+                counter[0] += 1
+                return mqtt.Mqtt("127.0.0.1", broker.port,
+                                 identity=Identity(cert, None, None, None, None) if tls else None,
+                                 tls_conf=TLSConf("CERT_REQUIRED", None, None) if tls else None,
+                                 client_id="bench-%d" % counter[0], clean_session=True)
+            return create
+
+        def run(broker, tls, cached, parallel):
+            factories = [connect(broker, tls, cached) for _ in range(connections)]
+            if parallel:
+                clients = [future.result() for future in call_in_parallel(factories)]
+            else:
+                clients = [create() for create in factories]
+            return clients
+
+        rows = [("transport", "SSLContext", "connect", "elapsed(ms)", "mean CONNACK wait(ms)")]
+        cases = [("tcp", False, True, False), ("tcp", False, True, True)]
+        if tls_broker is not None:
+            cases += [("tls", True, False, False), ("tls", True, True, False), ("tls", True, True, True)]
+        for name, tls, cached, parallel in cases:
+            if tls and cached:
+                # Warm the cache
+                run(tls_broker, tls, cached, False)
+            elapsed, clients = timed(run, tls_broker if tls else plain_broker, tls, cached, parallel)
+            waits = [client.connect_time for client in clients if getattr(client, "connect_time", None)]
+            rows.append((name, "-" if not tls else "cached" if cached else "per connection",
+                         "parallel" if parallel else "sequential", "%.0f" % (elapsed * 1000),
+                         "%.1f" % (sum(waits) / len(waits) * 1000) if waits else "n/a"))
+            for client in clients:
+                client.disconnect()
+        if tls_broker is None:
+            rows.append(("tls", "-", "-", "openssl not found", "-"))
+        report("Connecting %d Mqtt transports, CONNACK delayed by %d ms" % (connections, connack_delay_ms), rows)
+
+        if hasattr(mqtt.Mqtt, "_get_ssl_context"):
+            rows = [("CA certificates", "cold(ms)", "cached(ms)")]
+            for name, root_ca_cert in (("self-signed file", cert), ("system bundle", None)):
+                if name == "self-signed file" and cert is None:
+                    continue
+                transport = types.InstanceType(mqtt.Mqtt)
+                transport.identity = Identity(root_ca_cert, None, None, None, None)
+                transport.tls_conf = TLSConf("CERT_REQUIRED", None, None)
+                mqtt._ssl_contexts.clear()
+                cold, _ = timed(transport._get_ssl_context)
+                cached, _ = timed(transport._get_ssl_context)
+                rows.append((name, "%.2f" % (cold * 1000), "%.2f" % (cached * 1000)))
+            report("SSLContext per Mqtt transport", rows)
+    finally:
+        cleanup(work_dir)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,65 @@
+"""
+Measures publish throughput of MqttDccComms with one and several connections against a local broker stand-in
+(tests/fake_mqtt_broker.py), which runs in its own process so it does not compete for the interpreter lock.  Messages are published with send_async() over a number of topics, and the run ends when the
+broker acknowledged all of them.
+
+    python benchmarks/bench_mqtt_sharding.py [messages] [topics] [max_connections] [qos]
+"""
+
+import multiprocessing
+import sys
+
+from bench_env import setup_liota_conf, cleanup, timed, report
+from tests.fake_mqtt_broker import FakeMqttBroker
+
+
+def _serve(conn):
+    broker = FakeMqttBroker()
+    conn.send(broker.port)
+    while conn.recv() == "publishes":
+        conn.send(broker.publishes)
+
+
+def main(messages=20000, topics=16, max_connections=4, qos=1):
+    work_dir = setup_liota_conf()
+    try:
+        from liota.dcc_comms.mqtt_dcc_comms import MqttDccComms
+        from liota.lib.transports.mqtt import MqttMessagingAttributes
+        from liota.lib.utilities.future import wait_all
+
+        conn, broker_conn = multiprocessing.Pipe()
+        broker = multiprocessing.Process(target=_serve, args=(broker_conn,))
+        broker.daemon = True
+        broker.start()
+        port = conn.recv()
+
+        def broker_publishes():
+            conn.send("publishes")
+            return conn.recv()
+        msg_attrs = [MqttMessagingAttributes(pub_topic="liota/bench/metric%d" % i, pub_qos=qos)
+                     for i in range(topics)]
+        payload = '{"metric_data": [{"value": 21.5, "timestamp": 1500000000000}]}'
+
+        def run(comms):
+            futures = [comms.send_async(payload, msg_attrs[i % topics]) for i in xrange(messages)]
+            wait_all(futures, 60)
+
+        rows = [("connections", "elapsed(s)", "messages/s", "received by broker")]
+        connections = 1
+        while connections <= max_connections:
+            comms = MqttDccComms("EdgeSystem-Bench", "127.0.0.1", port, client_id="bench",
+                                 clean_session=True, connections=connections)
+            received = broker_publishes()
+            elapsed, _ = timed(run, comms)
+            rows.append((connections, "%.2f" % elapsed, "%.0f" % (messages / elapsed), broker_publishes() - received))
+            comms._disconnect()
+            connections *= 2
+        conn.send("stop")
+        report("MqttDccComms publish throughput, QoS %d, %d topics, %d CPUs" % (
+            qos, topics, multiprocessing.cpu_count()), rows)
+    finally:
+        cleanup(work_dir)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
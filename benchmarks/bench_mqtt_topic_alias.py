@@ -0,0 +1,60 @@
+"""
+Measures the bytes an Mqtt transport puts on the wire per PUBLISH with a topic per metric, as in
+examples/mqtt/dcc_comms/aws_iot/simulated_home_topic_per_metric.py: MQTTv311, MQTTv5 without topic aliases and MQTTv5
+with the aliases offered by a local broker stand-in (tests/fake_mqtt_broker.py).  The broker drops any connection using an
+alias it was never told about, so the run also checks that every message arrived.  Aliases are only used for QoS 0
+messages, so with qos 1 or 2 both MQTTv5 rows are the same size.
+
+MQTTv5 needs paho-mqtt 1.5 or newer; with an older paho only the MQTTv311 row is measured.
+
+    python benchmarks/bench_mqtt_topic_alias.py [messages] [topics] [topic_alias_maximum] [qos]
+"""
+
+import sys
+
+from bench_env import setup_liota_conf, cleanup, timed, report
+from tests.fake_mqtt_broker import FakeMqttBroker
+
+
+def main(messages=20000, topics=16, topic_alias_maximum=10, qos=0):
+    work_dir = setup_liota_conf()
+    try:
+        from liota.lib.transports import mqtt
+        from liota.lib.utilities.future import wait_all
+
+        broker = FakeMqttBroker(topic_alias_maximum=topic_alias_maximum)
+        metric_topics = ["home/living-room/edge-system-%s/device-thermostat-%d/metric-temperature-celsius" % (
+            "6f1e2d3c-4b5a-4987-8a7b-6c5d4e3f2a1b", i) for i in range(topics)]
+        payload = '{"value": 21.5, "timestamp": 1500000000000}'
+
+        def run(client):
+            futures = [client.publish_async(metric_topics[i % topics], payload, qos, timeout=None) for i in xrange(messages)]
+            wait_all(futures, 60)
+
+        variants = [("MQTTv311", "MQTTv311", {})]
+        if mqtt.Properties is None:
+            print "paho-mqtt before 1.5 has no MQTTv5, only MQTTv311 is measured"
+        else:
+            variants += [("MQTTv5", "MQTTv5", {"topic_aliases": False}),
+                         ("MQTTv5 + aliases", "MQTTv5", {"topic_aliases": True})]
+
+        rows = [("protocol", "elapsed(s)", "messages/s", "received", "bytes/message", "alias errors")]
+        for i, (name, protocol, options) in enumerate(variants):
+            client = mqtt.Mqtt("127.0.0.1", broker.port, client_id="bench-%d" % i, clean_session=True,
+                               protocol=protocol, **options)
+            publishes, publish_bytes = broker.publishes, broker.publish_bytes
+            elapsed, _ = timed(run, client)
+            received = broker.publishes - publishes
+            rows.append((name, "%.2f" % elapsed, "%.0f" % (messages / elapsed), received,
+                         "%.1f" % (float(broker.publish_bytes - publish_bytes) / max(received, 1)),
+                         broker.alias_errors))
+            client.disconnect()
+        broker.close()
+        report("Mqtt PUBLISH size, QoS %d, %d topics of %d bytes, %d byte payload, broker allows %d aliases" % (
+            qos, topics, len(metric_topics[0]), len(payload), topic_alias_maximum), rows)
+    finally:
+        cleanup(work_dir)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
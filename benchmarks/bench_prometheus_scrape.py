@@ -0,0 +1,83 @@
+"""
+Measures the cost of publishing to the Prometheus DCC and of scraping PrometheusDccComms with 100k series: a
+scrape after every series changed, after a fraction of them changed and after none changed, compared with
+formatting every series from scratch on each scrape.
+
+    python benchmarks/bench_prometheus_scrape.py [devices] [metrics_per_device] [changed_percent]
+"""
+
+import random
+import sys
+import time
+
+from bench_env import setup_liota_conf, cleanup, timed, report
+
+
+def main(devices=1000, metrics_per_device=100, changed_percent=1):
+    work_dir = setup_liota_conf()
+    try:
+        from liota.dccs.prometheus import Prometheus, _format_sample_value
+        from liota.dcc_comms.prometheus_dcc_comms import PrometheusDccComms
+        from liota.entities.devices.simulated_device import SimulatedDevice
+        from liota.entities.edge_systems.simulated_edge_system import SimulatedEdgeSystem
+        from liota.entities.metrics.metric import Metric
+
+        comms = PrometheusDccComms(0, host="127.0.0.1")
+        prometheus = Prometheus(comms)
+        reg_edge_system = prometheus.register(SimulatedEdgeSystem("EdgeSystem-1"))
+        reg_metrics = []
+        for d in range(devices):
+            reg_device = prometheus.register(SimulatedDevice("Device-%d" % d))
+            prometheus.create_relationship(reg_edge_system, reg_device)
+            for m in range(metrics_per_device):
+                reg_metric = prometheus.register(Metric(name="metric_%d" % m, interval=5,
+                                                        sampling_function=lambda: 1))
+                prometheus.create_relationship(reg_device, reg_metric)
+                reg_metrics.append(reg_metric)
+
+        def publish(metrics):
+            now = int(time.time() * 1000)
+            for reg_metric in metrics:
+                reg_metric.values.put((now, random.random()))
+                prometheus.publish(reg_metric)
+
+        series = len(reg_metrics)
+        changed = reg_metrics[:series * changed_percent / 100]
+        rows = [("step", "series", "elapsed(ms)", "body bytes")]
+        elapsed, _ = timed(publish, reg_metrics)
+        rows.append(("first publish", series, "%.1f" % (elapsed * 1e3), "-"))
+        elapsed, body = timed(comms.render)
+        rows.append(("scrape, all changed", series, "%.1f" % (elapsed * 1e3), len(body)))
+        elapsed, body = timed(comms.render)
+        rows.append(("scrape, none changed", series, "%.1f" % (elapsed * 1e3), len(body)))
+        elapsed, body = timed(comms.render, True)
+        rows.append(("scrape, none changed, gzip", series, "%.1f" % (elapsed * 1e3), len(body)))
+        elapsed, body = timed(comms.render, True)
+        rows.append(("scrape, none changed, gzip cached", series, "%.1f" % (elapsed * 1e3), len(body)))
+        elapsed, _ = timed(publish, changed)
+        rows.append(("publish", len(changed), "%.1f" % (elapsed * 1e3), "-"))
+        elapsed, body = timed(comms.render)
+        rows.append(("scrape, %d%% changed" % changed_percent, series, "%.1f" % (elapsed * 1e3), len(body)))
+
+        # What an exporter formatting every series on each scrape would spend
+        samples = [(prometheus._series[reg_metric][1], prometheus._series[reg_metric][2], random.random(),
+                    int(time.time() * 1000)) for reg_metric in reg_metrics]
+
+        def render_from_scratch():
+            families = {}
+            for family, labels, value, ts in samples:
+                families.setdefault(family, []).append(
+                    "%s{%s} %s %d\n" % (family, labels, _format_sample_value(value), ts))
+            return "".join("# TYPE %s gauge\n%s" % (family, "".join(lines))
+                           for family, lines in families.iteritems())
+
+        elapsed, body = timed(render_from_scratch)
+        rows.append(("scrape, formatted from scratch", series, "%.1f" % (elapsed * 1e3), len(body)))
+        report("Prometheus exposition of %d series" % series, rows)
+        comms._disconnect()
+    finally:
+        cleanup(work_dir)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
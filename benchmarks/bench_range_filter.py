@@ -0,0 +1,59 @@
+"""
+Measures the throughput of RangeFilter on a stream of temperature samples: filter() called once per sample, as a
+sampling function does, and filter_many() on the whole batch, in pure Python and with NumPy for a list and for a
+NumPy array.  The NumPy rows are skipped if NumPy is not installed.
+
+    python benchmarks/bench_range_filter.py [samples] [iterations]
+"""
+
+import math
+import sys
+
+from bench_env import setup_liota_conf, cleanup, timed, report
+
+
+def main(samples=100000, iterations=10):
+    work_dir = setup_liota_conf()
+    try:
+        from liota.lib.utilities.filters import range_filter
+        from liota.lib.utilities.filters.range_filter import RangeFilter, Type
+
+        values = [21.0 + 5.0 * math.sin(i / 50.0) for i in xrange(samples)]
+        closed = RangeFilter(Type.CLOSED, 18.0, 24.0)
+
+        def single():
+            passed = 0
+            for _ in xrange(iterations):
+                passed = 0
+                for v in values:
+                    if closed.filter(v) is not None:
+                        passed += 1
+            return passed
+
+        def batch(batch_values):
+            passed = None
+            for _ in xrange(iterations):
+                passed = closed.filter_many(batch_values)
+            return len(passed)
+
+        numpy = range_filter.numpy
+        runs = [("filter() per sample", single, ()), ("filter_many(list), Python", batch, (values,))]
+        if numpy is not None:
+            runs += [("filter_many(list), NumPy", batch, (values,)),
+                     ("filter_many(ndarray), NumPy", batch, (numpy.array(values),))]
+        else:
+            print "NumPy is not installed, only the Python rows are measured"
+
+        rows = [("method", "elapsed(s)", "samples/s", "passed")]
+        for name, fn, args in runs:
+            range_filter.numpy = numpy if "NumPy" in name else None
+            elapsed, passed = timed(fn, *args)
+            rows.append((name, "%.3f" % elapsed, "%.0f" % (samples * iterations / elapsed), passed))
+        range_filter.numpy = numpy
+        report("RangeFilter CLOSED, %d samples x %d iterations" % (samples, iterations), rows)
+    finally:
+        cleanup(work_dir)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,101 @@
+"""
+Measures Graphite plaintext throughput of SocketDccComms and SocketPoolDccComms with growing pool sizes against a
+local TCP sink.  Like carbon, the sink has one reader per connection that parses every line; each reader runs in its
+own process, so readers of different connections work in parallel.  Several publisher threads send single-line
+messages of distinct series, as the metric handler's workers do.
+
+    python benchmarks/bench_socket_pool.py [messages] [publisher_threads] [max_pool_size]
+"""
+
+import multiprocessing
+import socket
+import sys
+import threading
+import time
+
+from bench_env import setup_liota_conf, cleanup, timed, report
+
+
+def _read(conn, received):
+    pending = ""
+    while True:
+        data = conn.recv(65536)
+        if not data:
+            break
+        lines = (pending + data).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            path, value, ts = line.split(" ")
+            float(value)
+            int(ts)
+        with received.get_lock():
+            received.value += len(lines)
+
+
+def _sink(server, received):
+    while True:
+        conn, _ = server.accept()
+        reader = multiprocessing.Process(target=_read, args=(conn, received))
+        reader.daemon = True
+        reader.start()
+        conn.close()
+
+
+def main(messages=200000, publisher_threads=4, max_pool_size=8):
+    work_dir = setup_liota_conf()
+    sink = None
+    try:
+        from liota.dcc_comms.socket_comms import SocketDccComms, SocketPoolDccComms
+
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen(64)
+        port = server.getsockname()[1]
+        received = multiprocessing.Value("l", 0)
+        # Not a daemon, daemonic processes can't start the readers
+        sink = multiprocessing.Process(target=_sink, args=(server, received))
+        sink.start()
+
+        now = int(time.time())
+        per_thread = messages / publisher_threads
+        batches = [["bench.thread%d.series%d %d.5 %d\n" % (t, i % 1000, i, now) for i in range(per_thread)]
+                   for t in range(publisher_threads)]
+
+        def run(comms):
+            expected = received.value + per_thread * publisher_threads
+
+            def publish(batch):
+                for message in batch:
+                    comms.send(message)
+            threads = [threading.Thread(target=publish, args=(batch,)) for batch in batches]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            while received.value < expected:
+                time.sleep(0.001)
+
+        rows = [("comms", "connections", "elapsed(s)", "messages/s")]
+        pool_sizes = [1]
+        while pool_sizes[-1] * 2 <= max_pool_size:
+            pool_sizes.append(pool_sizes[-1] * 2)
+        for pool_size in [None] + pool_sizes:
+            if pool_size is None:
+                comms = SocketDccComms("127.0.0.1", port)
+                name, connections = "SocketDccComms", 1
+            else:
+                comms = SocketPoolDccComms("127.0.0.1", port, pool_size=pool_size)
+                name, connections = "SocketPoolDccComms", pool_size
+            elapsed, _ = timed(run, comms)
+            rows.append((name, connections, "%.2f" % elapsed, "%.0f" % (per_thread * publisher_threads / elapsed)))
+            comms._disconnect()
+        report("Graphite plaintext throughput, %d publisher threads on %d CPUs" % (
+            publisher_threads, multiprocessing.cpu_count()), rows)
+    finally:
+        if sink is not None:
+            sink.terminate()
+        cleanup(work_dir)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -92,6 +92,24 @@ package_startup_list_path = os.path.abspath(
     read_liota_config('PKG_CFG', 'pkg_list')
 )
 
+def _format_stats(stats):
+    """
+    Formats a dict of statistics on one line, summarizing latency histograms by their percentiles.
+    """
+    items = []
+    for key in sorted(stats):
+        value = stats[key]
+        if isinstance(value, dict) and "buckets" in value:
+            value = "count=%s p50=%s p90=%s p99=%s max=%s" % tuple(
+                value[k] for k in ("count", "p50", "p90", "p99", "max"))
+            items.append("%s: [%s]" % (key, value))
+        elif isinstance(value, dict):
+            items.append("%s: [%s]" % (key, _format_stats(value)))
+        else:
+            items.append("%s: %s" % (key, value))
+    return "\t".join(items)
+
+
 class ResourceRegistryPerPackage:
     """
     ResourceRegistryPerPackage creates temporary objects for packages while
@@ -182,6 +200,13 @@ class ResourceRegistry:
         """
         return identifier in self._registry
 
+    def identifiers(self):
+        """
+        Get the identifiers of all registered resources.
+        :return: list of identifiers
+        """
+        return self._registry.keys()
+
     #-----------------------------------------------------------------------
     # This method generate a package specific registry object, so when they
     # register their resource refs, we keep track of them and can deregister
@@ -403,6 +428,9 @@ class PackageThread(Thread):
             else:
                 log.info("packages {0} is not loaded".format(query_pkg))
             return
+        if parameters[0] == "comms":
+            self._log_comms_stats(parameters[1:])
+            return
         if len(parameters) != 1:
             log.warning("Invalid format of stat command: %s" % parameters[0])
             return
@@ -452,6 +480,30 @@ class PackageThread(Thread):
             return
         log.warning("Unsupported stat")
 
+    #-----------------------------------------------------------------------
+    # This method logs the transport statistics of the DCCComms of the
+    # registered resources, i.e., DCCs or DCCComms, or only of those named
+
+    def _log_comms_stats(self, identifiers):
+        from liota.dcc_comms.dcc_comms import DCCComms
+
+        for identifier in identifiers:
+            if not self._resource_registry.has(identifier):
+                log.warning("Resource %s is not registered" % identifier)
+        found = False
+        for identifier in sorted(identifiers or self._resource_registry.identifiers()):
+            if not self._resource_registry.has(identifier):
+                continue
+            resource = self._resource_registry.get(identifier)
+            comms = resource if isinstance(resource, DCCComms) else getattr(resource, "comms", None)
+            if not isinstance(comms, DCCComms):
+                continue
+            found = True
+            log.warning("Statistics of %s (%s) - \t%s"
+                        % (identifier, type(comms).__name__, _format_stats(comms.stats())))
+        if not found:
+            log.warning("No DCCComms found in the registered resources")
+
     def run(self):
         """
         The execution function of PackageThread class:
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import logging
+
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.lib.utilities.columnar_store import ColumnarStore
+from liota.lib.utilities.comms_stats import CommsStats, CONNECTED, CLOSED
+
+log = logging.getLogger(__name__)
+
+
+class ColumnarFileDccComms(DCCComms):
+    """
+    DccComms storing metric samples in local columnar segment files instead of sending them to a server.  Its
+    statistics count the samples and bytes written to the segment files as sent.
+    """
+
+    def __init__(self, directory, **store_options):
+        """
+        :param directory: Directory holding the segment files
+        :param store_options: Keyword arguments of ColumnarStore, e.g., segment_duration and retention_seconds
+        """
+        self.directory = directory
+        self.store_options = store_options
+        self.client = None
+        self.comms_stats = CommsStats(self._state)
+        self._connect()
+
+    def _connect(self):
+        """
+        Opens the columnar store.
+        :return:
+        """
+        log.info("Opening columnar store in {0}".format(self.directory))
+        self.client = ColumnarStore(self.directory, comms_stats=self.comms_stats, **self.store_options)
+
+    def _disconnect(self):
+        """
+        Writes the buffered samples and closes the columnar store.
+        :return:
+        """
+        client, self.client = self.client, None
+        client.close()
+
+    def _state(self):
+        return CONNECTED if self.client is not None else CLOSED
+
+    def send(self, message, msg_attr=None):
+        """
+        Appends samples to the columnar store.
+        :param message: List of (series name, list of (timestamp, value) tuples) tuples
+        :param msg_attr: MessagingAttribute.  It is 'None' for the columnar store.
+        :return:
+        """
+        try:
+            for series, samples in message:
+                self.client.append(series, samples)
+        except Exception:
+            self.comms_stats.failed()
+            raise
+
+    def receive(self, msg_attr=None):
+        """
+        Samples are read back with ColumnarFile.read() and export().
+        :param msg_attr: MessagingAttributes.  It is 'None' for the columnar store.
+        :return:
+        """
+        raise NotImplementedError
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import base64
+import copy
+import logging
+import threading
+
+from liota.dcc_comms.wrapping_dcc_comms import WrappingDccComms
+from liota.lib.utilities.compression import FLAG_NONE, get_compressor, unpack
+
+
+log = logging.getLogger(__name__)
+
+
+class CompressedDccComms(WrappingDccComms):
+    """
+    Compresses the payload of every message sent over another DCCComms.
+
+    Every frame starts with a flag byte: FLAG_NONE if the payload is sent as is, otherwise the flag of the compressor
+    used.  A payload is only sent compressed if that saves enough bytes, so short messages don't grow.  The receiving
+    end must understand this framing, see liota.lib.utilities.compression.unpack.  Frames are base64 encoded if the
+    wrapped comms only carries text, e.g., WebSocketDccComms without binary=True.  Received messages are unpacked the
+    same way, both those put on userdata and those passed to the sub_callback of MqttMessagingAttributes; messages
+    which aren't frames are passed through unchanged.
+    """
+
+    stats_key = "compression"
+
+    def __init__(self, comms, compressor=None, ratio_threshold=0.9, min_size=64):
+        """
+        :param comms: DCCComms the compressed frames are sent over
+        :param compressor: Compressor object or name of a compressor, zlib if None
+        :param ratio_threshold: A payload is sent compressed if its compressed size is at most this fraction of its
+                                original size
+        :param min_size: Payloads shorter than this many bytes are sent uncompressed without trying to compress them
+        """
+        self.compressor = get_compressor(compressor)
+        self.ratio_threshold = ratio_threshold
+        self.min_size = min_size
+        self._stats_lock = threading.Lock()
+        self.messages = 0
+        self.compressed_messages = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        super(CompressedDccComms, self).__init__(comms)
+        userdata = getattr(comms, "userdata", None)
+        if userdata is not None and hasattr(userdata, "get"):
+            self.userdata = _UnpackingQueue(userdata, self._unpack)
+
+    def _pack(self, message):
+        if isinstance(message, unicode):
+            message = message.encode("utf-8")
+        frame = None
+        if len(message) >= self.min_size:
+            compressed = self.compressor.compress(message)
+            if len(compressed) <= len(message) * self.ratio_threshold:
+                frame = chr(self.compressor.flag) + compressed
+        if frame is None:
+            frame = chr(FLAG_NONE) + message
+        compressed = ord(frame[0]) != FLAG_NONE
+        if not self.binary:
+            frame = base64.b64encode(frame)
+        with self._stats_lock:
+            self.messages += 1
+            self.bytes_in += len(message)
+            self.bytes_out += len(frame)
+            if compressed:
+                self.compressed_messages += 1
+        return frame
+
+    def _unpack(self, message):
+        try:
+            if not self.binary:
+                message = base64.b64decode(message)
+            return unpack(message)
+        except (TypeError, ValueError, IndexError) as e:
+            log.warning("Received message is not a compressed frame, passing it through: {0}".format(e))
+            return message
+
+    def send(self, message, msg_attr=None):
+        """
+        Sends message compressed over the wrapped comms.
+
+        :param message: Message to be sent
+        :param msg_attr: MessagingAttributes object of the wrapped comms
+        :return:
+        """
+        self.comms.send(self._pack(message), msg_attr)
+
+    def send_async(self, message, msg_attr=None):
+        """
+        :param message: Message to be sent
+        :param msg_attr: MessagingAttributes object of the wrapped comms
+        :return: Future of the wrapped comms
+        """
+        return self.comms.send_async(self._pack(message), msg_attr)
+
+    def receive(self, msg_attr=None):
+        """
+        Receives messages with the wrapped comms and unpacks them.
+
+        :param msg_attr: MessagingAttributes object of the wrapped comms
+        :return:
+        """
+        sub_callback = getattr(msg_attr, "sub_callback", None)
+        if sub_callback is not None:
+            msg_attr = copy.copy(msg_attr)
+            msg_attr.sub_callback = lambda client, userdata, msg: sub_callback(client, userdata,
+                                                                               self._unpack_payload(msg))
+        return self.comms.receive(msg_attr)
+
+    def _unpack_payload(self, msg):
+        msg.payload = self._unpack(msg.payload)
+        return msg
+
+    def _wrapper_stats(self):
+        """
+        :return: dict of the number of messages and bytes before and after compression
+        """
+        with self._stats_lock:
+            return {
+                "compressor": self.compressor.name,
+                "messages": self.messages,
+                "compressed_messages": self.compressed_messages,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": float(self.bytes_out) / self.bytes_in if self.bytes_in else 1.0
+            }
+
+
+class _UnpackingQueue(object):
+    """
+    View of the userdata queue of the wrapped comms which unpacks the messages taken from it.
+    """
+
+    def __init__(self, queue, unpack_fn):
+        self._queue = queue
+        self._unpack_fn = unpack_fn
+
+    def __getattr__(self, name):
+        return getattr(self._queue, name)
+
+    def get(self, block=True, timeout=None):
+        return self._unpack_fn(self._queue.get(block, timeout))
+
+    def get_nowait(self):
+        return self.get(False)
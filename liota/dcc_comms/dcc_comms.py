@@ -32,6 +32,9 @@
 
 from abc import ABCMeta, abstractmethod
 
+from liota.lib.utilities.comms_stats import CommsStats
+from liota.lib.utilities.future import Future
+
 
 class DCCComms:
 
@@ -40,6 +43,12 @@ class DCCComms:
     """
     __metaclass__ = ABCMeta
 
+    #: CommsStats the implementation counts its traffic into, see stats()
+    comms_stats = None
+
+    #: False if the transport only carries text, e.g., WebSocket text frames, so binary payloads must be encoded
+    binary = True
+
     # -----------------------------------------------------------------------
     # If a specific DCCComms has parameters to establish connection, pass
     # them to its constructor, not self._connect. Keep self._connect free of
@@ -87,6 +96,25 @@ class DCCComms:
         """
         pass
 
+    def send_async(self, message, msg_attr=None):
+        """
+        Sends message without waiting for the transport to acknowledge it.  Transports that can report the delivery
+        of a message should override this method; by default the message is sent with send() and the returned Future
+        is resolved once send() returns.
+
+        :param message: Message to be sent
+        :param msg_attr: MessagingAttributes object
+        :return: Future resolved once the message is delivered
+        """
+        future = Future()
+        try:
+            self.send(message, msg_attr)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(None)
+        return future
+
     @abstractmethod
     def receive(self, msg_attr):
         """
@@ -98,3 +126,15 @@ class DCCComms:
         :return:
         """
         pass
+
+    def stats(self):
+        """
+        Statistics of the transport: the counters of CommsStats.snapshot() and the connection state, plus any
+        transport specific entries an implementation adds.  Implementations that don't count their traffic report
+        zero counters and an unknown state.
+
+        :return: dict of statistics
+        """
+        if self.comms_stats is None:
+            return CommsStats().snapshot()
+        return self.comms_stats.snapshot()
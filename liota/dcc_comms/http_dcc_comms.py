@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import base64
+import httplib
+import logging
+import Queue
+import socket
+import threading
+import time
+import zlib
+from urlparse import urlparse
+try:
+    import ssl
+except ImportError:
+    ssl = None
+
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.lib.utilities.comms_stats import CommsStats, CONNECTING, CONNECTED, DISCONNECTED
+from liota.lib.utilities.future import Future
+
+log = logging.getLogger(__name__)
+
+
+class _HttpStatusError(Exception):
+    def __init__(self, status, message):
+        super(_HttpStatusError, self).__init__(message)
+        self.status = status
+
+
+class HttpDccComms(DCCComms):
+    """
+    DccComms POSTing messages to an HTTP(S) endpoint over a pool of persistent HTTP/1.1 connections.
+
+    Messages are concatenated into batches, which are sent gzip-compressed once they reach max_batch_bytes or
+    flush_interval seconds after their first message.
+
+    A batch failing with a connection error or a 429/5xx status is kept and sent again with the next batch after
+    retry_interval seconds, up to max_queued_bytes of messages; the oldest messages are dropped beyond that.  A batch
+    rejected with another status is dropped.  Dropped messages fail their send_async() Futures, and the next send()
+    or flush() raises the error of a rejected batch, whether it was sent by a send() call or by the flush_interval
+    timer.
+    """
+
+    def __init__(self, url, identity=None, headers=None, pool_size=2, timeout=10, compress_level=6,
+                 max_batch_bytes=512 * 1024, flush_interval=1.0, retry_interval=5.0, max_queued_bytes=None):
+        """
+        :param url: URL messages are POSTed to, e.g., http://localhost:8086/write?db=liota&precision=ms
+        :param identity: Identity Object.  Its username and password are sent with basic authentication, its
+                         root_ca_cert, cert_file and key_file are used for https URLs.
+        :param headers: Dict of additional request headers
+        :param pool_size: Maximum number of connections, i.e., batches being POSTed at the same time
+        :param timeout: Socket timeout in seconds
+        :param compress_level: gzip compression level, 0 sends uncompressed bodies
+        :param max_batch_bytes: Size in bytes at which a batch is sent
+        :param flush_interval: Seconds after which a batch is sent even if it is smaller than max_batch_bytes,
+                               0 sends every message on its own
+        :param retry_interval: Seconds before a batch that failed with a connection error or a 429/5xx status is
+                               sent again
+        :param max_queued_bytes: Size in bytes of the messages kept for sending, including failed batches,
+                                 4 * max_batch_bytes if None
+        """
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError("http or https URL is expected: {0}".format(url))
+        self.url = url
+        self.identity = identity
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.compress_level = compress_level
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_queued_bytes = max_queued_bytes if max_queued_bytes is not None else 4 * max_batch_bytes
+        self._scheme = parsed.scheme
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._path = parsed.path or "/"
+        if parsed.query:
+            self._path += "?" + parsed.query
+        self._headers = {"Content-Type": "text/plain; charset=utf-8", "Connection": "keep-alive"}
+        if self.compress_level > 0:
+            self._headers["Content-Encoding"] = "gzip"
+        if identity is not None and identity.username:
+            self._headers["Authorization"] = "Basic " + base64.b64encode(
+                "{0}:{1}".format(identity.username, identity.password or ""))
+        self._headers.update(headers or {})
+        # Current batch: list of (message, Future of the send_async() call or None) tuples, oldest first
+        self._batch = []
+        self._batch_size = 0
+        self._batch_deadline = None
+        self._batch_cond = threading.Condition(threading.Lock())
+        # Batches are not sent before this time after a failure that is retried
+        self._retry_at = 0
+        # Error of the last batch of send() messages that was rejected, raised by the next send() or flush()
+        self._error = None
+        self.dropped_messages = 0
+        self.posted_batches = 0
+        self.posted_bytes = 0
+        self.compressed_bytes = 0
+        self.connections_opened = 0
+        # Whether the last POST succeeded, None before the first one
+        self._last_post_ok = None
+        self.comms_stats = CommsStats(self._state)
+        self._connect()
+        if self.flush_interval > 0:
+            flush_thread = threading.Thread(target=self._flush_periodically, name="HttpDccCommsFlush")
+            flush_thread.daemon = True
+            flush_thread.start()
+
+    def _connect(self):
+        """
+        Creates the connection pool.  Connections are opened when they are first used.
+        :return:
+        """
+        self.client = Queue.LifoQueue()
+        for _ in range(self.pool_size):
+            self.client.put(None)
+
+    def _disconnect(self):
+        """
+        Sends the pending batch and closes the pooled connections.
+        :return:
+        """
+        try:
+            self.flush()
+        except Exception:
+            log.exception("Could not send the last batch to {0}".format(self.url))
+        for _ in range(self.pool_size):
+            conn = self.client.get()
+            if conn is not None:
+                conn.close()
+
+    def _new_connection(self):
+        self.connections_opened += 1
+        if self._scheme == "http":
+            return httplib.HTTPConnection(self._host, self._port, timeout=self.timeout)
+        context = None
+        if ssl is not None and hasattr(ssl, "create_default_context"):
+            context = ssl.create_default_context(
+                cafile=self.identity.root_ca_cert if self.identity is not None else None)
+            if self.identity is not None and self.identity.cert_file:
+                context.load_cert_chain(self.identity.cert_file, self.identity.key_file)
+        return httplib.HTTPSConnection(self._host, self._port, timeout=self.timeout, context=context)
+
+    def send(self, message, msg_attr=None):
+        """
+        Adds message to the current batch.
+
+        :param message: Message string, e.g., newline terminated lines
+        :param msg_attr: MessagingAttribute.  It is 'None' for HTTP.
+        :return:
+        """
+        self._add(message, None)
+
+    def send_async(self, message, msg_attr=None):
+        """
+        :param message: Message string
+        :param msg_attr: MessagingAttribute.  It is 'None' for HTTP.
+        :return: Future resolved once the batch holding message was accepted by the server
+        """
+        future = Future()
+        self._add(message, future)
+        return future
+
+    def _add(self, message, future):
+        with self._batch_cond:
+            self._batch.append((message, future))
+            self._batch_size += len(message)
+            self._trim_batch()
+            self._schedule_batch()
+            batch = None
+            if (self.flush_interval <= 0 or self._batch_size >= self.max_batch_bytes) and \
+                    time.time() >= self._retry_at:
+                batch = self._take_batch()
+        if batch:
+            self._post_batch(batch)
+        if future is None:
+            self._raise_error()
+
+    def _schedule_batch(self):
+        # Must be called with self._batch_cond held
+        if self._batch_deadline is None and self._batch:
+            self._batch_deadline = max(time.time() + self.flush_interval, self._retry_at)
+            self._batch_cond.notify()
+
+    def _trim_batch(self):
+        # Must be called with self._batch_cond held
+        while self._batch_size > self.max_queued_bytes and len(self._batch) > 1:
+            message, future = self._batch.pop(0)
+            self._batch_size -= len(message)
+            self.dropped_messages += 1
+            if future is not None:
+                future.set_exception(IOError("Message dropped from full HTTP batch queue"))
+
+    def _take_batch(self):
+        batch = self._batch
+        self._batch = []
+        self._batch_size = 0
+        self._batch_deadline = None
+        return batch
+
+    def _raise_error(self):
+        with self._batch_cond:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def flush(self):
+        """
+        Sends the current batch right away.
+        :return:
+        """
+        with self._batch_cond:
+            batch = self._take_batch()
+        if batch:
+            self._post_batch(batch)
+        self._raise_error()
+
+    def _flush_periodically(self):
+        while True:
+            with self._batch_cond:
+                while self._batch_deadline is None:
+                    self._batch_cond.wait()
+                remaining = self._batch_deadline - time.time()
+                if remaining > 0:
+                    self._batch_cond.wait(remaining)
+                    continue
+                batch = self._take_batch()
+            self._post_batch(batch)
+
+    def _state(self):
+        if self._last_post_ok is None:
+            return CONNECTING
+        return CONNECTED if self._last_post_ok else DISCONNECTED
+
+    def _post_batch(self, batch):
+        """
+        Sends a batch.  Failures are not raised but kept for retrying or recorded for _raise_error().
+        """
+        start = time.time()
+        try:
+            size = self._post("".join(message for message, _ in batch))
+        except Exception as e:
+            self._last_post_ok = False
+            self.comms_stats.failed()
+            if isinstance(e, _HttpStatusError) and e.status != 429 and e.status < 500:
+                log.error("Dropped batch of {0} messages rejected by {1}: {2}".format(len(batch), self.url, e))
+                with self._batch_cond:
+                    self.dropped_messages += len(batch)
+                    if any(future is None for _, future in batch):
+                        self._error = e
+                for _, future in batch:
+                    if future is not None:
+                        future.set_exception(e)
+                return
+            log.warning("Sending batch of {0} messages to {1} failed, retrying in {2} seconds: {3}".format(
+                len(batch), self.url, self.retry_interval, e))
+            with self._batch_cond:
+                self._batch[:0] = batch
+                self._batch_size += sum(len(message) for message, _ in batch)
+                self._retry_at = time.time() + self.retry_interval
+                self._batch_deadline = None
+                self._trim_batch()
+                self._schedule_batch()
+        else:
+            self._last_post_ok = True
+            self.comms_stats.sent(size, time.time() - start, messages=len(batch))
+            for _, future in batch:
+                if future is not None:
+                    future.set_result(None)
+
+    def _post(self, body):
+        """
+        :return: Size in bytes of the POSTed, possibly compressed, body
+        """
+        size = len(body)
+        if self.compress_level > 0:
+            compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+        headers = dict(self._headers)
+        headers["Content-Length"] = str(len(body))
+        conn = self.client.get()
+        try:
+            # A pooled connection may have been closed by the server while idle; retry once on a new one
+            for attempt in (0, 1):
+                reused = conn is not None
+                if conn is None:
+                    conn = self._new_connection()
+                try:
+                    conn.request("POST", self._path, body, headers)
+                    response = conn.getresponse()
+                    response_body = response.read()
+                except (socket.error, httplib.HTTPException):
+                    conn.close()
+                    conn = None
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                if response.will_close:
+                    conn.close()
+                    conn = None
+                if not 200 <= response.status < 300:
+                    raise _HttpStatusError(response.status, "HTTP {0} {1} from {2}: {3}".format(
+                        response.status, response.reason, self.url, response_body))
+                break
+        finally:
+            self.client.put(conn)
+        self.posted_batches += 1
+        self.posted_bytes += size
+        self.compressed_bytes += len(body)
+        log.debug("Posted {0} bytes ({1} compressed) to {2}".format(size, len(body), self.url))
+        return len(body)
+
+    def stats(self):
+        """
+        :return: dict of the CommsStats counters, plus the dropped messages and the bytes waiting to be sent
+        """
+        stats = self.comms_stats.snapshot()
+        with self._batch_cond:
+            stats.update(dropped_messages=self.dropped_messages, queued_bytes=self._batch_size)
+        return stats
+
+    def receive(self, msg_attr=None):
+        """
+        HTTP endpoints only answer requests.
+        :param msg_attr: MessagingAttributes.  It is 'None' for HTTP.
+        :return:
+        """
+        raise NotImplementedError
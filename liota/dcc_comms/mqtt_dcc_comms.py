@@ -32,9 +32,12 @@
 
 import logging
 import Queue
+import zlib
 
 from liota.dcc_comms.dcc_comms import DCCComms
 from liota.lib.transports.mqtt import Mqtt, MqttMessagingAttributes
+from liota.lib.utilities.comms_stats import CommsStats, CONNECTED, DISCONNECTED
+from liota.lib.utilities.future import call_in_parallel
 from liota.lib.utilities.utility import systemUUID
 
 log = logging.getLogger(__name__)
@@ -43,11 +46,16 @@ log = logging.getLogger(__name__)
 class MqttDccComms(DCCComms):
     """
     DccComms for MQTT Transport
+
+    Publishes can be spread over several connections to the broker, each with its own socket and network thread.
+    A topic is always published over the same connection, so messages of a topic keep their order.  Subscriptions
+    are made on the first connection, 'client', only.
     """
 
     def __init__(self, edge_system_name, url, port, identity=None, tls_conf=None, qos_details=None,
                  client_id=None, clean_session=False, protocol="MQTTv311", transport="tcp", keep_alive=60,
-                 mqtt_msg_attr=None, enable_authentication=False, conn_disconn_timeout=10):
+                 mqtt_msg_attr=None, enable_authentication=False, conn_disconn_timeout=10, connections=1,
+                 session_expiry=None, message_expiry=None, topic_aliases=True):
 
         """
         :param edge_system_name: EdgeSystem's name for auto-generation of topic
@@ -70,6 +78,12 @@ class MqttDccComms(DCCComms):
                             In case of None, topics will be auto-generated. User provided topic will be used otherwise.
         :param enable_authentication: Enable user-name password authentication or not
         :param conn_disconn_timeout: Connect-Disconnect-Timeout
+        :param connections: Number of connections publishes are spread over.  The client IDs of the additional
+                            connections are derived from client_id by appending "-1", "-2", ...
+        :param session_expiry: MQTTv5 only.  Seconds the broker keeps the session after the connection is lost
+        :param message_expiry: MQTTv5 only.  Seconds after which the broker discards undelivered messages
+        :param topic_aliases: MQTTv5 only.  Replace the topics of QoS 0 messages by the aliases the broker allows on
+                              every connection
         """
 
         self.client_id = client_id
@@ -104,23 +118,84 @@ class MqttDccComms(DCCComms):
         self.keep_alive = keep_alive
         self.enable_authentication = enable_authentication
         self.conn_disconn_timeout = conn_disconn_timeout
+        self.session_expiry = session_expiry
+        self.message_expiry = message_expiry
+        self.topic_aliases = topic_aliases
+        if connections < 1:
+            raise ValueError("At least one connection is required")
+        self.connections = connections
+        self.comms_stats = CommsStats(self._state)
         self._connect()
 
     def _connect(self):
         """
-        Initializes Mqtt Transport and connects to MQTT broker.
+        Initializes Mqtt Transports and connects them to MQTT broker in parallel.
         :return:
         """
-        self.client = Mqtt(self.url, self.port, self.identity, self.tls_conf, self.qos_details, self.client_id,
-                           self.clean_session, self.userdata, self.protocol, self.transport, self.keep_alive,
-                           self.enable_authentication, self.conn_disconn_timeout)
+        client_ids = [self.client_id] + ["{0}-{1}".format(self.client_id, i) for i in range(1, self.connections)]
+        futures = call_in_parallel([lambda client_id=client_id: self._new_client(client_id)
+                                    for client_id in client_ids], name="MqttDccCommsConnect")
+        clients = []
+        error = None
+        for future in futures:
+            try:
+                clients.append(future.result())
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            # Connections that came up must not keep their network threads running
+            for client in clients:
+                try:
+                    client.disconnect()
+                except Exception:
+                    log.exception("Disconnecting {0} failed".format(client.get_client_id()))
+            raise error
+        self.clients = clients
+        self.client = clients[0]
+
+    def _new_client(self, client_id):
+        return Mqtt(self.url, self.port, self.identity, self.tls_conf, self.qos_details, client_id,
+                    self.clean_session, self.userdata, self.protocol, self.transport, self.keep_alive,
+                    self.enable_authentication, self.conn_disconn_timeout, comms_stats=self.comms_stats,
+                    session_expiry=self.session_expiry, message_expiry=self.message_expiry,
+                    topic_aliases=self.topic_aliases)
 
     def _disconnect(self):
         """
         Disconnects from MQTT broker.
         :return:
         """
-        self.client.disconnect()
+        for client in self.clients:
+            client.disconnect()
+
+    def _state(self):
+        states = set(client.get_state() for client in self.clients)
+        if len(states) == 1:
+            return states.pop()
+        # Some connections are up while others are not, see connected_connections in stats()
+        return CONNECTED if CONNECTED in states else DISCONNECTED
+
+    def stats(self):
+        """
+        :return: dict of the CommsStats counters of all connections, plus the number of connected connections and the
+                 QoS 1 and 2 messages in flight
+        """
+        stats = self.comms_stats.snapshot()
+        stats["connections"] = len(self.clients)
+        stats["connected_connections"] = sum(1 for client in self.clients if client.connected)
+        stats["in_flight"] = sum(client.publish_stats()["in_flight"] for client in self.clients)
+        return stats
+
+    def _client_for(self, topic):
+        """
+        :param topic: Publish topic
+        :return: Mqtt Transport publishing the topic
+        """
+        if self.connections == 1:
+            return self.client
+        if isinstance(topic, unicode):
+            topic = topic.encode("utf-8")
+        return self.clients[(zlib.crc32(topic) & 0xffffffff) % self.connections]
 
     def receive(self, msg_attr=None):
         """
@@ -155,8 +230,21 @@ class MqttDccComms(DCCComms):
         :param msg_attr: MqttMessagingAttributes Object
         :return:
         """
-        if msg_attr:
-            self.client.publish(msg_attr.pub_topic, message, msg_attr.pub_qos, msg_attr.pub_retain)
-        else:
-            self.client.publish(self.msg_attr.pub_topic, message, self.msg_attr.pub_qos,
-                                self.msg_attr.pub_retain)
+        if not msg_attr:
+            msg_attr = self.msg_attr
+        self._client_for(msg_attr.pub_topic).publish(msg_attr.pub_topic, message, msg_attr.pub_qos,
+                                                     msg_attr.pub_retain)
+
+    def send_async(self, message, msg_attr=None):
+        """
+        Publishes message to MQTT broker without waiting for its delivery.
+        If mess_attr is None, then self.mess_attr will be used.
+
+        :param message: Message to be published
+        :param msg_attr: MqttMessagingAttributes Object
+        :return: Future resolved once paho reports the message as published
+        """
+        if not msg_attr:
+            msg_attr = self.msg_attr
+        return self._client_for(msg_attr.pub_topic).publish_async(msg_attr.pub_topic, message, msg_attr.pub_qos,
+                                                                  msg_attr.pub_retain)
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import logging
+import threading
+import time
+import zlib
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.lib.utilities.comms_stats import CommsStats, CONNECTED, CLOSED
+
+log = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Number of series whose sample lines are joined into one cached block of exposition text
+_BLOCK_SERIES = 128
+
+
+class _Family(object):
+    """
+    Sample lines of the series of one metric family, joined into cached blocks of _BLOCK_SERIES lines, so that a
+    change of a few series only joins the blocks holding them again.
+    """
+
+    def __init__(self, name):
+        self.header = "# TYPE %s gauge\n" % name
+        self.lines = []
+        self.labels = []
+        # labels -> position in lines
+        self.positions = {}
+        self.blocks = []
+        self.dirty_blocks = set()
+
+    def update(self, labels, line):
+        position = self.positions.get(labels)
+        if position is None:
+            if line is None:
+                return
+            position = self.positions[labels] = len(self.lines)
+            self.lines.append(line)
+            self.labels.append(labels)
+        elif line is not None:
+            self.lines[position] = line
+        else:
+            # The last series takes the place of the removed one
+            del self.positions[labels]
+            last_labels = self.labels.pop()
+            last_line = self.lines.pop()
+            if position < len(self.lines):
+                self.lines[position] = last_line
+                self.labels[position] = last_labels
+                self.positions[last_labels] = position
+            self.dirty_blocks.add(len(self.lines) // _BLOCK_SERIES)
+        self.dirty_blocks.add(position // _BLOCK_SERIES)
+
+    def render(self):
+        """
+        :return: List of the cached blocks of the family's exposition text, without its TYPE line
+        """
+        del self.blocks[(len(self.lines) + _BLOCK_SERIES - 1) // _BLOCK_SERIES:]
+        for block in sorted(self.dirty_blocks):
+            start = block * _BLOCK_SERIES
+            if start >= len(self.lines):
+                continue
+            text = "".join(self.lines[start:start + _BLOCK_SERIES])
+            if block < len(self.blocks):
+                self.blocks[block] = text
+            else:
+                self.blocks.append(text)
+        self.dirty_blocks = set()
+        return self.blocks
+
+
+class _MetricsServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        comms = self.server.comms
+        if self.path.split("?")[0] != comms.path:
+            self.send_error(404)
+            return
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        body = comms.render(gzipped)
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("Scrape from {0}: {1}".format(self.client_address[0], format % args))
+
+
+class PrometheusDccComms(DCCComms):
+    """
+    DccComms serving the latest sample of every series over HTTP in Prometheus text exposition format, to be
+    scraped by a Prometheus server instead of pushing samples.
+
+    Series are grouped in metric families.  The sample line of every series is kept as sent, and the lines are
+    joined in cached blocks per family that are joined again only if one of their series changed since the
+    previous scrape.  The whole (optionally gzipped) body is reused as long as nothing changed.  Its statistics
+    count every send() as a message of the bytes of its sample lines.
+    """
+
+    def __init__(self, port, host="", path="/metrics"):
+        """
+        :param port: Port to serve on
+        :param host: Address to serve on, all addresses if empty
+        :param path: Path of the exposition endpoint
+        """
+        self.host = host
+        self.port = port
+        self.path = path
+        self._lock = threading.Lock()
+        # family -> _Family
+        self._families = {}
+        self._dirty = set()
+        self._body = None
+        self._gzipped_body = None
+        self._serving = False
+        self.comms_stats = CommsStats(self._state)
+        self._connect()
+
+    def _connect(self):
+        """
+        Starts the HTTP server in a background thread.
+        :return:
+        """
+        self.client = _MetricsServer((self.host, self.port), _MetricsHandler)
+        self.client.comms = self
+        self.port = self.client.server_address[1]
+        server_thread = threading.Thread(target=self.client.serve_forever, name="PrometheusDccComms")
+        server_thread.daemon = True
+        server_thread.start()
+        self._serving = True
+        log.info("Serving Prometheus metrics on port {0}{1}".format(self.port, self.path))
+
+    def _disconnect(self):
+        """
+        Stops the HTTP server.
+        :return:
+        """
+        self._serving = False
+        self.client.shutdown()
+        self.client.server_close()
+
+    def _state(self):
+        return CONNECTED if self._serving else CLOSED
+
+    def send(self, message, msg_attr=None):
+        """
+        Updates series.
+
+        :param message: List of (family, labels, sample line) tuples.  A sample line of None removes the series.
+        :param msg_attr: MessagingAttribute.  It is 'None' for Prometheus.
+        :return:
+        """
+        start = time.time()
+        size = 0
+        try:
+            with self._lock:
+                for family, labels, line in message:
+                    series = self._families.get(family)
+                    if series is None:
+                        if line is None:
+                            continue
+                        series = self._families[family] = _Family(family)
+                    series.update(labels, line)
+                    self._dirty.add(family)
+                    if line is not None:
+                        size += len(line)
+        except Exception:
+            self.comms_stats.failed()
+            raise
+        self.comms_stats.sent(size, time.time() - start)
+
+    def render(self, gzipped=False):
+        """
+        :param gzipped: Return the gzip compressed body
+        :return: Exposition text of all series
+        """
+        with self._lock:
+            if self._dirty:
+                for family in self._dirty:
+                    series = self._families.get(family)
+                    if series is not None:
+                        series.render()
+                        if not series.lines:
+                            del self._families[family]
+                self._dirty = set()
+                self._body = None
+                self._gzipped_body = None
+            if self._body is None:
+                parts = []
+                for series in self._families.itervalues():
+                    parts.append(series.header)
+                    parts.extend(series.blocks)
+                self._body = "".join(parts)
+            if not gzipped:
+                return self._body
+            if self._gzipped_body is None:
+                # Fastest level, since the body is compressed again after every change
+                compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                self._gzipped_body = compressor.compress(self._body) + compressor.flush()
+            return self._gzipped_body
+
+    def receive(self, msg_attr=None):
+        """
+        Prometheus pulls the series, nothing is received.
+        :param msg_attr: MessagingAttributes.  It is 'None' for Prometheus.
+        :return:
+        """
+        raise NotImplementedError
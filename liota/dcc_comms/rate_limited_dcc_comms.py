@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import logging
+import threading
+import time
+from collections import deque
+
+from liota.dcc_comms.wrapping_dcc_comms import WrappingDccComms
+from liota.lib.utilities.future import Future
+from liota.lib.utilities.histogram import LatencyHistogram
+from liota.lib.utilities.token_bucket import TokenBucket
+
+
+log = logging.getLogger(__name__)
+
+
+class RateLimitedDccComms(WrappingDccComms):
+    """
+    Limits the messages and bytes per second sent over another DCCComms with token buckets.
+
+    A message within the limits is sent right away from the calling thread.  Excess messages are queued in order and
+    sent by a background thread as the buckets refill, which smooths out bursts such as all metrics of the same
+    interval publishing together.  Nothing is dropped: once queue_size messages are waiting, send() blocks until
+    the queue has room again.
+    """
+
+    stats_key = "rate_limit"
+
+    def __init__(self, comms, messages_per_second=None, bytes_per_second=None, burst_messages=None,
+                 burst_bytes=None, queue_size=1000):
+        """
+        :param comms: DCCComms the messages are sent over
+        :param messages_per_second: Sustained message rate, unlimited if None
+        :param bytes_per_second: Sustained payload byte rate, unlimited if None
+        :param burst_messages: Messages that may be sent at once, one second worth if None
+        :param burst_bytes: Bytes that may be sent at once, one second worth if None
+        :param queue_size: Maximum number of messages waiting for the limits
+        """
+        self._buckets = []
+        if messages_per_second is not None:
+            self._buckets.append((TokenBucket(messages_per_second, burst_messages), lambda size: 1))
+        if bytes_per_second is not None:
+            self._buckets.append((TokenBucket(bytes_per_second, burst_bytes), lambda size: size))
+        self.queue_size = queue_size
+        # Queued (message, msg_attr, Future or None, time queued) tuples, oldest first
+        self._queue = deque()
+        # True while the sender thread sends a message taken off the queue
+        self._draining = False
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.throttled_messages = 0
+        self.throttled_seconds = 0.0
+        self.throttle_delay = LatencyHistogram()
+        self.blocked_sends = 0
+        self.errors = 0
+        super(RateLimitedDccComms, self).__init__(comms)
+        sender = threading.Thread(target=self._drain, name="RateLimitedDccCommsSender")
+        sender.daemon = True
+        sender.start()
+
+    def _disconnect(self):
+        """
+        Stops sending, discards the queued messages and disconnects the wrapped comms.
+        :return:
+        """
+        with self._cond:
+            self._closed = True
+            pending, self._queue = self._queue, deque()
+            self._cond.notify_all()
+        for _, _, future, _ in pending:
+            if future is not None:
+                future.set_exception(IOError("Comms disconnected"))
+        super(RateLimitedDccComms, self)._disconnect()
+
+    def _delay(self, size):
+        """
+        Must be called with self._cond held.  Takes the tokens for a message of size bytes if they are available.
+
+        :return: Seconds until the tokens are available, 0 if they were taken
+        """
+        now = time.time()
+        delay = max([bucket.delay(tokens(size), now) for bucket, tokens in self._buckets] or [0])
+        if not delay:
+            for bucket, tokens in self._buckets:
+                bucket.consume(tokens(size))
+        return delay
+
+    def _admit(self, message, msg_attr, future):
+        """
+        :return: True if the message may be sent right away, otherwise it was queued
+        """
+        with self._cond:
+            if self._closed:
+                raise IOError("Comms disconnected")
+            if not self._queue and not self._draining and not self._delay(len(message)):
+                return True
+            if len(self._queue) >= self.queue_size:
+                self.blocked_sends += 1
+                while len(self._queue) >= self.queue_size and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    raise IOError("Comms disconnected")
+            self._queue.append((message, msg_attr, future, time.time()))
+            self.throttled_messages += 1
+            self._cond.notify_all()
+            return False
+
+    def _sent(self, message):
+        with self._cond:
+            self.messages_sent += 1
+            self.bytes_sent += len(message)
+
+    def send(self, message, msg_attr=None):
+        """
+        Sends message over the wrapped comms, or queues it until the rate limits allow it.
+
+        :param message: Message to be sent
+        :param msg_attr: MessagingAttributes object of the wrapped comms
+        :return:
+        """
+        if self._admit(message, msg_attr, None):
+            self.comms.send(message, msg_attr)
+            self._sent(message)
+
+    def send_async(self, message, msg_attr=None):
+        """
+        :param message: Message to be sent
+        :param msg_attr: MessagingAttributes object of the wrapped comms
+        :return: Future resolved like the Future of the wrapped comms, once the message was sent
+        """
+        future = Future()
+        if self._admit(message, msg_attr, future):
+            self._send_async(message, msg_attr, future)
+        return future
+
+    def _send_async(self, message, msg_attr, future):
+        def on_done(sent):
+            try:
+                future.set_result(sent.result())
+            except Exception as e:
+                future.set_exception(e)
+        self.comms.send_async(message, msg_attr).add_done_callback(on_done)
+        self._sent(message)
+
+    def _drain(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                message, msg_attr, future, queued = self._queue[0]
+                delay = self._delay(len(message))
+                if not delay:
+                    self._queue.popleft()
+                    self._draining = True
+                    self._cond.notify_all()
+            if delay:
+                time.sleep(delay)
+                continue
+            throttled = time.time() - queued
+            self.throttle_delay.record(throttled)
+            try:
+                if future is None:
+                    self.comms.send(message, msg_attr)
+                    self._sent(message)
+                else:
+                    self._send_async(message, msg_attr, future)
+            except Exception as e:
+                log.exception("Sending throttled message failed")
+                self.errors += 1
+                if future is not None:
+                    future.set_exception(e)
+            with self._cond:
+                self.throttled_seconds += throttled
+                self._draining = False
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Waits until every queued message was sent.
+
+        :param timeout: Maximum seconds to wait, or None to wait indefinitely
+        :return: True if the queue was flushed
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while (self._queue or self._draining) and not self._closed:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return not self._queue and not self._draining
+
+    def _wrapper_stats(self):
+        """
+        :return: dict of the numbers of sent and throttled messages and the time messages spent throttled
+        """
+        with self._cond:
+            return {
+                "messages_sent": self.messages_sent,
+                "bytes_sent": self.bytes_sent,
+                "queued_messages": len(self._queue),
+                "throttled_messages": self.throttled_messages,
+                "throttled_seconds": self.throttled_seconds,
+                "throttle_delay": self.throttle_delay.snapshot(),
+                "blocked_sends": self.blocked_sends,
+                "errors": self.errors
+            }
@@ -29,10 +29,19 @@
 #  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
+
 import logging
+import random
+import select
 import socket
+import threading
+import time
+import zlib
+from collections import deque
 
 from liota.dcc_comms.dcc_comms import DCCComms
+from liota.lib.utilities.comms_stats import CommsStats, CONNECTED, DISCONNECTED, CLOSED
+from liota.lib.utilities.future import Future
 
 
 log = logging.getLogger(__name__)
@@ -41,54 +50,232 @@ log = logging.getLogger(__name__)
 class SocketDccComms(DCCComms):
     """
     DccComms for BSD Socket transport.
+
+    A lost connection is re-established in the background with exponential backoff and jitter.  Messages sent
+    while disconnected are kept in a bounded buffer, which is written out in order once reconnected; when the buffer
+    is full the oldest messages are dropped.
     """
 
-    def __init__(self, ip, port):
+    def __init__(self, ip, port, send_timeout=10, connect_timeout=10, buffer_size=1024 * 1024, min_backoff=0.5,
+                 max_backoff=60, keepalive_idle=60, comms_stats=None, peer_check_interval=1.0):
         """
         Init method for SocketDccComms.
 
         :param ip: IP address of the BSD socket server.
         :param port: Port number
+        :param send_timeout: Seconds a send may block before the connection is considered lost
+        :param connect_timeout: Seconds a connection attempt may take
+        :param buffer_size: Maximum number of bytes buffered while disconnected
+        :param min_backoff: Seconds before the first reconnection attempt
+        :param max_backoff: Maximum seconds between reconnection attempts
+        :param keepalive_idle: Seconds of idle connection after which TCP keepalive probes are sent
+        :param comms_stats: CommsStats to count into, shared by the connections of a pool.  A new one if None.
+        :param peer_check_interval: Seconds between the checks before a send whether the server closed the
+                                    connection, 0 checks before every send
         """
         self.ip = ip
         self.port = port
-        self._connect()
+        self.send_timeout = send_timeout
+        self.connect_timeout = connect_timeout
+        self.buffer_size = buffer_size
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.keepalive_idle = keepalive_idle
+        self.peer_check_interval = peer_check_interval
+        self._peer_checked = 0
+        self.client = None
+        self._closed = False
+        # Buffered (message, Future or None, time buffered) tuples, oldest first
+        self._buffer = deque()
+        self._buffered_bytes = 0
+        self._cond = threading.Condition(threading.Lock())
+        self.comms_stats = comms_stats if comms_stats is not None else CommsStats(self._state)
+        self.connect_failures = 0
+        self.dropped_messages = 0
+        self.dropped_bytes = 0
+        try:
+            self._connect()
+        except socket.error:
+            log.exception("Unable to establish socket connection. Please check the firewall rules. "
+                          "Retrying in the background.")
+        reconnect_thread = threading.Thread(target=self._reconnect, name="SocketDccCommsReconnect")
+        reconnect_thread.daemon = True
+        reconnect_thread.start()
 
     def _connect(self):
         """
-        Establishes connection to the BSD socket server.
+        Establishes connection to the BSD socket server and writes out the buffered messages.
         :return:
         """
-        self.client = socket.socket()
         log.info("Establishing Socket Connection")
+        sock = socket.create_connection((self.ip, self.port), self.connect_timeout)
         try:
-            self.client.connect((self.ip, self.port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # Keepalive tuning is platform specific
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, self.keepalive_idle / 6))
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+            sock.settimeout(self.send_timeout)
+        except socket.error:
+            sock.close()
+            raise
+        with self._cond:
+            if self._closed:
+                sock.close()
+                return
+            self.client = sock
             log.info("Socket Created")
-        except Exception as ex:
-            log.exception(
-                "Unable to establish socket connection. Please check the firewall rules and try again.")
-            self.client.close()
-            self.client = None
-            raise ex
+            while self._buffer:
+                message, future, buffered = self._buffer[0]
+                try:
+                    self._write(message, buffered)
+                except socket.error:
+                    self.comms_stats.failed()
+                    self._drop_connection()
+                    raise
+                self._buffer.popleft()
+                self._buffered_bytes -= len(message)
+                if future is not None:
+                    future.set_result(None)
 
     def _disconnect(self):
         """
-        Disconnect from BSD socket server.
-        TODO: To be implemented
+        Disconnect from BSD socket server.  Buffered messages are discarded.
         :return:
         """
-        raise NotImplementedError
+        with self._cond:
+            self._closed = True
+            if self.client is not None:
+                self.client.close()
+                self.client = None
+            self._cond.notify_all()
+
+    def _reconnect(self):
+        attempt = 0
+        while True:
+            with self._cond:
+                while self.client is not None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            delay = min(self.max_backoff, self.min_backoff * 2 ** attempt)
+            time.sleep(random.uniform(delay / 2.0, delay))
+            try:
+                self._connect()
+            except socket.error as e:
+                attempt = min(attempt + 1, 32)
+                self.connect_failures += 1
+                self.comms_stats.failed()
+                log.warning("Reconnecting to {0}:{1} failed: {2}".format(self.ip, self.port, e))
+            else:
+                attempt = 0
+                self.comms_stats.reconnected()
+
+    def _state(self):
+        if self._closed:
+            return CLOSED
+        return CONNECTED if self.client is not None else DISCONNECTED
+
+    def _peer_closed(self):
+        """
+        Carbon never sends anything, so a readable socket means the server closed the connection.  Checking it before
+        writing avoids losing a message written into a connection the server already closed.
+        """
+        try:
+            readable = select.select([self.client], [], [], 0)[0]
+            return bool(readable) and self.client.recv(1, socket.MSG_PEEK) == ""
+        except (select.error, socket.error):
+            return True
+
+    def check_health(self):
+        """
+        Detects a connection the server closed while no message was sent, so it is re-established before the next
+        message needs it.
+
+        :return: True if connected
+        """
+        with self._cond:
+            if self.client is not None and self._peer_closed():
+                self._drop_connection()
+            return self.client is not None
+
+    def _write(self, message, start):
+        """
+        :param start: Time the message was handed to send(), for its send latency
+        """
+        self.client.sendall(message)
+        self.comms_stats.sent(len(message), time.time() - start)
+
+    def _drop_connection(self):
+        log.warning("Lost socket connection to {0}:{1}".format(self.ip, self.port))
+        self.client.close()
+        self.client = None
+        self._cond.notify_all()
 
     def send(self, message, msg_attr=None):
         """
-        Sends message to the BSD socket server.
+        Sends message to the BSD socket server, or buffers it while disconnected.
         :param message: Message to be published
         :param msg_attr: MessagingAttribute.  It is 'None' for BSD Socket.
         :return:
         """
         log.debug("Publishing message:" + str(message))
-        if self.client is not None:
-            self.client.sendall(message)
+        self._send(message, None)
+
+    def send_async(self, message, msg_attr=None):
+        """
+        :param message: Message to be published
+        :param msg_attr: MessagingAttribute.  It is 'None' for BSD Socket.
+        :return: Future resolved once message was written to the socket, or failed if it was dropped from the buffer
+        """
+        future = Future()
+        self._send(message, future)
+        return future
+
+    def _send(self, message, future):
+        start = time.time()
+        with self._cond:
+            if self.client is not None and not self._buffer:
+                try:
+                    # A closed connection is also found by a failing write, but only after the server discarded
+                    # what was written into it, so it is checked for once in a while without a syscall per send
+                    peer_closed = False
+                    if start - self._peer_checked >= self.peer_check_interval:
+                        self._peer_checked = start
+                        peer_closed = self._peer_closed()
+                    if not peer_closed:
+                        self._write(message, start)
+                        if future is not None:
+                            future.set_result(None)
+                        return
+                except socket.error:
+                    self.comms_stats.failed()
+                self._drop_connection()
+            self._buffer.append((message, future, start))
+            self._buffered_bytes += len(message)
+            while self._buffered_bytes > self.buffer_size:
+                dropped, dropped_future, _ = self._buffer.popleft()
+                self._buffered_bytes -= len(dropped)
+                self.dropped_messages += 1
+                self.dropped_bytes += len(dropped)
+                if dropped_future is not None:
+                    dropped_future.set_exception(IOError("Message dropped from full socket buffer"))
+
+    @property
+    def buffered_bytes(self):
+        return self._buffered_bytes
+
+    def stats(self):
+        """
+        :return: dict of the CommsStats counters, plus the failed connection attempts and the buffered and dropped
+                 messages
+        """
+        stats = self.comms_stats.snapshot()
+        stats.update(connect_failures=self.connect_failures, dropped_messages=self.dropped_messages,
+                     dropped_bytes=self.dropped_bytes, buffered_bytes=self._buffered_bytes)
+        return stats
 
     def receive(self, msg_attr=None):
         """
@@ -98,3 +285,121 @@ class SocketDccComms(DCCComms):
         :return:
         """
         raise NotImplementedError
+
+
+class SocketPoolDccComms(DCCComms):
+    """
+    DccComms for BSD Socket transport over a pool of connections, each a SocketDccComms.
+
+    Messages are distributed across the connections by a hash of their first token, i.e., the metric path of
+    Graphite's plaintext protocol, so all messages of a series are sent in order over the same connection.  While the
+    connection of a series is down, its messages are buffered on it until it is re-established.  With failover, they
+    are sent over the next healthy connection in the pool instead, at the cost of their order: messages buffered on
+    the failed connection are sent once it is re-established, possibly after newer ones of their series.
+    """
+
+    def __init__(self, ip, port, pool_size=4, health_check_interval=5, failover=False, **connection_options):
+        """
+        :param ip: IP address of the BSD socket server.
+        :param port: Port number
+        :param pool_size: Number of connections
+        :param health_check_interval: Seconds between checks of idle connections, 0 disables them
+        :param failover: Send the messages of a series whose connection is down over the next healthy connection
+        :param connection_options: Further keyword arguments of SocketDccComms, e.g., send_timeout or buffer_size
+        """
+        self.ip = ip
+        self.port = port
+        self.pool_size = pool_size
+        self.health_check_interval = health_check_interval
+        self.failover = failover
+        self._connection_options = connection_options
+        self._closed = threading.Event()
+        self.comms_stats = CommsStats(self._state)
+        self._connect()
+        if self.health_check_interval > 0:
+            health_thread = threading.Thread(target=self._check_health_periodically, name="SocketPoolHealthCheck")
+            health_thread.daemon = True
+            health_thread.start()
+
+    def _connect(self):
+        """
+        Establishes the pooled connections.
+        :return:
+        """
+        self.client = [SocketDccComms(self.ip, self.port, comms_stats=self.comms_stats, **self._connection_options)
+                       for _ in range(self.pool_size)]
+
+    def _disconnect(self):
+        """
+        Disconnects all pooled connections.
+        :return:
+        """
+        self._closed.set()
+        for connection in self.client:
+            connection._disconnect()
+
+    def _check_health_periodically(self):
+        while not self._closed.wait(self.health_check_interval):
+            for connection in self.client:
+                connection.check_health()
+
+    def _select(self, message):
+        end = message.find(" ")
+        index = (zlib.crc32(message if end < 0 else message[:end]) & 0xffffffff) % self.pool_size
+        if self.failover:
+            for offset in range(self.pool_size):
+                connection = self.client[(index + offset) % self.pool_size]
+                if connection.client is not None:
+                    return connection
+        # Buffer on the series' own connection
+        return self.client[index]
+
+    def send(self, message, msg_attr=None):
+        """
+        Sends message over the connection of its series.
+        :param message: Message to be published, lines of a single series
+        :param msg_attr: MessagingAttribute.  It is 'None' for BSD Socket.
+        :return:
+        """
+        self._select(message).send(message)
+
+    def send_async(self, message, msg_attr=None):
+        """
+        :param message: Message to be published, lines of a single series
+        :param msg_attr: MessagingAttribute.  It is 'None' for BSD Socket.
+        :return: Future resolved once message was written to the socket, or failed if it was dropped from the buffer
+        """
+        return self._select(message).send_async(message)
+
+    def healthy_connections(self):
+        """
+        :return: Number of connected sockets in the pool
+        """
+        return sum(1 for connection in self.client if connection.client is not None)
+
+    def _state(self):
+        if self._closed.is_set():
+            return CLOSED
+        return CONNECTED if self.healthy_connections() else DISCONNECTED
+
+    def stats(self):
+        """
+        :return: Dict of the CommsStats counters of the pool, plus the counters specific to SocketDccComms summed over
+                 the pool and the number of healthy connections
+        """
+        stats = self.comms_stats.snapshot()
+        extra = ["connect_failures", "dropped_messages", "dropped_bytes", "buffered_bytes"]
+        stats.update(dict.fromkeys(extra, 0))
+        for connection in self.client:
+            for key in extra:
+                stats[key] += getattr(connection, key)
+        stats["healthy_connections"] = self.healthy_connections()
+        return stats
+
+    def receive(self, msg_attr=None):
+        """
+        Method to receive message from  BSD socket server.
+        :param msg_attr: MessagingAttributes.  It is 'None' for BSD Socket.
+        :return:
+        """
+        raise NotImplementedError
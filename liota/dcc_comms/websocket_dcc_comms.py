@@ -31,7 +31,7 @@
 # ----------------------------------------------------------------------------#
 import logging
 import Queue
-from liota.lib.transports.web_socket import WebSocket
+from liota.lib.transports.web_socket import WebSocket, AsyncWebSocket
 
 from liota.dcc_comms.dcc_comms import DCCComms
 
@@ -44,17 +44,19 @@ class WebSocketDccComms(DCCComms):
     DccComms implementation for WebSocket Transport.
     """
 
-    def __init__(self, url, verify_cert, identity=None):
+    def __init__(self, url, verify_cert, identity=None, binary=False):
         """
         Init method for WebSocketDccComms
 
         :param url: WebScoket server URL
         :param verify_cert: Boolean value to verify certificate or not
         :param identity: Identity Object
+        :param binary: Send binary frames instead of text frames
         """
         self.url = url
         self.verify_cert = verify_cert
         self.identity = identity
+        self.binary = binary
         self.userdata = Queue.Queue()
         self._connect()
 
@@ -63,7 +65,8 @@ class WebSocketDccComms(DCCComms):
         Establishes connection with a WebSocket server.
         :return:
         """
-        self.client = WebSocket(self.url, self.verify_cert, self.identity)
+        self.client = WebSocket(self.url, self.verify_cert, self.identity, self.binary)
+        self.comms_stats = self.client.comms_stats
 
     def _disconnect(self):
         """
@@ -91,3 +94,53 @@ class WebSocketDccComms(DCCComms):
         :return:
         """
         self.client.receive(self.userdata)
+
+
+class AsyncWebSocketDccComms(WebSocketDccComms):
+    """
+    WebSocketDccComms over AsyncWebSocket: send() only queues the message, so a slow or lost connection no longer
+    blocks the caller.  It can be passed to IotControlCenter like WebSocketDccComms.
+    """
+
+    def __init__(self, url, verify_cert, identity=None, binary=False, **transport_options):
+        """
+        Init method for AsyncWebSocketDccComms
+
+        :param url: WebSocket server URL
+        :param verify_cert: Boolean value to verify certificate or not
+        :param identity: Identity Object
+        :param binary: Send binary frames instead of text frames
+        :param transport_options: Keyword arguments passed on to AsyncWebSocket, e.g. queue_size or compression
+        """
+        self.transport_options = transport_options
+        super(AsyncWebSocketDccComms, self).__init__(url, verify_cert, identity, binary)
+
+    def _connect(self):
+        """
+        Starts connecting to the WebSocket server.  Connection failures are retried in the background.
+        :return:
+        """
+        self.client = AsyncWebSocket(self.url, self.verify_cert, self.identity, binary=self.binary,
+                                     **self.transport_options)
+        self.comms_stats = self.client.comms_stats
+
+    def _disconnect(self):
+        """
+        Disconnects from WebSocket server.
+        :return:
+        """
+        self.client.close()
+
+    def send_async(self, message, msg_attr=None):
+        """
+        :param message: Message to be sent.
+        :param msg_attr: MessagingAttributes Object.  It is 'None' for WebSocket.
+        :return: Future resolved once the message was written to the socket
+        """
+        return self.client.send_async(message)
+
+    def stats(self):
+        """
+        :return: dict of statistics, see AsyncWebSocket.stats()
+        """
+        return self.client.stats()
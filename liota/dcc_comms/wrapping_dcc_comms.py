@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+from abc import abstractmethod
+
+from liota.dcc_comms.dcc_comms import DCCComms
+
+
+class WrappingDccComms(DCCComms):
+    """
+    Base class of the DCCComms that change how messages are sent over another DCCComms, e.g., compressed or rate
+    limited.  Attributes the wrapper doesn't have, like identity, userdata or url, are those of the wrapped comms, and
+    its statistics are those of the wrapped comms with the wrapper's own under stats_key.
+    """
+
+    #: Key of the wrapper's own entry in stats()
+    stats_key = None
+
+    def __init__(self, comms):
+        """
+        :param comms: DCCComms the messages are sent over
+        """
+        self.comms = comms
+        self._connect()
+
+    def __getattr__(self, name):
+        if name == "comms":
+            raise AttributeError(name)
+        return getattr(self.comms, name)
+
+    @property
+    def binary(self):
+        return self.comms.binary
+
+    def _connect(self):
+        self.client = self.comms.client
+
+    def _disconnect(self):
+        self.comms._disconnect()
+
+    def receive(self, msg_attr=None):
+        """
+        Receives messages with the wrapped comms.
+
+        :param msg_attr: MessagingAttributes object of the wrapped comms
+        :return:
+        """
+        return self.comms.receive(msg_attr)
+
+    @abstractmethod
+    def _wrapper_stats(self):
+        """
+        :return: dict of the wrapper's own statistics
+        """
+        pass
+
+    def stats(self):
+        """
+        :return: dict of statistics of the wrapped comms, with the wrapper's own under stats_key
+        """
+        stats = self.comms.stats()
+        stats[self.stats_key] = self._wrapper_stats()
+        return stats
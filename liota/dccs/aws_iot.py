@@ -30,9 +30,11 @@
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
 
-import json
 import logging
+import threading
 from collections import OrderedDict
+import time
+from weakref import WeakKeyDictionary
 
 from liota.dccs.dcc import DataCenterComponent
 from liota.entities.registered_entity import RegisteredEntity
@@ -40,24 +42,61 @@ from liota.entities.edge_systems.edge_system import EdgeSystem
 from liota.entities.devices.device import Device
 from liota.entities.metrics.metric import Metric
 from liota.entities.metrics.registered_metric import RegisteredMetric
+from liota.lib.utilities.future import Future, gather
 from liota.lib.utilities.si_unit import parse_unit, UnsupportedUnitError
 
 log = logging.getLogger(__name__)
 
+# Maximum size in bytes of a message published to AWS IoT
+AWS_IOT_MAX_PAYLOAD_SIZE = 128 * 1024
+
+
+class _MetricGroup(object):
+    """
+    Samples of the metrics of one Device or EdgeSystem waiting to be published in one aggregated payload.
+    """
+    def __init__(self, deadline):
+        self.deadline = deadline
+        # metric name -> (metric entry without samples, samples), in the order the metrics were first published
+        self.metrics = OrderedDict()
+        # Futures of publish_async() calls resolved once the group is delivered
+        self.futures = []
+        self.size = 0
+
 
 class AWSIoT(DataCenterComponent):
     """
     DCC for AWSIoT Platform.
     """
-    def __init__(self, con, enclose_metadata=False):
+    def __init__(self, con, enclose_metadata=False, codec=None, aggregation_window=0,
+                 max_payload_size=AWS_IOT_MAX_PAYLOAD_SIZE):
         """
         :param con: DccComms Object
         :param enclose_metadata: Include Gateway, Device and Metric names as part of payload or not
+        :param codec: Codec Object or codec name used to encode the payloads, JSON if None
+        :param aggregation_window: Seconds for which the samples of all metrics of a Device or EdgeSystem are
+                                   collected and published as one payload.  0 publishes every metric separately.
+                                   Metrics with their own 'msg_attr' are always published separately.
+        :param max_payload_size: Size in bytes aggregated payloads are split at
         """
         super(AWSIoT, self).__init__(
-            comms=con
+            comms=con,
+            codec=codec
         )
         self.enclose_metadata = enclose_metadata
+        # RegisteredMetric -> (hierarchy version, payload header, encoded header prefix)
+        self._payload_headers = WeakKeyDictionary()
+        # Incremented whenever a relationship changes, which invalidates every cached payload header
+        self._hierarchy_version = 0
+        self.aggregation_window = aggregation_window
+        self.max_payload_size = max_payload_size
+        # parent RegisteredEntity -> _MetricGroup
+        self._metric_groups = {}
+        self._groups_cond = threading.Condition(threading.Lock())
+        if self.aggregation_window > 0:
+            flush_thread = threading.Thread(target=self._flush_groups_periodically, name="AWSIoTAggregation")
+            flush_thread.daemon = True
+            flush_thread.start()
 
     def register(self, entity_obj):
         """
@@ -100,6 +139,9 @@ class AWSIoT(DataCenterComponent):
             raise TypeError("reg_entity_child should either be a Registered Device or Metric")
 
         reg_entity_child.parent = reg_entity_parent
+        self._hierarchy_version += 1
+        if isinstance(reg_entity_child, RegisteredMetric):
+            self._get_payload_header(reg_entity_child)
 
     def _get_entity_hierarchy(self, reg_entity):
         """
@@ -125,57 +167,244 @@ class AWSIoT(DataCenterComponent):
 
         return extract_hierarchy(reg_entity)
 
-    def _format_data(self, reg_metric):
+    def _get_payload_header(self, reg_metric):
         """
         :param reg_metric: Registered Metric Object
-        :return: Payload in JSON format
+        :return: (payload header, encoded header prefix) of the metric.  The prefix is the header encoded as an
+                 unterminated JSON object, or None if the codec is not JSON.
         """
-        met_cnt = reg_metric.values.qsize()
-        if 0 == met_cnt:
-            return
+        cached = self._payload_headers.get(reg_metric)
+        if cached is not None and cached[0] == self._hierarchy_version:
+            return cached[1], cached[2]
+        hierarchy_version = self._hierarchy_version
+        header = self._build_payload_header(reg_metric)
+        prefix = None
+        if self.codec.name in ("json", "fast_json"):
+            prefix = self.codec.encode(header)[:-1] + ',"metric_data":'
+        self._payload_headers[reg_metric] = (hierarchy_version, header, prefix)
+        return header, prefix
 
-        _list = []
-        for _ in range(met_cnt):
-            m = reg_metric.values.get(block=True)
-            if m is not None:
-                _list.append(OrderedDict([('value', m[1]), ('timestamp', m[0])]))
-
-        payload = OrderedDict()
+    def _build_payload_header(self, reg_metric):
+        """
+        :param reg_metric: Registered Metric Object
+        :return: Dict with every payload field except metric_data
+        """
+        header = {}
         if self.enclose_metadata:
             _entity_hierarchy = self._get_entity_hierarchy(reg_metric)
             #  EdgeSystem and Device's name will be added with payload
             if len(_entity_hierarchy) == 3:
-                payload['edge_system_name'] = _entity_hierarchy[0]
-                payload['device_name'] = _entity_hierarchy[1]
+                header['edge_system_name'] = _entity_hierarchy[0]
+                header['device_name'] = _entity_hierarchy[1]
             # EdgeSystem's name will be added with payload
             elif len(_entity_hierarchy) == 2:
-                payload['edge_system_name'] = _entity_hierarchy[0]
+                header['edge_system_name'] = _entity_hierarchy[0]
             else:
                 # Not raising error.
                 # Metrics can be published even if error occurred while
                 # constructing payload for enclose_metadata
                 log.error("Error occurred while constructing payload")
-        payload['metric_name'] = reg_metric.ref_entity.name
-        payload['metric_data'] = [_ for _ in _list]
+        header['metric_name'] = reg_metric.ref_entity.name
         # TODO: Make this as part of si_unit.py
         # Handling Base, Derived and Prefixed Units
         if reg_metric.ref_entity.unit is None:
-            payload['unit'] = 'null'
+            header['unit'] = 'null'
         else:
             try:
                 unit_tuple = parse_unit(reg_metric.ref_entity.unit)
                 if unit_tuple[0] is None:
                     # Base and Derived Units
-                    payload['unit'] = unit_tuple[1]
+                    header['unit'] = unit_tuple[1]
                 else:
                     # Prefixed or non-SI Units
-                    payload['unit'] = unit_tuple[0] + unit_tuple[1]
+                    header['unit'] = unit_tuple[0] + unit_tuple[1]
             except UnsupportedUnitError as err:
                 # Not raising error.
                 # Metrics can be published even if unit is unsupported
-                payload['unit'] = 'null'
+                header['unit'] = 'null'
                 log.error(str(err))
-        return json.dumps(payload)
+        return header
+
+    def _get_samples(self, reg_metric):
+        """
+        :param reg_metric: Registered Metric Object
+        :return: List of samples taken from the metric's values queue
+        """
+        _list = []
+        for _ in range(reg_metric.values.qsize()):
+            m = reg_metric.values.get(block=True)
+            if m is not None:
+                _list.append({'value': m[1], 'timestamp': m[0]})
+        return _list
+
+    def _format_data(self, reg_metric):
+        """
+        :param reg_metric: Registered Metric Object
+        :return: Payload encoded with the DCC's codec
+        """
+        if 0 == reg_metric.values.qsize():
+            return
+        _list = self._get_samples(reg_metric)
+
+        # Only the samples are encoded per publish, the rest of the payload is cached per metric
+        header, prefix = self._get_payload_header(reg_metric)
+        if prefix is not None:
+            return prefix + self.codec.encode(_list) + '}'
+        payload = dict(header)
+        payload['metric_data'] = _list
+        return self.codec.encode(payload)
+
+    def publish(self, reg_metric):
+        """
+        Publishes the metric's samples, or adds them to the aggregated payload of its parent if an aggregation
+        window is configured and the metric has no 'msg_attr' of its own.
+
+        :param reg_metric: RegisteredMetric Object
+        :return:
+        """
+        if self.aggregation_window <= 0 or getattr(reg_metric, 'msg_attr', None):
+            return super(AWSIoT, self).publish(reg_metric)
+        self._aggregate(reg_metric, None)
+
+    def publish_async(self, reg_metric, timeout=None):
+        """
+        Asynchronous version of publish().  The Future of an aggregated metric is resolved once every payload of
+        its aggregation window is delivered.
+
+        :param reg_metric: RegisteredMetric Object
+        :param timeout: Seconds to wait for a free slot in the publish window.  None waits forever.
+        :return: Future resolved once the message is delivered
+        """
+        if self.aggregation_window <= 0 or getattr(reg_metric, 'msg_attr', None):
+            return super(AWSIoT, self).publish_async(reg_metric, timeout)
+        future = Future()
+        self._aggregate(reg_metric, future)
+        return future
+
+    def _aggregate(self, reg_metric, future):
+        """
+        Adds the metric's samples to the aggregated payload of its parent.
+
+        :param reg_metric: RegisteredMetric Object
+        :param future: Future to resolve once the samples are delivered, or None
+        :return:
+        """
+        if not isinstance(reg_metric, RegisteredMetric):
+            log.error("RegisteredMetric object is expected.")
+            raise TypeError("RegisteredMetric object is expected.")
+        _list = self._get_samples(reg_metric)
+        if not _list:
+            if future is not None:
+                future.set_result(None)
+            return
+        header, _ = self._get_payload_header(reg_metric)
+        size = len(self.codec.encode(_list))
+        with self._groups_cond:
+            group = self._metric_groups.get(reg_metric.parent)
+            if group is None:
+                group = _MetricGroup(time.time() + self.aggregation_window)
+                self._metric_groups[reg_metric.parent] = group
+                self._groups_cond.notify()
+            if header['metric_name'] not in group.metrics:
+                group.metrics[header['metric_name']] = ({'metric_name': header['metric_name'],
+                                                         'unit': header['unit']}, [])
+            group.metrics[header['metric_name']][1].extend(_list)
+            if future is not None:
+                group.futures.append(future)
+            group.size += size
+            full = group.size >= self.max_payload_size
+            if full:
+                del self._metric_groups[reg_metric.parent]
+        if full:
+            self._publish_group(reg_metric.parent, group)
+
+    def flush(self):
+        """
+        Publishes the aggregated payloads right away instead of at the end of their aggregation window.
+        :return:
+        """
+        with self._groups_cond:
+            groups = self._metric_groups.items()
+            self._metric_groups = {}
+        for parent, group in groups:
+            self._publish_group(parent, group)
+
+    def _flush_groups_periodically(self):
+        while True:
+            with self._groups_cond:
+                while not self._metric_groups:
+                    self._groups_cond.wait()
+                now = time.time()
+                due = [parent for parent, group in self._metric_groups.items() if group.deadline <= now]
+                if not due:
+                    self._groups_cond.wait(min(group.deadline for group in self._metric_groups.values()) - now)
+                    continue
+                groups = [(parent, self._metric_groups.pop(parent)) for parent in due]
+            for parent, group in groups:
+                try:
+                    self._publish_group(parent, group)
+                except Exception:
+                    log.exception("Exception while publishing aggregated metrics")
+
+    def _publish_group(self, parent, group):
+        """
+        Publishes the samples of a metric group in as few payloads under max_payload_size as possible.
+
+        :param parent: RegisteredEntity the metrics belong to, or None
+        :param group: _MetricGroup
+        :return:
+        """
+        payload = {}
+        if self.enclose_metadata and parent is not None:
+            hierarchy = self._get_entity_hierarchy(parent)
+            if isinstance(parent.ref_entity, EdgeSystem):
+                payload['edge_system_name'] = hierarchy[-1]
+            else:
+                if len(hierarchy) == 2:
+                    payload['edge_system_name'] = hierarchy[0]
+                payload['device_name'] = hierarchy[-1]
+        payload['metrics'] = []
+        overhead = len(self.codec.encode(payload))
+        size = overhead
+        sends = []
+        for entry, samples in group.metrics.values():
+            for metric in self._split_entry(entry, samples, self.max_payload_size - overhead):
+                metric_size = len(self.codec.encode(metric)) + 1
+                if payload['metrics'] and size + metric_size > self.max_payload_size:
+                    sends.append(self.comms.send_async(self.codec.encode(payload), None))
+                    payload['metrics'] = []
+                    size = overhead
+                payload['metrics'].append(metric)
+                size += metric_size
+        if payload['metrics']:
+            sends.append(self.comms.send_async(self.codec.encode(payload), None))
+        if group.futures:
+            def on_delivered(delivered):
+                for future in group.futures:
+                    if delivered.exception() is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(delivered.exception())
+
+            gather(sends).add_done_callback(on_delivered)
+        for send in sends:
+            if send.done() and send.exception() is not None:
+                raise send.exception()
+
+    def _split_entry(self, entry, samples, max_size):
+        """
+        :param entry: Metric entry without samples
+        :param samples: Samples of the metric
+        :param max_size: Size in bytes an encoded metric entry should not exceed
+        :return: List of metric entries holding the samples, each encoded in at most max_size bytes unless it
+                 holds a single sample
+        """
+        metric = dict(entry)
+        metric['metric_data'] = samples
+        if len(samples) <= 1 or len(self.codec.encode(metric)) <= max_size:
+            return [metric]
+        half = len(samples) // 2
+        return self._split_entry(entry, samples[:half], max_size) + self._split_entry(entry, samples[half:], max_size)
 
     def set_properties(self, reg_entity, properties):
         raise NotImplementedError
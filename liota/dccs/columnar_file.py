@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import logging
+
+from liota.dccs.dcc import DataCenterComponent
+from liota.dcc_comms.columnar_file_dcc_comms import ColumnarFileDccComms
+from liota.entities.metrics.metric import Metric
+from liota.entities.metrics.registered_metric import RegisteredMetric
+from liota.entities.registered_entity import RegisteredEntity
+
+log = logging.getLogger(__name__)
+
+
+class ColumnarFile(DataCenterComponent):
+    """
+    DCC keeping full-resolution metric data on the edge system in local columnar segment files, to be read back or
+    exported later.  Each metric is stored as a series named after its EdgeSystem, Device and Metric names joined
+    by dots, e.g. EdgeSystem-1.Device-1.temperature.
+    """
+    def __init__(self, comms):
+        """
+        Init method for ColumnarFile DCC.
+
+        :param comms: ColumnarFileDccComms Object.
+        """
+        if not isinstance(comms, ColumnarFileDccComms):
+            log.error("ColumnarFileDccComms object is expected.")
+            raise TypeError("ColumnarFileDccComms object is expected.")
+        super(ColumnarFile, self).__init__(
+            comms=comms
+        )
+
+    def register(self, entity_obj):
+        """
+        Since the columnar store doesn't require any registration, we simply return RegisteredEntity Object.
+
+        :param entity_obj: Metric or Entity Object.
+        :return: RegisteredMetric or RegisteredEntity Object.
+        """
+        log.info("Registering resource with ColumnarFile DCC {0}".format(entity_obj.name))
+        if isinstance(entity_obj, Metric):
+            return RegisteredMetric(entity_obj, self, None)
+        else:
+            return RegisteredEntity(entity_obj, self, None)
+
+    def create_relationship(self, reg_entity_parent, reg_entity_child):
+        """
+        This method creates Parent-Child relationship.  Supported relationships are:
+
+               EdgeSystem
+                   |                                      EdgeSystem
+                Device                   (or)                |
+                   |                                    RegisteredMetric
+             RegisteredMetric
+
+        :param reg_entity_parent: Registered EdgeSystem or Registered Device Object
+        :param reg_entity_child:  Registered Device or Registered Metric Object
+        :return: None
+        """
+        reg_entity_child.parent = reg_entity_parent
+
+    def series_name(self, reg_metric):
+        """
+        :param reg_metric: RegisteredMetric Object
+        :return: Name of the series the metric is stored as
+        """
+        names = []
+        reg_entity = reg_metric
+        while reg_entity is not None:
+            names.insert(0, reg_entity.ref_entity.name)
+            reg_entity = reg_entity.parent
+        return ".".join(names)
+
+    def _format_data(self, reg_metric):
+        """
+        :param reg_metric: RegisteredMetric Object.
+        :return: List with one (series name, list of (timestamp, value) tuples) tuple
+        """
+        met_cnt = reg_metric.values.qsize()
+        if met_cnt == 0:
+            return
+        samples = []
+        for _ in range(met_cnt):
+            v = reg_metric.values.get(block=True)
+            if v is not None:
+                samples.append(v)
+        if not samples:
+            return
+        return [(self.series_name(reg_metric), samples)]
+
+    def series(self):
+        """
+        :return: Sorted list of the stored series names
+        """
+        return self.comms.client.series()
+
+    def read(self, series, start=None, end=None):
+        """
+        :param series: Series name, see series_name()
+        :param start: First timestamp in milliseconds to return, None for the oldest sample
+        :param end: Last timestamp in milliseconds to return, None for the newest sample
+        :return: List of (timestamp, value) tuples sorted by timestamp
+        """
+        return self.comms.client.read(series, start, end)
+
+    def export(self, fileobj, series=None, start=None, end=None):
+        """
+        Writes the stored samples as CSV lines of series,timestamp,value.
+
+        :param fileobj: File object to write to
+        :param series: List of series names, None for all series
+        :param start: First timestamp in milliseconds to export, None for the oldest sample
+        :param end: Last timestamp in milliseconds to export, None for the newest sample
+        :return: Number of exported samples
+        """
+        return self.comms.client.export(fileobj, series, start, end)
+
+    def set_properties(self, reg_entity, properties):
+        raise NotImplementedError
+
+    def unregister(self, entity_obj):
+        raise NotImplementedError
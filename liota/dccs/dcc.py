@@ -31,11 +31,16 @@
 # ----------------------------------------------------------------------------#
 
 import logging
+import threading
+import time
 from abc import ABCMeta, abstractmethod
 
 from liota.entities.entity import Entity
 from liota.dcc_comms.dcc_comms import DCCComms
 from liota.entities.metrics.registered_metric import RegisteredMetric
+from liota.lib.utilities.future import Future, FutureTimeoutError
+from liota.lib.utilities.serialization import get_codec
+from liota.lib.utilities.utility import read_liota_config
 
 log = logging.getLogger(__name__)
 
@@ -48,16 +53,24 @@ class DataCenterComponent:
     __metaclass__ = ABCMeta
 
     @abstractmethod
-    def __init__(self, comms):
+    def __init__(self, comms, codec=None):
         """
         Abstract init method for DCC (Data Center Component).
 
         :param comms: DccComms Object
+        :param codec: Codec Object or name of the codec ("json", "fast_json", "msgpack" or "cbor") used to encode
+                      published and decode received messages.  JSON is used if None.
         """
         if not isinstance(comms, DCCComms):
             log.error("DCCComms object is expected.")
             raise TypeError("DCCComms object is expected.")
         self.comms = comms
+        self.codec = get_codec(codec)
+        # Maximum number of messages published with publish_async() that may wait for their delivery, read from
+        # liota.conf on the first publish_async() unless set before
+        self.publish_window = None
+        self._pending_publishes = 0
+        self._publish_window_cond = threading.Condition(threading.Lock())
 
     @abstractmethod
     def register(self, entity_obj):
@@ -117,6 +130,47 @@ class DataCenterComponent:
             else:
                 self.comms.send(message, None)
 
+    def publish_async(self, reg_metric, timeout=None):
+        """
+        Publishes the formatted message to the Dcc using DccComms without waiting for its delivery.  Blocks only while
+        publish_window messages are already waiting for their delivery.
+
+        :param reg_metric: RegisteredMetricObject.
+        :param timeout: Seconds to wait for a free slot in the publish window.  None waits forever.
+        :return: Future resolved once the DccComms reports the message as delivered, e.g., acknowledged by the MQTT
+                 broker for QoS 1 and 2.  It is resolved with None right away if there was nothing to publish.
+        """
+        if not isinstance(reg_metric, RegisteredMetric):
+            log.error("RegisteredMetric object is expected.")
+            raise TypeError("RegisteredMetric object is expected.")
+        message = self._format_data(reg_metric)
+        if not message:
+            future = Future()
+            future.set_result(None)
+            return future
+        if self.publish_window is None:
+            self.publish_window = int(read_liota_config('CORE_CFG', 'publish_window'))
+        deadline = None if timeout is None else time.time() + timeout
+        with self._publish_window_cond:
+            while self._pending_publishes >= self.publish_window:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise FutureTimeoutError("Publish window is full")
+                self._publish_window_cond.wait(remaining)
+            self._pending_publishes += 1
+        try:
+            future = self.comms.send_async(message, getattr(reg_metric, 'msg_attr', None))
+        except Exception:
+            self._release_publish_slot()
+            raise
+        future.add_done_callback(lambda _: self._release_publish_slot())
+        return future
+
+    def _release_publish_slot(self):
+        with self._publish_window_cond:
+            self._pending_publishes -= 1
+            self._publish_window_cond.notify()
+
     @abstractmethod
     def set_properties(self, reg_entity, properties):
         """
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import logging
+import re
+from weakref import WeakKeyDictionary
+
+from liota.dccs.dcc import DataCenterComponent
+from liota.entities.edge_systems.edge_system import EdgeSystem
+from liota.entities.metrics.metric import Metric
+from liota.entities.metrics.registered_metric import RegisteredMetric
+from liota.entities.registered_entity import RegisteredEntity
+
+log = logging.getLogger(__name__)
+
+_MEASUREMENT_ESCAPE = re.compile(r'([, \\])')
+_TAG_ESCAPE = re.compile(r'([,= \\])')
+_STRING_FIELD_ESCAPE = re.compile(r'(["\\])')
+
+
+def _escape_measurement(name):
+    return _MEASUREMENT_ESCAPE.sub(r'\\\1', name)
+
+
+def _escape_tag(name):
+    return _TAG_ESCAPE.sub(r'\\\1', name)
+
+
+def _format_field_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    # InfluxDB rejects a whole batch if a field was written with another type before, so integer samples of a
+    # metric that also reports fractional values are written as floats too
+    if isinstance(value, (int, long, float)):
+        return repr(float(value))
+    return '"%s"' % _STRING_FIELD_ESCAPE.sub(r'\\\1', unicode(value).encode("utf-8"))
+
+
+class InfluxDB(DataCenterComponent):
+    """
+    DCC writing metrics to InfluxDB in line protocol, e.g., through HttpDccComms with the URL
+    http://<host>:8086/write?db=<database>&precision=ms.  Timestamps are written in milliseconds, so the URL must
+    select the ms precision.
+
+    Each metric is written as a measurement named after the metric with a single "value" field, tagged with the
+    names of its EdgeSystem and Device.
+    """
+    def __init__(self, comms, tags=None):
+        """
+        :param comms: DccComms Object, usually HttpDccComms
+        :param tags: Dict of tags added to every point
+        """
+        super(InfluxDB, self).__init__(
+            comms=comms
+        )
+        self.tags = tags or {}
+        # RegisteredMetric -> (hierarchy version, line prefix)
+        self._line_prefixes = WeakKeyDictionary()
+        # Incremented whenever a relationship changes, which invalidates every cached line prefix
+        self._hierarchy_version = 0
+
+    def register(self, entity_obj):
+        """
+        Since InfluxDB doesn't require any registration, we simply return RegisteredEntity Object.
+
+        :param entity_obj: Metric or Entity Object.
+        :return: RegisteredMetric or RegisteredEntity Object.
+        """
+        log.info("Registering resource with InfluxDB DCC {0}".format(entity_obj.name))
+        if isinstance(entity_obj, Metric):
+            return RegisteredMetric(entity_obj, self, None)
+        else:
+            return RegisteredEntity(entity_obj, self, None)
+
+    def create_relationship(self, reg_entity_parent, reg_entity_child):
+        """
+        This method creates Parent-Child relationship.  Supported relationships are:
+
+               EdgeSystem
+                   |                                      EdgeSystem
+                Device                   (or)                |
+                   |                                    RegisteredMetric
+             RegisteredMetric
+
+        :param reg_entity_parent: Registered EdgeSystem or Registered Device Object
+        :param reg_entity_child:  Registered Device or Registered Metric Object
+        :return: None
+        """
+        reg_entity_child.parent = reg_entity_parent
+        self._hierarchy_version += 1
+
+    def _get_line_prefix(self, reg_metric):
+        """
+        :param reg_metric: RegisteredMetric Object
+        :return: Escaped measurement and tags of the metric's points followed by " value="
+        """
+        cached = self._line_prefixes.get(reg_metric)
+        if cached is not None and cached[0] == self._hierarchy_version:
+            return cached[1]
+        hierarchy_version = self._hierarchy_version
+        tags = dict(self.tags)
+        parent = reg_metric.parent
+        while parent is not None:
+            if isinstance(parent.ref_entity, EdgeSystem):
+                tags["edge_system"] = parent.ref_entity.name
+            else:
+                tags["device"] = parent.ref_entity.name
+            parent = parent.parent
+        prefix = _escape_measurement(reg_metric.ref_entity.name)
+        # Sorted tags are what InfluxDB stores, so it does not need to sort them again
+        for key in sorted(tags):
+            prefix += ",%s=%s" % (_escape_tag(key), _escape_tag(tags[key]))
+        prefix += " value="
+        self._line_prefixes[reg_metric] = (hierarchy_version, prefix)
+        return prefix
+
+    def _format_data(self, reg_metric):
+        """
+        :param reg_metric: RegisteredMetric Object.
+        :return: Newline terminated points in line protocol
+        """
+        met_cnt = reg_metric.values.qsize()
+        if met_cnt == 0:
+            return
+        prefix = self._get_line_prefix(reg_metric)
+        lines = []
+        for _ in range(met_cnt):
+            v = reg_metric.values.get(block=True)
+            if v is not None:
+                lines.append("%s%s %d\n" % (prefix, _format_field_value(v[1]), v[0]))
+        if not lines:
+            return
+        return "".join(lines)
+
+    def set_properties(self, reg_entity, properties):
+        raise NotImplementedError
+
+    def unregister(self, entity_obj):
+        raise NotImplementedError
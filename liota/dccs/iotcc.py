@@ -30,23 +30,27 @@
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
 
-import json
 import sys
 import logging
 import time
 import threading
 import ConfigParser
 import os
-import Queue
 import datetime
+# datetime.strptime() imports _strptime on first use, which is not thread safe in Python 2
+import _strptime
+import Queue
 from time import gmtime, strftime
 from threading import Lock
 import ast
+import re
 from re import match
 
 from liota.dccs.dcc import DataCenterComponent, RegistrationFailure
 from liota.entities.metrics.metric import Metric
 from liota.lib.utilities.utility import LiotaConfigPath, getUTCmillis, mkdir, read_liota_config
+from liota.lib.utilities.future import Future, FutureTimeoutError, CompletionExecutor
+from liota.lib.utilities.entity_store import EntityStore, write_json_file
 from liota.lib.utilities.si_unit import parse_unit
 from liota.entities.metrics.registered_metric import RegisteredMetric
 from liota.entities.registered_entity import RegisteredEntity
@@ -54,12 +58,32 @@ from liota.entities.registered_entity import RegisteredEntity
 log = logging.getLogger(__name__)
 timeout = int(read_liota_config('IOTCC_PATH', 'iotcc_response_timeout'))
 
+# Namespaces of the local entity store
+_NS_IOTCC = "iotcc"
+_NS_DEVICE_FILE = "dev_file"
+_NS_ENTITY_FILE = "entity_file"
+_NS_REGISTRATION = "registration"
+_NS_RELATIONSHIP = "relationship"
+_EDGE_SYSTEM_KEY = "EdgeSystem"
+# transactionID of a response, read without decoding the whole message
+_TRANSACTION_ID_RE = re.compile(r'"transactionID"\s*:\s*(-?\d+)')
+
 
 class Request:
-    def __init__(self, transaction_id, user_queue):
+    def __init__(self, transaction_id, response_future):
         # assume transaction_id will be unique in one process
         self.transaction_id = transaction_id
-        self.user_queue = user_queue
+        self.response_future = response_future
+        self.deadline = time.time() + timeout
+
+
+class PropertyBatch:
+    def __init__(self, reg_entity_obj, deadline):
+        # properties of one entity merged into a single add_properties_request
+        self.reg_entity_obj = reg_entity_obj
+        self.properties = {}
+        self.futures = []
+        self.deadline = deadline
 
 
 class IotControlCenter(DataCenterComponent):
@@ -67,16 +91,20 @@ class IotControlCenter(DataCenterComponent):
 
     """
 
-    def __init__(self, con):
+    def __init__(self, con, codec=None):
         """
         Initialization of IoT Pulse Center
 
         :param con: DCC Comms connection Object
+        :param codec: Codec Object or codec name used for requests and responses, JSON if None
         """
         log.info("Logging into DCC")
+        super(IotControlCenter, self).__init__(
+            comms=con,
+            codec=codec
+        )
         self._dcc_load_time = datetime.datetime.now()
         self._version = 20171118
-        self.comms = con
         if not self.comms.identity.username:
             log.error("Username not found")
             raise ValueError("Username not found")
@@ -89,22 +117,72 @@ class IotControlCenter(DataCenterComponent):
         recv_thread.start()
         # Wait for Subscription to be complete and then proceed to publish message
         time.sleep(0.5)
+        # Local entity store indexed by registered entity UUID, exported to the legacy files periodically
+        self._entity_store = EntityStore(read_liota_config('IOTCC_PATH', 'iotcc_store_path'))
+        self._export_interval = float(read_liota_config('IOTCC_PATH', 'iotcc_export_interval'))
+        self._export_lock = Lock()
         self._iotcc_json = self._create_iotcc_json()
-        self._iotcc_json_load_retry = int(read_liota_config('IOTCC_PATH', 'iotcc_load_retry'))
         self.enable_reboot_getprop = read_liota_config('IOTCC_PATH', 'enable_reboot_getprop')
         self._sys_properties = read_liota_config('IOTCC_PATH', 'system_properties')
         self.counter = 0
         self._recv_msg_queue = self.comms.userdata
         self._req_ops_lock = Lock()
         self._req_dict = {}
+        # Number of requests that may wait for their responses at the same time
+        self._max_in_flight = int(read_liota_config('IOTCC_PATH', 'iotcc_max_in_flight'))
+        self._in_flight = 0
+        self._in_flight_cond = threading.Condition(Lock())
+        self._completion_executor = CompletionExecutor(
+            int(read_liota_config('IOTCC_PATH', 'iotcc_completion_threads')), name="IotccCompletion")
+        # Responses are completed by iotcc_dispatch_threads workers, each owning the transactions with
+        # transaction_id // 2 % iotcc_dispatch_threads equal to its index
+        self._dispatch_shards = []
+        for index in range(int(read_liota_config('IOTCC_PATH', 'iotcc_dispatch_threads'))):
+            shard = Queue.Queue()
+            shard_thread = threading.Thread(target=self._complete_responses, args=(shard,),
+                                            name="IotccDispatch-{0}".format(index))
+            shard_thread.daemon = True
+            shard_thread.start()
+            self._dispatch_shards.append(shard)
+        # transaction IDs of expired requests mapped to the time until their late responses are expected
+        self._expired_ids = {}
         dispatch_thread = threading.Thread(target=self._dispatch_recvd_msg)
         dispatch_thread.daemon = True
         # This thread will continuously run in background to check and dispatch received responses
         dispatch_thread.start()
+        reap_thread = threading.Thread(target=self._reap_expired_requests)
+        reap_thread.daemon = True
+        # This thread will continuously run in background to fail requests whose response did not arrive in time
+        reap_thread.start()
         self.dev_file_path = self._get_file_storage_path("dev_file_path")
         # Liota internal entity file system path special for iotcc
         self.entity_file_path = self._get_file_storage_path("entity_file_path")
+        if self._entity_store.count(_NS_ENTITY_FILE) == 0:
+            # Migrate entity files written before the entity store was introduced
+            self._entity_store.import_files(_NS_ENTITY_FILE, self.entity_file_path)
         self.file_ops_lock = Lock()
+        export_thread = threading.Thread(target=self._export_entity_files_periodically)
+        export_thread.daemon = True
+        # This thread will continuously run in background to export changed entity details to the legacy files
+        export_thread.start()
+        # Entities registered by earlier runs are resumed from the registration cache without waiting for IoTCC,
+        # and their registrations, relationships and properties are reconciled with IoTCC in background
+        self._registration_cache_ttl = int(read_liota_config('IOTCC_PATH', 'iotcc_registration_cache_ttl'))
+        # UUIDs of resumed entities mapped to the RegisteredEntity and RegisteredMetric Objects carrying them, so
+        # that they can be updated if IoTCC confirms the registration with another UUID
+        self._resumed_entities = {}
+        self._reconcile_queue = Queue.Queue()
+        reconcile_thread = threading.Thread(target=self._reconcile_resumed_entities)
+        reconcile_thread.daemon = True
+        reconcile_thread.start()
+        # Property changes of an entity (units, system and user properties) are merged and sent as one
+        # add_properties_request once no further change arrived for iotcc_property_flush_delay seconds
+        self._property_flush_delay = float(read_liota_config('IOTCC_PATH', 'iotcc_property_flush_delay'))
+        self._pending_properties = {}
+        self._properties_cond = threading.Condition(Lock())
+        flush_thread = threading.Thread(target=self._flush_properties_periodically)
+        flush_thread.daemon = True
+        flush_thread.start()
 
     def register(self, entity_obj):
         """
@@ -113,68 +191,102 @@ class IotControlCenter(DataCenterComponent):
         :param entity_obj: Metric or Entity Object
         :return: RegisteredMetric or RegisteredEntity Object
         """
+        return self._wait(self.register_async(entity_obj))
+
+    def register_async(self, entity_obj):
+        """
+        Asynchronous version of register().  The registration request is sent immediately and the caller is not
+        blocked waiting for the response, so that many registrations can be in flight at once.
+        :param entity_obj: Metric or Entity Object
+        :return: Future resolved with the RegisteredMetric or RegisteredEntity Object
+        """
         self._assert_input(entity_obj.name, 50)
         self._assert_input(entity_obj.entity_type, 50)
 
         if isinstance(entity_obj, Metric):
             # reg_entity_id should be parent's one: not known here yet
             # will add in creat_relationship(); publish_unit should be done inside
-            return RegisteredMetric(entity_obj, self, None)
+            future = Future()
+            future.set_result(RegisteredMetric(entity_obj, self, None))
+            return future
+        if entity_obj.entity_type == "EdgeSystem":
+            entity_obj.entity_type = "HelixGateway"
+        reg_entity_id = self._get_cached_registration(entity_obj)
+        if reg_entity_id is not None:
+            return self._resume_registration(entity_obj, reg_entity_id)
+        return self._register_with_iotcc(entity_obj)
+
+    def _register_with_iotcc(self, entity_obj):
+        # finally will create a RegisteredEntity
+        log.info("Registering resource with IoTCC {0}".format(entity_obj.name))
+        response_future = self._send_request(
+            lambda transaction_id: self._registration(transaction_id, entity_obj.entity_id, entity_obj.name,
+                                                      entity_obj.entity_type))
+        return self._then(response_future, lambda msg: self._on_registration_response(entity_obj, msg))
+
+    def _on_registration_response(self, entity_obj, msg):
+        """
+        Completes the registration of an entity once its create_or_find_resource_response is received.
+        :param entity_obj: Entity Object being registered
+        :param msg: response message received
+        :return: RegisteredEntity Object
+        """
+        log.debug("Received msg: {0}".format(msg))
+        json_msg = self.codec.decode(msg)
+        log.debug("Processing msg: {0}".format(json_msg["type"]))
+        self._check_version(json_msg)
+        if json_msg["type"] != "create_or_find_resource_response" or json_msg["body"]["uuid"] == "null" or \
+                json_msg["body"]["id"] != entity_obj.entity_id:
+            log.error("Registration of resource {0} failed with response {1}".format(entity_obj.name, msg))
+            raise RegistrationFailure()
+        reg_entity_id = json_msg["body"]["uuid"]
+        log.info("FOUND RESOURCE: {0}".format(reg_entity_id))
+        log.info("Resource Registered {0}".format(entity_obj.name))
+        if self._registration_cache_ttl > 0:
+            self._entity_store.put(_NS_REGISTRATION, entity_obj.entity_id,
+                                   self._registration_cache_entry(entity_obj, reg_entity_id))
+        if entity_obj.entity_type == "HelixGateway":
+            with self.file_ops_lock:
+                self._store_reg_entity_details(entity_obj.entity_type, entity_obj.name, reg_entity_id,
+                                               entity_obj.entity_id)
+            stored = self._store_reg_entity_attributes_async("EdgeSystem", entity_obj, reg_entity_id, None, None)
         else:
-            # finally will create a RegisteredEntity
-            log.info("Registering resource with IoTCC {0}".format(entity_obj.name))
-            reg_resp_q = Queue.Queue()
-
-            def on_response(msg, reg_resp_q):
-                log.debug("Received msg: {0}".format(msg))
-                json_msg = json.loads(msg)
-                log.debug("Processing msg: {0}".format(json_msg["type"]))
-                self._check_version(json_msg)
-                if json_msg["type"] == "create_or_find_resource_response" and json_msg["body"]["uuid"] != "null" and \
-                                json_msg["body"]["id"] == entity_obj.entity_id:
-                    log.info("FOUND RESOURCE: {0}".format(json_msg["body"]["uuid"]))
-                    self.reg_entity_id = json_msg["body"]["uuid"]
-                else:
-                    log.info("Waiting for resource creation")
-                    on_response(reg_resp_q.get(True, timeout), reg_resp_q)
-
-            if entity_obj.entity_type == "EdgeSystem":
-                entity_obj.entity_type = "HelixGateway"
-            transaction_id = self._next_id()
-            req = Request(transaction_id, reg_resp_q)
-            log.debug("Updating resource registration queue for transaction_id:{0}".format(transaction_id))
-            with self._req_ops_lock:
-                self._req_dict.update({transaction_id: req})
-            self.comms.send(json.dumps(
-                self._registration(transaction_id, entity_obj.entity_id, entity_obj.name, entity_obj.entity_type)))
-            on_response(reg_resp_q.get(True, timeout), reg_resp_q)
-            if not self.reg_entity_id:
-                raise RegistrationFailure()
-            log.info("Resource Registered {0}".format(entity_obj.name))
-            if entity_obj.entity_type == "HelixGateway":
-                with self.file_ops_lock:
-                    self._store_reg_entity_details(entity_obj.entity_type, entity_obj.name, self.reg_entity_id,
-                                                   entity_obj.entity_id)
-                    self._store_reg_entity_attributes("EdgeSystem", entity_obj,
-                                                      self.reg_entity_id, None, None)
+            # get dev_type, and prop_dict if possible
+            stored = self._store_reg_entity_attributes_async("Devices", entity_obj, reg_entity_id,
+                                                             entity_obj.entity_type, None)
+        return self._then(stored, lambda _: self._registered(entity_obj, reg_entity_id))
+
+    def _registered(self, entity_obj, reg_entity_id):
+        """
+        Creates the RegisteredEntity of a registered entity and sets its system properties.
+        :param entity_obj: Entity Object being registered
+        :param reg_entity_id: UUID IoTCC registered the entity as
+        :return: RegisteredEntity Object
+        """
+        _reg_entity_obj = RegisteredEntity(entity_obj, self, reg_entity_id)
+        if self._sys_properties:
+            _sys_prop_dict = ast.literal_eval(self._sys_properties)
+            if isinstance(_sys_prop_dict, dict) and _sys_prop_dict:
+                log.info(
+                    "System Properties {0} defined for the resource {1}".format(self._sys_properties,
+                                                                                entity_obj.name))
+                # sent together with the units and properties set right after the registration
+                self._log_failure(self.set_properties_async(_reg_entity_obj, _sys_prop_dict),
+                                  "Setting System Properties for resource {0} failed".format(entity_obj.name))
             else:
-                # get dev_type, and prop_dict if possible
-                with self.file_ops_lock:
-                    self._store_reg_entity_attributes("Devices", entity_obj, self.reg_entity_id,
-                                                      entity_obj.entity_type, None)
-
-            _reg_entity_obj = RegisteredEntity(entity_obj, self, self.reg_entity_id)
-            if self._sys_properties:
-                _sys_prop_dict = ast.literal_eval(self._sys_properties)
-                if isinstance(_sys_prop_dict, dict) and _sys_prop_dict:
-                    self.set_properties(_reg_entity_obj, _sys_prop_dict)
-                    log.info(
-                        "System Properties {0} defined for the resource {1}".format(self._sys_properties,
-                                                                                    entity_obj.name))
-                else:
-                    log.info("System Properties {0} not defined for the resource {1}".format(self._sys_properties,
-                                                                                             entity_obj.name))
-            return _reg_entity_obj
+                log.info("System Properties {0} not defined for the resource {1}".format(self._sys_properties,
+                                                                                         entity_obj.name))
+        return _reg_entity_obj
+
+    def register_many(self, entity_objs, raise_on_error=True):
+        """
+        Register several entities concurrently, keeping up to iotcc_max_in_flight requests outstanding.
+        :param entity_objs: List of Metric or Entity Objects
+        :param raise_on_error: Raise the first failure once all registrations completed.  Otherwise failed
+                               registrations are returned as None.
+        :return: List of RegisteredMetric or RegisteredEntity Objects in the order of entity_objs
+        """
+        return self._wait_many([self.register_async(entity_obj) for entity_obj in entity_objs], raise_on_error)
 
     def _check_version(self, json_msg):
         if json_msg["version"] != self._version:
@@ -189,26 +301,33 @@ class IotControlCenter(DataCenterComponent):
         :param entity_obj: Registered Entity
         :return:
         """
+        self._wait(self.unregister_async(entity_obj))
 
+    def unregister_async(self, entity_obj):
+        """
+        Asynchronous version of unregister().
+        :param entity_obj: Registered Entity
+        :return: Future resolved once IoTCC acknowledged the unregistration
+        """
         log.info("Unregistering resource with IoTCC {0}".format(entity_obj.ref_entity.name))
-        unreg_resp_q = Queue.Queue()
-        transaction_id = self._next_id()
-        req = Request(transaction_id, unreg_resp_q)
-        log.debug("Updating unregister response queue for transaction_id:{0}".format(transaction_id))
-        with self._req_ops_lock:
-            self._req_dict.update({transaction_id: req})
-        self.comms.send(json.dumps(self._unregistration(transaction_id, entity_obj.ref_entity)))
-        response = self._handle_response(unreg_resp_q.get(True, timeout))
-        if response:
+        response_future = self._send_request(
+            lambda transaction_id: self._unregistration(transaction_id, entity_obj.ref_entity))
+
+        def on_response(msg):
+            if not self._handle_response(msg):
+                raise Exception(
+                    "Unregistration of resource {0} unsuccessful with IoTCC".format(entity_obj.ref_entity.name))
             log.info("Unregistration of resource {0} with IoTCC succeeded".format(entity_obj.ref_entity.name))
-            if entity_obj.ref_entity.entity_type != "HelixGateway":
-                self._store_device_info(entity_obj.reg_entity_id, entity_obj.ref_entity.name,
-                                        entity_obj.ref_entity.entity_type, None, True)
-            else:
-                self._remove_reg_entity_details(entity_obj.ref_entity.name, entity_obj.reg_entity_id)
-                self._store_device_info(entity_obj.reg_entity_id, entity_obj.ref_entity.name, None, None, True)
-        else:
-            raise Exception("Unregistration of resource {0} unsuccessful with IoTCC".format(entity_obj.ref_entity.name))
+            self._entity_store.delete(_NS_REGISTRATION, entity_obj.ref_entity.entity_id)
+            with self.file_ops_lock:
+                if entity_obj.ref_entity.entity_type != "HelixGateway":
+                    self._store_device_info(entity_obj.reg_entity_id, entity_obj.ref_entity.name,
+                                            entity_obj.ref_entity.entity_type, None, True)
+                else:
+                    self._remove_reg_entity_details(entity_obj.ref_entity.name, entity_obj.reg_entity_id)
+                    self._store_device_info(entity_obj.reg_entity_id, entity_obj.ref_entity.name, None, None, True)
+
+        return self._then(response_future, on_response)
 
     def create_relationship(self, reg_entity_parent, reg_entity_child):
         """
@@ -223,10 +342,26 @@ class IotControlCenter(DataCenterComponent):
         However, A single EdgeSystem can have multiple child Devices and a each Device can have
         multiple child Metrics.
 
+        Units of a RegisteredMetric are only queued and sent with the other property changes of its parent,
+        use flush_properties() to wait for them.
+
         :param reg_entity_parent: Registered EdgeSystem or Registered Device Object
         :param reg_entity_child:  Registered Device or Registered Metric Object
         :return: None
          """
+        future = self.create_relationship_async(reg_entity_parent, reg_entity_child)
+        if isinstance(reg_entity_child, RegisteredMetric):
+            self._log_failure(future, "Publishing unit of metric {0} failed".format(reg_entity_child.ref_entity.name))
+        else:
+            self._wait(future)
+
+    def create_relationship_async(self, reg_entity_parent, reg_entity_child):
+        """
+        Asynchronous version of create_relationship().
+        :param reg_entity_parent: Registered EdgeSystem or Registered Device Object
+        :param reg_entity_child:  Registered Device or Registered Metric Object
+        :return: Future resolved once the relationship (or the metric unit) is created in IoTCC
+        """
         # sanity check: must be RegisteredEntity or RegisteredMetricRegisteredMetric
         if (not isinstance(reg_entity_parent, RegisteredEntity)) \
                 or (not isinstance(reg_entity_child, RegisteredEntity) \
@@ -236,29 +371,51 @@ class IotControlCenter(DataCenterComponent):
         reg_entity_child.parent = reg_entity_parent
         if isinstance(reg_entity_child, RegisteredMetric):
             # should save parent's reg_entity_id
-            reg_entity_child.reg_entity_id = reg_entity_parent.reg_entity_id
+            with self._req_ops_lock:
+                reg_entity_child.reg_entity_id = reg_entity_parent.reg_entity_id
+                if reg_entity_child.reg_entity_id in self._resumed_entities:
+                    self._resumed_entities[reg_entity_child.reg_entity_id].append(reg_entity_child)
             entity_obj = reg_entity_child.ref_entity
             # If the units are passed from user code they`ll be set as unit properties
             if entity_obj.unit is not None:
-                self.publish_unit(reg_entity_child, entity_obj.name, entity_obj.unit)
-        else:
-            # create relationship internal queue
-            rel_resp_q = Queue.Queue()
-            transaction_id = self._next_id()
-            req = Request(transaction_id, rel_resp_q)
-            log.debug("Updating create relationship response queue for transaction_id:{0}".format(transaction_id))
-            with self._req_ops_lock:
-                self._req_dict.update({transaction_id: req})
-            self.comms.send(json.dumps(self._relationship(transaction_id,
-                                                          reg_entity_parent.ref_entity,
-                                                          reg_entity_child.ref_entity)))
-            response = self._handle_response(rel_resp_q.get(True, timeout))
-            if response:
-                log.info("Relationship between entities {0} & {1} created successfully in IoTCC".format(
-                    reg_entity_parent.ref_entity.name, reg_entity_child.ref_entity.name))
-            else:
+                return self.publish_unit_async(reg_entity_child, entity_obj.name, entity_obj.unit)
+            future = Future()
+            future.set_result(None)
+            return future
+        relationship_key = "{0}/{1}".format(reg_entity_parent.reg_entity_id, reg_entity_child.reg_entity_id)
+        if self._is_resumed(reg_entity_parent) and self._is_resumed(reg_entity_child) and \
+                self._entity_store.get(_NS_RELATIONSHIP, relationship_key) is not None:
+            return self._defer_reconciliation(
+                "relationship {0}".format(relationship_key),
+                lambda: self._create_relationship_with_iotcc(reg_entity_parent, reg_entity_child, relationship_key))
+        return self._create_relationship_with_iotcc(reg_entity_parent, reg_entity_child, relationship_key)
+
+    def _create_relationship_with_iotcc(self, reg_entity_parent, reg_entity_child, relationship_key):
+        response_future = self._send_request(
+            lambda transaction_id: self._relationship(transaction_id,
+                                                      reg_entity_parent.ref_entity,
+                                                      reg_entity_child.ref_entity))
+
+        def on_response(msg):
+            if not self._handle_response(msg):
                 raise Exception("Relationship creation between entities {0} & {1} failed in IoTCC".format(
                     reg_entity_parent.ref_entity.name, reg_entity_child.ref_entity.name))
+            log.info("Relationship between entities {0} & {1} created successfully in IoTCC".format(
+                reg_entity_parent.ref_entity.name, reg_entity_child.ref_entity.name))
+            if self._registration_cache_ttl > 0:
+                self._entity_store.put(_NS_RELATIONSHIP, relationship_key, {"timestamp": time.time()})
+
+        return self._then(response_future, on_response)
+
+    def create_relationship_many(self, relationships, raise_on_error=True):
+        """
+        Create several Parent-Child relationships concurrently.
+        :param relationships: List of (reg_entity_parent, reg_entity_child) tuples
+        :param raise_on_error: Raise the first failure once all requests completed
+        :return:
+        """
+        self._wait_many([self.create_relationship_async(parent, child) for parent, child in relationships],
+                        raise_on_error)
 
     def _handle_response(self, msg):
         """
@@ -267,7 +424,7 @@ class IotControlCenter(DataCenterComponent):
         :return: boolean
         """
         log.debug("Received msg: {0}".format(msg))
-        json_msg = json.loads(msg)
+        json_msg = self.codec.decode(msg)
         log.debug("Processing msg: {0}".format(json_msg["type"]))
         self._check_version(json_msg)
         return json_msg["body"]["result"] == "succeeded"
@@ -347,7 +504,7 @@ class IotControlCenter(DataCenterComponent):
                 _values.append(m[1])
         if _timestamps == []:
             return
-        return json.dumps({
+        return self.codec.encode({
             "type": "add_stats",
             "version": self._version,
             "body": {
@@ -370,38 +527,149 @@ class IotControlCenter(DataCenterComponent):
         :param properties: Properties List
         :return:
         """
-        # RegisteredMetric get parent's resid; RegisteredEntity gets own resid
-        reg_entity_id = reg_entity_obj.reg_entity_id
+        future = self.set_properties_async(reg_entity_obj, properties)
+        self._flush_pending_properties(self._property_batch_key(reg_entity_obj))
+        self._wait(future)
 
+    def set_properties_async(self, reg_entity_obj, properties):
+        """
+        Asynchronous version of set_properties().
+        :param reg_entity_obj: RegisteredEntity Object
+        :param properties: Properties List
+        :return: Future resolved once IoTCC acknowledged the properties.  Properties are sent together with the
+                 other property changes of the entity after iotcc_property_flush_delay seconds or when
+                 flush_properties() is called.
+        """
+        if self._is_resumed(reg_entity_obj):
+            cached_properties = self._read_entity_file(reg_entity_obj.reg_entity_id) or {}
+            if all(key in cached_properties and cached_properties[key] == value
+                   for key, value in properties.items()):
+                return self._defer_reconciliation(
+                    "properties of {0}".format(reg_entity_obj.reg_entity_id),
+                    lambda: self._set_properties_with_iotcc(reg_entity_obj, properties))
+        if self._property_flush_delay <= 0:
+            return self._set_properties_with_iotcc(reg_entity_obj, properties)
+        return self._queue_properties(reg_entity_obj, properties)
+
+    def flush_properties(self, reg_entity_obj=None):
+        """
+        Sends the queued property changes right away and waits until IoTCC acknowledged them.
+        :param reg_entity_obj: RegisteredEntity or RegisteredMetric Object whose properties are sent, all queued
+                               properties are sent if None
+        :return:
+        """
+        key = None if reg_entity_obj is None else self._property_batch_key(reg_entity_obj)
+        self._wait_many(self._flush_pending_properties(key), True)
+
+    def _property_batch_key(self, reg_entity_obj):
+        # units of a RegisteredMetric are properties of its parent
+        if isinstance(reg_entity_obj, RegisteredMetric):
+            return reg_entity_obj.parent.ref_entity.entity_id
+        return reg_entity_obj.ref_entity.entity_id
+
+    def _queue_properties(self, reg_entity_obj, properties):
+        for key, value in properties.items():
+            self._assert_input(key, 100)
+            self._assert_input(value, 255)
+        future = Future()
+        batch_key = self._property_batch_key(reg_entity_obj)
+        with self._properties_cond:
+            batch = self._pending_properties.get(batch_key)
+            if batch is None:
+                batch = PropertyBatch(reg_entity_obj, None)
+                self._pending_properties[batch_key] = batch
+            # debounce: every change postpones the flush of the entity's batch
+            batch.deadline = time.time() + self._property_flush_delay
+            batch.properties.update(properties)
+            batch.futures.append(future)
+            self._properties_cond.notify()
+        return future
+
+    def _flush_pending_properties(self, batch_key=None):
+        """
+        :param batch_key: Entity ID whose batch is sent, all batches are sent if None
+        :return: List of Futures of the property changes that were sent
+        """
+        with self._properties_cond:
+            if batch_key is None:
+                batches = self._pending_properties.values()
+                self._pending_properties = {}
+            else:
+                batch = self._pending_properties.pop(batch_key, None)
+                batches = [] if batch is None else [batch]
+        futures = []
+        for batch in batches:
+            self._send_property_batch(batch)
+            futures.extend(batch.futures)
+        return futures
+
+    def _flush_properties_periodically(self):
+        while True:
+            with self._properties_cond:
+                while not self._pending_properties:
+                    self._properties_cond.wait()
+                now = time.time()
+                due = [key for key, batch in self._pending_properties.items() if batch.deadline <= now]
+                if not due:
+                    self._properties_cond.wait(
+                        min(batch.deadline for batch in self._pending_properties.values()) - now)
+                    continue
+                batches = [self._pending_properties.pop(key) for key in due]
+            for batch in batches:
+                self._send_property_batch(batch)
+
+    def _send_property_batch(self, batch):
+        log.debug("Sending {0} coalesced property changes as {1} properties".format(len(batch.futures),
+                                                                                   len(batch.properties)))
+        try:
+            response_future = self._set_properties_with_iotcc(batch.reg_entity_obj, batch.properties)
+        except Exception as e:
+            response_future = Future()
+            response_future.set_exception(e)
+
+        def on_done(done):
+            exception = done.exception()
+            for future in batch.futures:
+                if exception is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(exception)
+
+        response_future.add_done_callback(on_done)
+
+    def _set_properties_with_iotcc(self, reg_entity_obj, properties):
         if isinstance(reg_entity_obj, RegisteredMetric):
             entity = reg_entity_obj.parent.ref_entity
         else:
             entity = reg_entity_obj.ref_entity
 
-        set_prop_resp_q = Queue.Queue()
-        # create and add register request into req_list (waiting list)
-        transaction_id = self._next_id()
-        req = Request(transaction_id, set_prop_resp_q)
-        log.debug("Updating set properties response queue for transaction_id:{0}".format(transaction_id))
-        with self._req_ops_lock:
-            self._req_dict.update({transaction_id: req})
-        self.comms.send(json.dumps(
-            self._properties(transaction_id, entity.entity_type, entity.entity_id, entity.name,
-                             getUTCmillis(), properties)))
-        response = self._handle_response(set_prop_resp_q.get(True, timeout))
-        if response:
+        response_future = self._send_request(
+            lambda transaction_id: self._properties(transaction_id, entity.entity_type, entity.entity_id,
+                                                    entity.name, getUTCmillis(), properties))
+
+        def on_response(msg):
+            if not self._handle_response(msg):
+                raise Exception("Setting Properties for resource {0} failed".format(entity.name))
             log.info("Properties defined for resource {0}".format(entity.name))
-        else:
-            raise Exception("Setting Properties for resource {0} failed".format(entity.name))
-        if entity.entity_type == "HelixGateway":
-            with self.file_ops_lock:
-                self._store_reg_entity_attributes("EdgeSystem", entity,
-                                                  reg_entity_obj.reg_entity_id, None, properties)
-        else:
+            # RegisteredMetric get parent's resid; RegisteredEntity gets own resid
+            if entity.entity_type == "HelixGateway":
+                return self._store_reg_entity_attributes_async("EdgeSystem", entity, reg_entity_obj.reg_entity_id,
+                                                               None, properties)
             # get dev_type, and prop_dict if possible
-            with self.file_ops_lock:
-                self._store_reg_entity_attributes("Devices", entity, reg_entity_obj.reg_entity_id,
-                                                  entity.entity_type, properties)
+            return self._store_reg_entity_attributes_async("Devices", entity, reg_entity_obj.reg_entity_id,
+                                                           entity.entity_type, properties)
+
+        return self._then(response_future, on_response)
+
+    def set_properties_many(self, entity_properties, raise_on_error=True):
+        """
+        Set Properties for several Registered Entities concurrently.
+        :param entity_properties: List of (reg_entity_obj, properties) tuples
+        :param raise_on_error: Raise the first failure once all requests completed
+        :return:
+        """
+        self._wait_many([self.set_properties_async(reg_entity_obj, properties)
+                         for reg_entity_obj, properties in entity_properties], raise_on_error)
 
     def publish_unit(self, reg_entity_obj, metric_name, unit):
         """
@@ -413,6 +681,18 @@ class IotControlCenter(DataCenterComponent):
         :param unit: SI Unit
         :return:
         """
+        future = self.publish_unit_async(reg_entity_obj, metric_name, unit)
+        self._flush_pending_properties(self._property_batch_key(reg_entity_obj))
+        self._wait(future)
+
+    def publish_unit_async(self, reg_entity_obj, metric_name, unit):
+        """
+        Asynchronous version of publish_unit().
+        :param reg_entity_obj: RegisteredEntity Object
+        :param metric_name: Metric Name
+        :param unit: SI Unit
+        :return: Future resolved once the unit properties are set
+        """
         str_prefix, str_unit_name = parse_unit(unit)
         if not isinstance(str_prefix, basestring) and isinstance(str_unit_name, basestring):
             properties_unit_dict = {
@@ -434,113 +714,107 @@ class IotControlCenter(DataCenterComponent):
             properties_unit_dict = {}
             log.debug("{0} metric unit with prefix cannot be parsed and published to IoTCC for resource {1}".format(
                 metric_name, reg_entity_obj.parent.ref_entity.name))
-        if properties_unit_dict:
-            self.set_properties(reg_entity_obj, properties_unit_dict)
+        if not properties_unit_dict:
+            future = Future()
+            future.set_result(None)
+            return future
+
+        def on_published(_):
             log.info("Published units for metric {0} to IoTCC for resource {1}".format(metric_name,
                                                                                        reg_entity_obj.parent.ref_entity.name))
 
+        return self._then(self.set_properties_async(reg_entity_obj, properties_unit_dict), on_published)
+
     def _create_iotcc_json(self):
+        """
+        Resets the registration details exported to iotcc.json for this run and writes the initial file.
+        :return: iotcc.json path
+        """
+        iotcc_path = read_liota_config('IOTCC_PATH', 'iotcc_path')
+        self._entity_store.clear(_NS_IOTCC)
+        self._entity_store.put(_NS_IOTCC, _EDGE_SYSTEM_KEY,
+                               {"SystemName": "", "EntityType": "", "uuid": "", "LocalUuid": ""})
+        self._export_iotcc_json(iotcc_path)
+        log.debug('Initialized ' + iotcc_path)
+        return iotcc_path
+
+    def _export_iotcc_json(self, iotcc_path):
         msg = {
             "iotcc": {
-                "EdgeSystem": {"SystemName": "", "EntityType": "", "uuid": "", "LocalUuid": ""},
                 "OGProperties": {"OrganizationGroup": ""},
                 "Devices": []
             }
         }
-
-        iotcc_path = read_liota_config('IOTCC_PATH', 'iotcc_path')
-        path = os.path.dirname(iotcc_path)
-        mkdir(path)
+        items, snapshot = self._entity_store.export_items(_NS_IOTCC)
+        for key, doc in items:
+            if key == _EDGE_SYSTEM_KEY:
+                msg["iotcc"]["EdgeSystem"] = doc
+            else:
+                msg["iotcc"]["Devices"].append(doc)
+        mkdir(os.path.dirname(iotcc_path))
         try:
-            with open(iotcc_path, 'w') as f:
-                json.dump(msg, f, sort_keys=True, indent=4, ensure_ascii=False)
-                log.debug('Initialized ' + iotcc_path)
-            f.close()
-        except IOError, err:
-            log.error('Could not open {0} file '.format(iotcc_path) + err)
-        return iotcc_path
+            write_json_file(iotcc_path, msg, sort_keys=True, indent=4, ensure_ascii=False)
+            # Registrations stored while writing stay changed and are exported next time
+            self._entity_store.mark_exported(_NS_IOTCC, snapshot)
+        except (IOError, OSError), err:
+            log.error('Could not write {0} file '.format(iotcc_path) + str(err))
 
-    def _store_reg_entity_details(self, entity_type, entity_name, reg_entity_id, entity_local_uuid):
-        if self._iotcc_json == '':
-            log.warn('iotcc.json file missing')
-            return
-        try:
-            f = open(self._iotcc_json, 'r')
-        except IOError, err:
-            log.exception('Could not open {0} file '.format(self._iotcc_json) + str(err))
-            return
+    def export_entity_files(self, only_changed=True):
+        """
+        Writes the registration details and entity attributes kept in the local entity store to the legacy
+        iotcc.json, dev_file_path/<uuid>.json and entity_file_path/<uuid>.json files consumed by other agents.
+
+        This runs periodically every iotcc_export_interval seconds, and can be called to export immediately.
+
+        :param only_changed: Write only the files whose content changed since they were last exported
+        :return:
+        """
+        with self._export_lock:
+            if not only_changed or self._entity_store.has_changes(_NS_IOTCC):
+                self._export_iotcc_json(self._iotcc_json)
+            self._entity_store.export_files(_NS_DEVICE_FILE, self.dev_file_path, only_changed,
+                                            sort_keys=True, indent=4, ensure_ascii=False)
+            self._entity_store.export_files(_NS_ENTITY_FILE, self.entity_file_path, only_changed)
 
-        def load_json_record(f):
-            record = ''
+    def close(self):
+        """
+        Exports the entity files changed since the last periodic export, e.g. by unregistering the edge system
+        while shutting down.  Call it before disconnecting the comms.
+        :return:
+        """
+        self.export_entity_files()
+        log.info("Exported entity files of IoTCC on close")
+
+    def _export_entity_files_periodically(self):
+        while True:
+            time.sleep(self._export_interval)
             try:
-                record = json.load(f)
-            except:
-                log.exception('Could not load json record from {0} '.format(self._iotcc_json))
-            return record
-
-        local_cnt = 1
-        msg = load_json_record(f)
-        while ((msg == '') and (local_cnt <= self._iotcc_json_load_retry)):
-            local_cnt += 1
-            msg = load_json_record(f)
-        f.close()
-        if msg == '':
-            log.error('Tried {0} times, while failed to load record from {0}'.format(local_cnt, self._iotcc_json))
-            return
+                self.export_entity_files()
+            except Exception:
+                log.exception("Exception while exporting entity files")
 
+    def _store_reg_entity_details(self, entity_type, entity_name, reg_entity_id, entity_local_uuid):
         log.debug('{0}:{1}'.format(entity_name, reg_entity_id))
         if entity_type == "HelixGateway":
-            msg["iotcc"]["EdgeSystem"]["SystemName"] = entity_name
-            msg["iotcc"]["EdgeSystem"]["uuid"] = reg_entity_id
-            msg["iotcc"]["EdgeSystem"]["EntityType"] = entity_type
-            msg["iotcc"]["EdgeSystem"]["LocalUuid"] = entity_local_uuid
+            self._entity_store.put(_NS_IOTCC, _EDGE_SYSTEM_KEY,
+                                   {"SystemName": entity_name, "uuid": reg_entity_id, "EntityType": entity_type,
+                                    "LocalUuid": entity_local_uuid})
         else:
-            entity_exist = False
-            for device in msg["iotcc"]["Devices"]:
-                if device["uuid"] == reg_entity_id and device["EntityType"] == entity_type and device[
-                    "uuid"] == reg_entity_id:
-                    entity_exist = True
-                    break
-            if not entity_exist:
-                msg["iotcc"]["Devices"].append(
-                    {"DeviceName": entity_name, "uuid": reg_entity_id, "EntityType": entity_type,
-                     "LocalUuid": entity_local_uuid})
-        if msg != '':
-            with open(self._iotcc_json, 'w') as f:
-                json.dump(msg, f, sort_keys=True, indent=4, ensure_ascii=False)
-            f.close()
+            self._entity_store.put(_NS_IOTCC, reg_entity_id,
+                                   {"DeviceName": entity_name, "uuid": reg_entity_id, "EntityType": entity_type,
+                                    "LocalUuid": entity_local_uuid})
 
     def _remove_reg_entity_details(self, entity_name, reg_entity_id):
-        if self._iotcc_json == '':
-            log.warn('iotcc.json file missing')
-            return
-        try:
-            with open(self._iotcc_json, 'r') as f:
-                msg = json.load(f)
-            f.close()
-        except IOError, err:
-            log.error('Could not open {0} file '.format(self._iotcc_json) + str(err))
         log.debug('Remove {0}:{1} from iotcc.json'.format(entity_name, reg_entity_id))
-        if msg["iotcc"]["EdgeSystem"]["SystemName"] == entity_name and msg["iotcc"]["EdgeSystem"][
-            "uuid"] == reg_entity_id:
-            del msg["iotcc"]["EdgeSystem"]
+        edge_system = self._entity_store.get(_NS_IOTCC, _EDGE_SYSTEM_KEY)
+        if edge_system is not None and edge_system["SystemName"] == entity_name and \
+                edge_system["uuid"] == reg_entity_id:
+            self._entity_store.delete(_NS_IOTCC, _EDGE_SYSTEM_KEY)
             log.info("Removed {0} edge-system from iotcc.json".format(entity_name))
+        elif self._entity_store.delete(_NS_IOTCC, reg_entity_id):
+            log.info("Device {0} removed from iotcc.json".format(entity_name))
         else:
-            entity_exist = False
-            for device in msg["iotcc"]["Devices"]:
-                if device["uuid"] == reg_entity_id and device["uuid"] == reg_entity_id:
-                    entity_exist = True
-                    try:
-                        msg["iotcc"]["Devices"].remove(device)
-                        log.info("Device {0} removed from iotcc.json".format(entity_name))
-                        break
-                    except ValueError:
-                        pass
-            if not entity_exist:
-                log.error("No such device {0} exists".format(entity_name))
-        with open(self._iotcc_json, 'w') as f:
-            json.dump(msg, f, sort_keys=True, indent=4, ensure_ascii=False)
-        f.close()
+            log.error("No such device {0} exists".format(entity_name))
 
     def _write_entity_json_file(self, prop_dict, attribute_list, uuid, remove):
         if prop_dict is not None:
@@ -558,15 +832,8 @@ class IotControlCenter(DataCenterComponent):
             }
         }
         log.debug('msg: {0}'.format(msg))
-        log.debug("store_entity_json_file dev_file_path:{0}".format(self.dev_file_path))
-        file_path = self.dev_file_path + '/' + uuid + '.json'
-        try:
-            with open(file_path, 'w') as f:
-                json.dump(msg, f, sort_keys=True, indent=4, ensure_ascii=False)
-                log.debug('Initialized ' + file_path)
-            f.close()
-        except IOError, err:
-            log.error('Could not open {0} file '.format(file_path) + err)
+        # Exported to dev_file_path/<uuid>.json by export_entity_files()
+        self._entity_store.put(_NS_DEVICE_FILE, uuid, msg)
 
     def _store_edge_system_info(self, uuid, name, prop_dict, remove):
         """
@@ -615,25 +882,12 @@ class IotControlCenter(DataCenterComponent):
         self._write_entity_json_file(prop_dict, attribute_list, uuid, remove_device)
 
     def _write_entity_file(self, prop_dict, res_uuid):
-        file_path = self.entity_file_path + '/' + res_uuid + '.json'
         prop_dict.update({"Entity_Timestamp": datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")})
-        try:
-            with open(file_path, "w") as json_file:
-                if (prop_dict is not None):
-                    json_string = json.dumps(prop_dict)
-                    json_file.write(json_string)
-        except:
-            log.error('Write file error')
+        # Exported to entity_file_path/<uuid>.json by export_entity_files()
+        self._entity_store.put(_NS_ENTITY_FILE, res_uuid, prop_dict)
 
     def _read_entity_file(self, res_uuid):
-        file_path = self.entity_file_path + '/' + res_uuid + '.json'
-        prop_dict = None
-        try:
-            with open(file_path, "r") as json_file:
-                prop_dict = json.loads(json_file.read())
-        except:
-            log.error('Read file error')
-        return prop_dict
+        return self._entity_store.get(_NS_ENTITY_FILE, res_uuid)
 
     def _merge_prop_dict_list(self, prop_dict, prop_list):
         # prop_dict: new property dictionary
@@ -647,8 +901,56 @@ class IotControlCenter(DataCenterComponent):
         # get updated dict
         return prop_dict
 
+    def _store_reg_entity_attributes_async(self, entity_type, entity, reg_entity_id, dev_type, prop_dict):
+        """
+        Stores the attributes of a registered entity.  With enable_reboot_getprop, the properties IoTCC kept for an
+        entity whose local record predates this run are requested first.  Callers run on the completion executor,
+        which also completes that request, so they chain on it instead of waiting for it.
+
+        :return: Future resolved once the attributes are stored
+        """
+        def store(cloud_properties):
+            with self.file_ops_lock:
+                self._store_reg_entity_attributes(entity_type, entity, reg_entity_id, dev_type, prop_dict,
+                                                  cloud_properties)
+
+        if not self._entity_file_outdated(reg_entity_id):
+            store(None)
+            future = Future()
+            future.set_result(None)
+            return future
+        return self._then(self._get_properties_or_none(entity), store)
+
+    def _entity_file_outdated(self, reg_entity_id):
+        """
+        :return: True if enable_reboot_getprop is set and the local record of the entity predates this run
+        """
+        if self.enable_reboot_getprop != "True":
+            return False
+        tmp_dict = self._read_entity_file(reg_entity_id)
+        if tmp_dict is None or 'Entity_Timestamp' not in tmp_dict:
+            return False
+        last_dtime = datetime.datetime.strptime(tmp_dict["Entity_Timestamp"], "%Y-%m-%dT%H:%M:%S")
+        return last_dtime <= self._dcc_load_time
+
+    def _get_properties_or_none(self, entity):
+        """
+        :return: Future resolved with the list of properties of entity, or None if they could not be got
+        """
+        result = Future()
+
+        def on_done(done):
+            if done.exception() is not None:
+                log.error("Getting properties of {0} failed: {1}".format(entity.name, done.exception()))
+                result.set_result(None)
+            else:
+                result.set_result(done.result())
+
+        self.get_properties_async(entity).add_done_callback(on_done)
+        return result
+
     def _store_reg_entity_attributes(self, entity_type, entity, reg_entity_id,
-                                     dev_type, prop_dict):
+                                     dev_type, prop_dict, cloud_properties=None):
         entity_name = entity.name
         log.debug('store_reg_entity_attributes {0}:{1}:{2}:{3}'.format(entity_type,
                                                                        entity_name, reg_entity_id, prop_dict))
@@ -660,8 +962,8 @@ class IotControlCenter(DataCenterComponent):
         # if match, merge prop_dict to that file (with existing properties)
         # if not match, replace with new above info + only prop_dict
         # (old property will not be used since outdated already)
-        file_path = self.entity_file_path + '/' + reg_entity_id + '.json'
-        if not os.path.exists(file_path):
+        tmp_dict = self._read_entity_file(reg_entity_id)
+        if tmp_dict is None:
             tmp_dict = {'entity type': str(entity_type), 'name': str(entity_name)}
             if (dev_type is not None):
                 tmp_dict.update({"device type": str(dev_type)})
@@ -672,14 +974,9 @@ class IotControlCenter(DataCenterComponent):
             else:
                 new_prop_dict = tmp_dict
         else:
-            tmp_dict = self._read_entity_file(reg_entity_id)
-            # check Entity_Timestamp of entity_file: if < _dcc_load_time, get properties from cloud
-            if (self.enable_reboot_getprop == "True") and ('Entity_Timestamp' in tmp_dict):
-                last_dtime = datetime.datetime.strptime(tmp_dict["Entity_Timestamp"], "%Y-%m-%dT%H:%M:%S")
-                if (last_dtime <= self._dcc_load_time):
-                    list_prop = self.get_properties(entity)
-                    # merge property info from get_properties() into our local entity record
-                    tmp_dict = self._merge_prop_dict_list(tmp_dict, list_prop)
+            # merge property info got from the cloud for an entity file older than _dcc_load_time, see
+            # _store_reg_entity_attributes_async(), into our local entity record
+            tmp_dict = self._merge_prop_dict_list(tmp_dict, cloud_properties)
             if ((('entity type' in tmp_dict) and (tmp_dict["entity type"] == entity_type)) and
                     (('name' in tmp_dict) and (tmp_dict["name"] == entity_name)) and
                     (('device type' in tmp_dict) and ((tmp_dict["device type"] == dev_type) or
@@ -700,7 +997,7 @@ class IotControlCenter(DataCenterComponent):
                 else:
                     new_prop_dict = tmp_dict
 
-        # write new property dictionary to local entity file
+        # write new property dictionary to local entity store
         self._write_entity_file(new_prop_dict, reg_entity_id)
         ### Write IOTCC device file for AW agents
         if entity_type == "EdgeSystem":
@@ -745,9 +1042,227 @@ class IotControlCenter(DataCenterComponent):
             return None
 
     def _next_id(self):
-        self.counter = (self.counter + 1) & 0xffffff
-        # Enforce even IDs
-        return int(self.counter * 2)
+        with self._req_ops_lock:
+            self.counter = (self.counter + 1) & 0xffffff
+            # Enforce even IDs
+            return int(self.counter * 2)
+
+    def _send_request(self, build_msg):
+        """
+        Sends a request to IoTCC without waiting for its response.  Blocks only while iotcc_max_in_flight
+        requests are already waiting for their responses.
+
+        :param build_msg: Callable that takes a transaction ID and returns the request message
+        :return: Future resolved with the raw response message
+        """
+        response_future = Future()
+        self._acquire_in_flight_slot()
+        response_future.add_done_callback(lambda _: self._release_in_flight_slot())
+        transaction_id = self._next_id()
+        log.debug("Updating response future for transaction_id:{0}".format(transaction_id))
+        with self._req_ops_lock:
+            self._req_dict[transaction_id] = Request(transaction_id, response_future)
+        try:
+            self.comms.send(self.codec.encode(build_msg(transaction_id)))
+        except Exception as e:
+            with self._req_ops_lock:
+                self._req_dict.pop(transaction_id, None)
+            response_future.set_exception(e)
+        return response_future
+
+    def _acquire_in_flight_slot(self):
+        with self._in_flight_cond:
+            while self._in_flight >= self._max_in_flight:
+                self._in_flight_cond.wait(1)
+                if self._in_flight >= self._max_in_flight:
+                    self._expire_requests()
+            self._in_flight += 1
+
+    def _release_in_flight_slot(self):
+        with self._in_flight_cond:
+            self._in_flight -= 1
+            self._in_flight_cond.notify()
+
+    def _expire_requests(self):
+        """
+        Fails the requests whose response did not arrive within iotcc_response_timeout, so that lost responses
+        cannot hold in-flight slots forever.
+        :return:
+        """
+        now = time.time()
+        with self._req_ops_lock:
+            expired = [req for req in self._req_dict.itervalues() if req.deadline <= now]
+            for req in expired:
+                del self._req_dict[req.transaction_id]
+                self._expired_ids[req.transaction_id] = now + timeout
+            for transaction_id, late_deadline in self._expired_ids.items():
+                if late_deadline <= now:
+                    del self._expired_ids[transaction_id]
+        for req in expired:
+            log.warn("No response received for transaction_id:{0}".format(req.transaction_id))
+            req.response_future.set_exception(
+                FutureTimeoutError("No response for transaction_id {0}".format(req.transaction_id)))
+
+    def _registration_cache_entry(self, entity_obj, reg_entity_id):
+        return {
+            "uuid": reg_entity_id,
+            "name": entity_obj.name,
+            "kind": entity_obj.entity_type,
+            "version": self._version,
+            # Registrations are only valid for the IoTCC instance and account they were made with
+            "server": "{0}@{1}:{2}".format(self.comms.identity.username, getattr(self.comms, "url", ""),
+                                           getattr(self.comms, "port", "")),
+            "timestamp": time.time()
+        }
+
+    def _get_cached_registration(self, entity_obj):
+        """
+        :param entity_obj: Entity Object
+        :return: UUID registered for the entity by an earlier run, or None if it is not cached or no longer valid
+        """
+        if self._registration_cache_ttl <= 0:
+            return None
+        cached = self._entity_store.get(_NS_REGISTRATION, entity_obj.entity_id)
+        if cached is None:
+            return None
+        expected = self._registration_cache_entry(entity_obj, cached.get("uuid"))
+        if any(cached.get(field) != expected[field] for field in ("name", "kind", "version", "server")) or \
+                not cached.get("uuid") or expected["timestamp"] - cached.get("timestamp", 0) > \
+                self._registration_cache_ttl:
+            log.info("Registration cache entry of {0} is outdated".format(entity_obj.name))
+            self._entity_store.delete(_NS_REGISTRATION, entity_obj.entity_id)
+            return None
+        return cached["uuid"]
+
+    def _resume_registration(self, entity_obj, reg_entity_id):
+        """
+        Returns the RegisteredEntity of an entity registered by an earlier run without contacting IoTCC, and queues
+        the registration to be confirmed with IoTCC in background.
+        """
+        log.info("Resource {0} resumed from registration cache as {1}".format(entity_obj.name, reg_entity_id))
+        if entity_obj.entity_type == "HelixGateway":
+            with self.file_ops_lock:
+                self._store_reg_entity_details(entity_obj.entity_type, entity_obj.name, reg_entity_id,
+                                               entity_obj.entity_id)
+        _reg_entity_obj = RegisteredEntity(entity_obj, self, reg_entity_id)
+        with self._req_ops_lock:
+            self._resumed_entities[reg_entity_id] = [_reg_entity_obj]
+
+        def on_confirmed(confirmed_reg_entity_obj):
+            confirmed_id = confirmed_reg_entity_obj.reg_entity_id
+            with self._req_ops_lock:
+                # Requests of a confirmed entity are no longer deferred
+                dependents = self._resumed_entities.pop(reg_entity_id, [])
+                if confirmed_id == reg_entity_id:
+                    return
+                # the entity and the metrics created from it carry the stale UUID
+                for dependent in dependents:
+                    dependent.reg_entity_id = confirmed_id
+            log.warn("IoTCC registered {0} as {1} instead of cached {2}".format(entity_obj.name, confirmed_id,
+                                                                               reg_entity_id))
+            if entity_obj.entity_type != "HelixGateway":
+                self._entity_store.delete(_NS_IOTCC, reg_entity_id)
+
+        def on_failure():
+            self._entity_store.delete(_NS_REGISTRATION, entity_obj.entity_id)
+
+        return self._defer_reconciliation(
+            "registration of {0}".format(entity_obj.name),
+            lambda: self._then(self._register_with_iotcc(entity_obj), on_confirmed),
+            on_failure, _reg_entity_obj)
+
+    def _is_resumed(self, reg_entity_obj):
+        with self._req_ops_lock:
+            return reg_entity_obj.reg_entity_id in self._resumed_entities
+
+    def _defer_reconciliation(self, description, request_fn, on_failure=None, result=None):
+        """
+        Queues a request that IoTCC most likely already fulfilled in an earlier run, instead of waiting for it.
+
+        :param description: Description of the request for logging
+        :param request_fn: Callable sending the request and returning its Future
+        :param on_failure: Callable invoked if the request fails
+        :param result: Result the returned Future is resolved with
+        :return: Future that is already resolved
+        """
+        self._reconcile_queue.put((description, request_fn, on_failure))
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def _reconcile_resumed_entities(self):
+        while True:
+            description, request_fn, on_failure = self._reconcile_queue.get()
+            try:
+                request_fn().result(timeout)
+                log.debug("Reconciled {0} with IoTCC".format(description))
+            except Exception:
+                log.exception("Reconciliation of {0} with IoTCC failed".format(description))
+                if on_failure is not None:
+                    on_failure()
+
+    def _log_failure(self, future, message):
+        def on_done(done):
+            if done.exception() is not None:
+                log.error("{0}: {1}".format(message, done.exception()))
+
+        future.add_done_callback(on_done)
+
+    def _then(self, future, fn):
+        """
+        Chains fn to be run with the result of future on the completion executor, so that the dispatcher
+        thread never runs file I/O or nested requests itself.
+
+        :param future: Future
+        :param fn: Callable taking the result of future.  It may return a value or another Future.
+        :return: Future resolved with the (final) return value of fn
+        """
+        chained = Future()
+
+        def copy_result(src):
+            exc = src.exception()
+            if exc is not None:
+                chained.set_exception(exc)
+            else:
+                chained.set_result(src.result())
+
+        def run(src):
+            try:
+                result = fn(src.result())
+            except Exception as e:
+                chained.set_exception(e)
+                return
+            if isinstance(result, Future):
+                result.add_done_callback(copy_result)
+            else:
+                chained.set_result(result)
+
+        def schedule(src):
+            if src.exception() is not None:
+                copy_result(src)
+            else:
+                self._completion_executor.submit(run, src)
+
+        future.add_done_callback(schedule)
+        return chained
+
+    def _wait(self, future):
+        return future.result(timeout)
+
+    def _wait_many(self, futures, raise_on_error):
+        results = []
+        first_error = None
+        for future in futures:
+            try:
+                results.append(future.result(timeout))
+            except Exception as e:
+                log.error("IoTCC request failed: {0}".format(str(e)))
+                results.append(None)
+                if first_error is None:
+                    first_error = e
+        if first_error is not None and raise_on_error:
+            raise first_error
+        return results
 
     def _unregistration(self, msg_id, ref_entity):
         return {
@@ -768,34 +1283,37 @@ class IotControlCenter(DataCenterComponent):
         :param resource_uuid: Resource Unique Identifier
         :return:
         """
+        future = self.get_properties_async(entity)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            raise
+        except Exception:
+            log.exception("Exception while getting properties")
+            return None
+
+    def get_properties_async(self, entity):
+        """
+        Asynchronous version of get_properties().
+
+        :param entity: Entity Object
+        :return: Future resolved with the list of properties
+        """
         log.info("Get properties defined with IoTCC for resource {0}".format(entity.entity_id))
-        self.prop_list = None
-        get_prop_resp_q = Queue.Queue()
+        response_future = self._send_request(lambda transaction_id: self._get_properties(transaction_id, entity))
 
-        def on_response(msg, get_prop_resp_q):
-            try:
-                log.debug("Received msg: {0}".format(msg))
-                json_msg = json.loads(msg)
-                log.debug("Processing msg: {0}".format(json_msg["type"]))
-                self._check_version(json_msg)
-                if json_msg["type"] == "get_properties_response" and json_msg["body"]["id"] != "null" and \
-                                json_msg["body"]["id"] == entity.entity_id:
-                    log.info("FOUND PROPERTY LIST: {0}".format(json_msg["body"]["propertyList"]))
-                    self.prop_list = json_msg["body"]["propertyList"]
-                else:
-                    log.info("Waiting for getting properties")
-                    on_response(self.get_prop_resp_q.get(True, timeout), get_prop_resp_q)
-            except:
-                log.exception("Exception while getting properties")
+        def on_response(msg):
+            log.debug("Received msg: {0}".format(msg))
+            json_msg = self.codec.decode(msg)
+            log.debug("Processing msg: {0}".format(json_msg["type"]))
+            self._check_version(json_msg)
+            if json_msg["type"] == "get_properties_response" and json_msg["body"]["id"] != "null" and \
+                    json_msg["body"]["id"] == entity.entity_id:
+                log.info("FOUND PROPERTY LIST: {0}".format(json_msg["body"]["propertyList"]))
+                return json_msg["body"]["propertyList"]
+            raise Exception("Unexpected response while getting properties: {0}".format(msg))
 
-        transaction_id = self._next_id()
-        req = Request(transaction_id, get_prop_resp_q)
-        log.debug("Updating get properties response queue for transaction_id:{0}".format(transaction_id))
-        with self._req_ops_lock:
-            self._req_dict.update({transaction_id: req})
-        self.comms.send(json.dumps(self._get_properties(transaction_id, entity)))
-        on_response(get_prop_resp_q.get(True, timeout), get_prop_resp_q)
-        return self.prop_list
+        return self._then(response_future, on_response)
 
     def _assert_input(self, input, max_length):
         """ validates if the input string contains only the whitelisted characters """
@@ -804,6 +1322,21 @@ class IotControlCenter(DataCenterComponent):
         if not len(input) <= max_length:
             raise ValueError("The provided string contains more than {0} characters : {1}".format(max_length, input))
 
+    def _reap_expired_requests(self):
+        while True:
+            time.sleep(min(timeout, 1.0))
+            try:
+                self._expire_requests()
+            except Exception:
+                log.exception("Exception while expiring requests")
+
+    def _peek_transaction_id(self, msg):
+        if not self.codec.binary:
+            match = _TRANSACTION_ID_RE.search(msg)
+            if match is not None:
+                return int(match.group(1))
+        return self.codec.decode(msg)["transactionID"]
+
     def _dispatch_recvd_msg(self):
         log.debug("Dispatching received messages from IOTCC")
 
@@ -811,23 +1344,29 @@ class IotControlCenter(DataCenterComponent):
             try:
                 # block until there is an item available
                 msg = self._recv_msg_queue.get(True)
-                log.debug("Received msg: {0}".format(msg))
-                json_msg = json.loads(msg)
-                log.debug(
-                    "Processing msg: type:{0} transaction_id:{1}".format(json_msg["type"], json_msg["transactionID"]))
-                # search matched request in request dictionary
-                # assume transaction_id will be unique in one process
-                log.debug("Dictionary keys:{0}".format(self._req_dict.keys()))
-                req = self._req_dict.get(json_msg["transactionID"])
+                transaction_id = self._peek_transaction_id(msg)
                 # get/delete request from dictionary
-                if (req is not None):
-                    with self._req_ops_lock:
-                        del self._req_dict[json_msg["transactionID"]]
-                    # put response into requester's reception queue
-                    log.debug("Msg:{0} dispatched to user queue".format(msg))
-                    req.user_queue.put(msg)
+                # assume transaction_id will be unique in one process
+                with self._req_ops_lock:
+                    req = self._req_dict.pop(transaction_id, None)
+                    late = req is None and self._expired_ids.pop(transaction_id, None) is not None
+                if req is not None:
+                    # IDs are even, so shard on transaction_id // 2
+                    self._dispatch_shards[(transaction_id // 2) % len(self._dispatch_shards)].put((req, msg))
+                elif late:
+                    log.warn("Received response for expired transaction_id:{0}".format(transaction_id))
                 else:
                     # TBD: it may be other messages, e.g., Actions, Armada Campaign
                     log.warn("Received unexpected message {0}".format(msg))
             except Exception:
                 log.exception("Exception in dispatching the received messages")
+
+    def _complete_responses(self, shard):
+        while True:
+            req, msg = shard.get(True)
+            log.debug("Msg:{0} dispatched to response future of transaction_id:{1}".format(msg, req.transaction_id))
+            try:
+                # complete requester's response future
+                req.response_future.set_result(msg)
+            except Exception:
+                log.exception("Exception in completing the response of transaction_id:{0}".format(req.transaction_id))
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import logging
+import math
+import re
+from weakref import WeakKeyDictionary
+
+from liota.dccs.dcc import DataCenterComponent
+from liota.dcc_comms.prometheus_dcc_comms import PrometheusDccComms
+from liota.entities.edge_systems.edge_system import EdgeSystem
+from liota.entities.metrics.metric import Metric
+from liota.entities.metrics.registered_metric import RegisteredMetric
+from liota.entities.registered_entity import RegisteredEntity
+
+log = logging.getLogger(__name__)
+
+_INVALID_NAME_CHARS = re.compile(r'[^a-zA-Z0-9_:]')
+# Unlike metric names, label names can't contain ":"
+_INVALID_LABEL_NAME_CHARS = re.compile(r'[^a-zA-Z0-9_]')
+_LABEL_VALUE_ESCAPE = re.compile(r'(["\\])')
+
+
+def _sanitize_name(name, invalid_chars=_INVALID_NAME_CHARS):
+    name = invalid_chars.sub("_", name)
+    if not name or name[0].isdigit():
+        name = "_" + name
+    return name
+
+
+def _escape_label_value(value):
+    return _LABEL_VALUE_ESCAPE.sub(r'\\\1', unicode(value).encode("utf-8")).replace("\n", "\\n")
+
+
+def _format_sample_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, long)):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return None
+
+
+class Prometheus(DataCenterComponent):
+    """
+    DCC exposing the latest sample of every metric to be scraped by Prometheus through PrometheusDccComms.
+
+    Each metric is a gauge named after the metric, with invalid characters replaced by "_", labelled with the names
+    of its EdgeSystem and Device.  Publishing a metric only replaces its series in the index of PrometheusDccComms,
+    the exposition text is rendered when Prometheus scrapes it.
+    """
+    def __init__(self, comms, labels=None):
+        """
+        :param comms: PrometheusDccComms Object
+        :param labels: Dict of labels added to every series
+        """
+        if not isinstance(comms, PrometheusDccComms):
+            raise TypeError("PrometheusDccComms is expected as comms")
+        super(Prometheus, self).__init__(
+            comms=comms
+        )
+        self.labels = labels or {}
+        # RegisteredMetric -> (hierarchy version, family, labels)
+        self._series = WeakKeyDictionary()
+        # Incremented whenever a relationship changes, which invalidates every cached series
+        self._hierarchy_version = 0
+
+    def register(self, entity_obj):
+        """
+        Since Prometheus doesn't require any registration, we simply return RegisteredEntity Object.
+
+        :param entity_obj: Metric or Entity Object.
+        :return: RegisteredMetric or RegisteredEntity Object.
+        """
+        log.info("Registering resource with Prometheus DCC {0}".format(entity_obj.name))
+        if isinstance(entity_obj, Metric):
+            return RegisteredMetric(entity_obj, self, None)
+        else:
+            return RegisteredEntity(entity_obj, self, None)
+
+    def create_relationship(self, reg_entity_parent, reg_entity_child):
+        """
+        This method creates Parent-Child relationship.  Supported relationships are:
+
+               EdgeSystem
+                   |                                      EdgeSystem
+                Device                   (or)                |
+                   |                                    RegisteredMetric
+             RegisteredMetric
+
+        :param reg_entity_parent: Registered EdgeSystem or Registered Device Object
+        :param reg_entity_child:  Registered Device or Registered Metric Object
+        :return: None
+        """
+        reg_entity_child.parent = reg_entity_parent
+        self._hierarchy_version += 1
+
+    def _get_series(self, reg_metric, updates):
+        """
+        :param reg_metric: RegisteredMetric Object
+        :param updates: List to which the removal of the metric's previous series is appended, if its labels changed
+        :return: (family, labels) of the metric's series
+        """
+        cached = self._series.get(reg_metric)
+        if cached is not None and cached[0] == self._hierarchy_version:
+            return cached[1:]
+        hierarchy_version = self._hierarchy_version
+        labels = dict(self.labels)
+        parent = reg_metric.parent
+        while parent is not None:
+            if isinstance(parent.ref_entity, EdgeSystem):
+                labels["edge_system"] = parent.ref_entity.name
+            else:
+                labels["device"] = parent.ref_entity.name
+            parent = parent.parent
+        family = _sanitize_name(reg_metric.ref_entity.name)
+        label_text = ",".join('%s="%s"' % (_sanitize_name(key, _INVALID_LABEL_NAME_CHARS),
+                                           _escape_label_value(labels[key]))
+                              for key in sorted(labels))
+        if cached is not None and cached[1:] != (family, label_text):
+            updates.append((cached[1], cached[2], None))
+        self._series[reg_metric] = (hierarchy_version, family, label_text)
+        return family, label_text
+
+    def _format_data(self, reg_metric):
+        """
+        :param reg_metric: RegisteredMetric Object.
+        :return: List of (family, labels, sample line) updates for PrometheusDccComms
+        """
+        met_cnt = reg_metric.values.qsize()
+        if met_cnt == 0:
+            return
+        latest = None
+        for _ in range(met_cnt):
+            v = reg_metric.values.get(block=True)
+            if v is None or (latest is not None and v[0] < latest[0]):
+                continue
+            value = _format_sample_value(v[1])
+            if value is None:
+                log.warning("Non-numeric value of metric {0} can't be exposed to Prometheus".format(
+                    reg_metric.ref_entity.name))
+                continue
+            latest = (v[0], value)
+        if latest is None:
+            return
+        updates = []
+        family, labels = self._get_series(reg_metric, updates)
+        updates.append((family, labels, "%s{%s} %s %d\n" % (family, labels, latest[1], latest[0])))
+        return updates
+
+    def set_properties(self, reg_entity, properties):
+        raise NotImplementedError
+
+    def unregister(self, entity_obj):
+        """
+        Removes the series of a RegisteredMetric, so it is no longer exposed.
+
+        :param entity_obj: RegisteredMetric Object
+        :return:
+        """
+        if not isinstance(entity_obj, RegisteredMetric):
+            raise NotImplementedError
+        cached = self._series.pop(entity_obj, None)
+        if cached is not None:
+            self.comms.send([(cached[1], cached[2], None)])
@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from weakref import WeakKeyDictionary
+import Queue
+
+from liota.dccs.dcc import DataCenterComponent
+from liota.entities.devices.device import Device
+from liota.entities.edge_systems.edge_system import EdgeSystem
+from liota.entities.entity import Entity
+from liota.entities.metrics.metric import Metric
+from liota.entities.metrics.registered_metric import RegisteredMetric
+from liota.entities.registered_entity import RegisteredEntity
+from liota.lib.utilities.future import Future, gather
+
+log = logging.getLogger(__name__)
+
+
+class Route(object):
+    """
+    Route of metrics to a target DCC.  A route matches a metric if all of its patterns match; patterns are shell-style
+    wildcards as understood by fnmatch.  Matching metrics are put in the bounded queue of the route's target and
+    published by the target's own thread, so a slow or unavailable target only fills its own queue.  Routes to the
+    same target share its queue, and samples matched by several of them are published to the target once.
+    """
+
+    def __init__(self, target, metric_name=None, entity_type=None, device_type=None, queue_size=1000, name=None):
+        """
+        :param target: DataCenterComponent Object
+        :param metric_name: Pattern matching the name of the metric
+        :param entity_type: Pattern matching the kind of entity the metric belongs to: "EdgeSystem" or "Device"
+        :param device_type: Pattern matching the entity_type of the Device the metric belongs to, e.g.,
+                            "SimulatedDevice".  Metrics of an EdgeSystem don't match any device_type.
+        :param queue_size: Maximum number of publishes waiting for the target.  Further publishes are dropped.  The
+                           queue of a target with several routes holds as many publishes as the largest of them.
+        :param name: Name of the route in stats, derived from the target and the patterns if None
+        """
+        if not isinstance(target, DataCenterComponent):
+            raise TypeError("DataCenterComponent object is expected as target.")
+        self.target = target
+        self.metric_name = metric_name
+        self.entity_type = entity_type
+        self.device_type = device_type
+        self.queue_size = queue_size
+        self.name = name or "%s(%s)" % (type(target).__name__, ",".join(
+            "%s=%s" % (key, value) for key, value in (("metric_name", metric_name), ("entity_type", entity_type),
+                                                     ("device_type", device_type)) if value is not None))
+        # TargetQueue of the target, set by the Router
+        self.target_queue = None
+        self._stats_lock = threading.Lock()
+        self._started = time.time()
+        self.published = 0
+        self.published_samples = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def matches(self, metric_name, entity_type, device_type):
+        """
+        :param metric_name: Name of the metric
+        :param entity_type: "EdgeSystem" or "Device", or None if the metric has no parent
+        :param device_type: entity_type of the metric's Device, or None
+        :return: True if the route matches the metric
+        """
+        for pattern, value in ((self.metric_name, metric_name), (self.entity_type, entity_type),
+                               (self.device_type, device_type)):
+            if pattern is not None and (value is None or not fnmatchcase(value, pattern)):
+                return False
+        return True
+
+    def count_published(self, samples):
+        with self._stats_lock:
+            self.published += 1
+            self.published_samples += samples
+
+    def count_dropped(self):
+        with self._stats_lock:
+            self.dropped += 1
+
+    def count_failed(self):
+        with self._stats_lock:
+            self.failed += 1
+
+    def stats(self):
+        """
+        :return: Dict of the route's counters, the publishes queued for its target and its publish rate per second
+                 since it was created
+        """
+        with self._stats_lock:
+            elapsed = max(time.time() - self._started, 1e-6)
+            return {
+                "published": self.published,
+                "published_samples": self.published_samples,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "queued": self.target_queue.qsize() if self.target_queue is not None else 0,
+                "publish_rate": self.published / elapsed,
+                "sample_rate": self.published_samples / elapsed
+            }
+
+
+class TargetQueue(object):
+    """
+    Bounded queue of the publishes to one target DCC, published in order by its own thread.  Counts every publish in
+    the stats of the routes that matched it.
+    """
+
+    def __init__(self, target, queue_size):
+        """
+        :param target: DataCenterComponent Object
+        :param queue_size: Maximum number of publishes waiting for the target.  Further publishes are dropped.
+        """
+        self.target = target
+        self.name = type(target).__name__
+        self._queue = Queue.Queue(maxsize=queue_size)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._publish_queued, name="Router-" + self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the thread once the queued publishes are done.
+        :return:
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def put(self, target_reg_metric, samples, routes, future):
+        """
+        Queues samples to be published to the target without blocking.
+
+        :param target_reg_metric: RegisteredMetric Object of the target
+        :param samples: List of (ts, v) samples
+        :param routes: Routes to the target matching the metric
+        :param future: Future resolved once the samples are published
+        :return: False if the queue is full and the samples were dropped
+        """
+        try:
+            self._queue.put_nowait((target_reg_metric, samples, routes, future))
+            return True
+        except Queue.Full:
+            for route in routes:
+                route.count_dropped()
+            future.set_exception(Queue.Full("Queue of route {0} is full".format(
+                ", ".join(route.name for route in routes))))
+            return False
+
+    def _publish_queued(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            target_reg_metric, samples, routes, future = item
+            try:
+                for sample in samples:
+                    target_reg_metric.values.put(sample)
+                self.target.publish(target_reg_metric)
+            except Exception as e:
+                for route in routes:
+                    route.count_failed()
+                log.error("Publishing to {0} failed".format(self.name), exc_info=True)
+                future.set_exception(e)
+            else:
+                for route in routes:
+                    route.count_published(len(samples))
+                future.set_result(None)
+
+
+class Router(DataCenterComponent):
+    """
+    DCC fanning metrics out to several target DCCs along Routes.
+
+    Entities are registered, related and unregistered with every target DCC, and the RegisteredEntity returned by the
+    Router keeps the target's RegisteredEntity in its 'targets' dict.  MessagingAttributes for a target are set on
+    the target's RegisteredMetric, i.e., reg_metric.targets[target].msg_attr.
+
+    A published metric's samples are queued once for every target with a route matching it.  publish() returns as
+    soon as they are queued; publish_async() returns a Future resolved once every matching target published them.
+    """
+
+    def __init__(self, routes):
+        """
+        :param routes: List of Route Objects
+        """
+        # The Router has no DccComms of its own, every target has its own
+        self.comms = None
+        self.codec = None
+        self.routes = list(routes)
+        self.targets = list(OrderedDict((route.target, None) for route in self.routes))
+        # One queue and thread per target, shared by the routes to it
+        self._target_queues = OrderedDict()
+        for target in self.targets:
+            queue_size = max(route.queue_size for route in self.routes if route.target is target)
+            self._target_queues[target] = TargetQueue(target, queue_size)
+        for route in self.routes:
+            route.target_queue = self._target_queues[route.target]
+        # RegisteredMetric -> (hierarchy version, list of (TargetQueue, matching routes to its target))
+        self._matching_routes = WeakKeyDictionary()
+        # Incremented whenever a relationship changes, which invalidates every cached route match
+        self._hierarchy_version = 0
+        for target_queue in self._target_queues.itervalues():
+            target_queue.start()
+
+    def register(self, entity_obj):
+        """
+        Registers the entity with every target DCC.  A target failing to register it is logged and skipped, so its
+        routes ignore the entity.
+
+        :param entity_obj: Metric or Entity Object.
+        :return: RegisteredMetric or RegisteredEntity Object.
+        """
+        if not isinstance(entity_obj, Entity):
+            raise TypeError("Entity object is expected.")
+        log.info("Registering resource with Router DCC {0}".format(entity_obj.name))
+        if isinstance(entity_obj, Metric):
+            reg_entity = RegisteredMetric(entity_obj, self, None)
+        else:
+            reg_entity = RegisteredEntity(entity_obj, self, None)
+        reg_entity.targets = OrderedDict()
+        for target in self.targets:
+            try:
+                reg_entity.targets[target] = target.register(entity_obj)
+            except Exception:
+                log.error("Registering {0} with {1} failed".format(entity_obj.name, type(target).__name__),
+                          exc_info=True)
+        return reg_entity
+
+    def create_relationship(self, reg_entity_parent, reg_entity_child):
+        """
+        Creates the relationship in every target DCC with which both entities are registered.
+
+        :param reg_entity_parent: Registered EdgeSystem or Registered Device Object
+        :param reg_entity_child:  Registered Device or Registered Metric Object
+        :return: None
+        """
+        reg_entity_child.parent = reg_entity_parent
+        self._hierarchy_version += 1
+        for target, target_child in reg_entity_child.targets.iteritems():
+            target_parent = reg_entity_parent.targets.get(target)
+            if target_parent is not None:
+                target.create_relationship(target_parent, target_child)
+
+    def _get_matching_routes(self, reg_metric):
+        """
+        :param reg_metric: RegisteredMetric Object
+        :return: List of (TargetQueue, routes to its target matching the metric) for the targets to which the metric
+                 is registered and which have a matching route
+        """
+        cached = self._matching_routes.get(reg_metric)
+        if cached is not None and cached[0] == self._hierarchy_version:
+            return cached[1]
+        hierarchy_version = self._hierarchy_version
+        entity_type = None
+        device_type = None
+        parent = reg_metric.parent
+        if parent is not None:
+            entity_type = "EdgeSystem" if isinstance(parent.ref_entity, EdgeSystem) else "Device"
+        while parent is not None:
+            if isinstance(parent.ref_entity, Device):
+                device_type = parent.ref_entity.entity_type
+                break
+            parent = parent.parent
+        matching = OrderedDict()
+        for route in self.routes:
+            if route.target in reg_metric.targets and \
+                    route.matches(reg_metric.ref_entity.name, entity_type, device_type):
+                matching.setdefault(route.target, []).append(route)
+        target_routes = [(self._target_queues[target], routes) for target, routes in matching.iteritems()]
+        self._matching_routes[reg_metric] = (hierarchy_version, target_routes)
+        return target_routes
+
+    def _format_data(self, reg_metric):
+        """
+        :param reg_metric: RegisteredMetric Object.
+        :return: List of the metric's samples, each target DCC formats them itself
+        """
+        met_cnt = reg_metric.values.qsize()
+        samples = []
+        for _ in range(met_cnt):
+            v = reg_metric.values.get(block=True)
+            if v is not None:
+                samples.append(v)
+        return samples
+
+    def publish(self, reg_metric):
+        """
+        Queues the metric's samples for every matching target without waiting for them to be published.
+
+        :param reg_metric: RegisteredMetric Object.
+        :return:
+        """
+        self.publish_async(reg_metric)
+
+    def publish_async(self, reg_metric, timeout=None):
+        """
+        Queues the metric's samples once for every target with a matching route.
+
+        :param reg_metric: RegisteredMetric Object.
+        :param timeout: Unused, queuing never blocks
+        :return: Future resolved once every matching target published the samples, or failed with the first error,
+                 e.g., Queue.Full if the queue of a target dropped them
+        """
+        if not isinstance(reg_metric, RegisteredMetric):
+            log.error("RegisteredMetric object is expected.")
+            raise TypeError("RegisteredMetric object is expected.")
+        samples = self._format_data(reg_metric)
+        futures = []
+        if samples:
+            for target_queue, routes in self._get_matching_routes(reg_metric):
+                future = Future()
+                target_queue.put(reg_metric.targets[target_queue.target], samples, routes, future)
+                futures.append(future)
+        return gather(futures)
+
+    def set_properties(self, reg_entity, properties):
+        """
+        Sets the properties in every target DCC supporting properties.
+
+        :param reg_entity: RegisteredEntity Object
+        :param properties: Property String, List or Dict dependant on the target DCCs
+        :return:
+        """
+        for target, target_entity in reg_entity.targets.iteritems():
+            try:
+                target.set_properties(target_entity, properties)
+            except NotImplementedError:
+                pass
+
+    def unregister(self, entity_obj):
+        """
+        Unregisters the entity from every target DCC supporting it.
+
+        :param entity_obj: RegisteredEntity Object
+        :return:
+        """
+        for target, target_entity in entity_obj.targets.iteritems():
+            try:
+                target.unregister(target_entity)
+            except NotImplementedError:
+                pass
+
+    def stats(self):
+        """
+        :return: Dict of route name -> stats of the route
+        """
+        return OrderedDict((route.name, route.stats()) for route in self.routes)
+
+    def stop(self):
+        """
+        Stops the thread of every target once its queued publishes are done.
+        :return:
+        """
+        for target_queue in self._target_queues.itervalues():
+            target_queue.stop()
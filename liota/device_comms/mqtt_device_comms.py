@@ -45,7 +45,7 @@ class MqttDeviceComms(DeviceComms):
 
     def __init__(self, url, port, identity=None, tls_conf=None, qos_details=None,
                  client_id="", clean_session=False, userdata=None, protocol="MQTTv311", transport="tcp", keep_alive=60,
-                 enable_authentication=False, conn_disconn_timeout=10):
+                 enable_authentication=False, conn_disconn_timeout=10, callback_executor=None):
         """
         :param url: MQTT Broker URL or IP
         :param port: MQTT Broker Port
@@ -64,6 +64,9 @@ class MqttDeviceComms(DeviceComms):
         :param keep_alive: KeepAliveInterval
         :param enable_authentication: Enable user-name password authentication or not
         :param conn_disconn_timeout: Connect-Disconnect-Timeout
+        :param callback_executor: CallbackExecutor Object running subscription callbacks, in order per topic, instead
+                                  of paho's network thread.  Callbacks run on the network thread if None, so they
+                                  must not block.
         """
         self.url = url
         self.port = port
@@ -78,6 +81,7 @@ class MqttDeviceComms(DeviceComms):
         self.keep_alive = keep_alive
         self.enable_authentication = enable_authentication
         self.conn_disconn_timeout = conn_disconn_timeout
+        self.callback_executor = callback_executor
         self._connect()
 
     def _connect(self):
@@ -87,7 +91,8 @@ class MqttDeviceComms(DeviceComms):
         """
         self.client = Mqtt(self.url, self.port, self.identity, self.tls_conf, self.qos_details, self.client_id,
                            self.clean_session, self.userdata, self.protocol, self.transport, self.keep_alive,
-                           self.enable_authentication, self.conn_disconn_timeout)
+                           self.enable_authentication, self.conn_disconn_timeout,
+                           callback_executor=self.callback_executor)
 
     def _disconnect(self):
         """
@@ -37,21 +37,79 @@ try:
 except ImportError:
     ssl = None
 import sys
+import threading
 import time
 
 import paho.mqtt.client as paho
+try:
+    from paho.mqtt.packettypes import PacketTypes
+    from paho.mqtt.properties import Properties
+except ImportError:
+    # paho-mqtt before 1.5 has no MQTT v5
+    PacketTypes = Properties = None
 
+from liota.lib.transports.topic_aliases import TopicAliases
+from liota.lib.utilities.comms_stats import CommsStats, CONNECTING, CONNECTED, DISCONNECTED, CLOSED
+from liota.lib.utilities.future import Future, FutureTimeoutError
+from liota.lib.utilities.histogram import LatencyHistogram
 from liota.lib.utilities.utility import systemUUID, read_liota_config
 
 log = logging.getLogger(__name__)
 
+# Cache key -> SSLContext shared by Mqtt objects with the same Identity and TLSConf
+_ssl_contexts = {}
+_ssl_contexts_lock = threading.Lock()
+
+
+def _payload_size(message):
+    if message is None:
+        return 0
+    if isinstance(message, (basestring, bytearray)):
+        return len(message)
+    return len(str(message))
+
+
+if Properties is not None:
+    class _PublishProperties(Properties):
+        """
+        PUBLISH properties packed only once.  paho packs the properties of every packet, which costs more CPU time than
+        sending a whole topic; Mqtt never changes properties once it handed them to paho.
+        """
+
+        def pack(self):
+            packed = self.__dict__.get("_packed")
+            if packed is None:
+                packed = Properties.pack(self)
+                object.__setattr__(self, "_packed", packed)
+            return packed
+
+
+def _result_string(rc):
+    """
+    MQTT v5 results are ReasonCodes naming themselves, connack_string() only knows the MQTT 3.1.1 return codes.
+    """
+    return str(rc) if hasattr(rc, "getName") else paho.connack_string(rc)
+
+
+def _wait_for(event, timeout):
+    """
+    Waits until event is set or timeout seconds passed.  Python 2's Event.wait() with a timeout sleeps in steps of up
+    to 50 ms, while waiting without one blocks on a lock and returns as soon as the event is set, so a Timer sets the
+    event on timeout instead.
+    """
+    timer = threading.Timer(timeout, event.set)
+    timer.daemon = True
+    timer.start()
+    event.wait()
+    timer.cancel()
+
 
 class Mqtt():
     """
     MQTT Transport implementation for LIOTA. It internally uses Python Paho library.
     """
 
-    def on_disconnect(self, client, userdata, rc):
+    def on_disconnect(self, client, userdata, rc, properties=None):
         """
         Invoked when disconnected from broker.  Two scenarios are possible:
 
@@ -61,11 +119,27 @@ class Mqtt():
         :param client: The client instance for this callback
         :param userdata: The private user data as set in Client() or userdata_set()
         :param rc: The connection result
+        :param properties: MQTT v5 properties of the DISCONNECT packet sent by the broker
         :return:
         """
         self._connect_result_code = sys.maxsize
         self._disconnect_result_code = rc
+        self.connected = False
+        if self._topic_aliases is not None:
+            # paho may connect again and send messages before on_connect() is called
+            self._reset_topic_aliases(0)
+        self._disconnect_event.set()
         log.info("Disconnected with result code : {0} : {1} ".format(str(rc), paho.connack_string(rc)))
+        # QoS 0 messages that were not sent yet are dropped by paho, QoS 1 and 2 messages are sent again
+        with self._publish_lock:
+            dropped = [(mid, future) for mid, (future, qos, _) in self._pending_publishes.items() if qos == 0]
+            for mid, _ in dropped:
+                del self._pending_publishes[mid]
+            self.failed_publishes += len(dropped)
+        if dropped:
+            self.comms_stats.failed(len(dropped))
+        for mid, future in dropped:
+            future.set_exception(Exception("Disconnected before sending QoS 0 Message ID:{0}".format(mid)))
 
     def on_message(self, client, userdata, msg):
         """
@@ -88,15 +162,40 @@ class Mqtt():
         :return:
         """
         log.debug("mid: {0}".format(str(mid)))
+        with self._publish_cond:
+            pending = self._pending_publishes.pop(mid, None)
+            if pending is None:
+                # publish() did not return the mid yet
+                self._early_publishes.add(mid)
+            else:
+                self._complete_publish(pending[1], pending[2])
+        if pending is not None:
+            pending[0].set_result(mid)
 
-    def on_subscribe(self, client, userdata, mid, granted_qos):
+    def _complete_publish(self, qos, sent):
+        """
+        Accounts for a sent (QoS 0) or acknowledged (QoS 1 and 2) message.  Call with _publish_cond held.
+
+        :param qos: QoS of the message
+        :param sent: Time at which the message was handed to paho
+        :return:
+        """
+        self.completed_publishes += 1
+        self.comms_stats.send_latency.record(time.time() - sent)
+        if qos > 0:
+            self.ack_latency.record(time.time() - sent)
+            self._in_flight -= 1
+            self._publish_cond.notify()
+
+    def on_subscribe(self, client, userdata, mid, granted_qos, properties=None):
         """
         Invoked when the broker responds to subscribe request.
 
         :param client: The client instance for this callback
         :param userdata: The private user data as set in Client() or userdata_set()
         :param mid: Message ID
-        :param granted_qos: Granted QoS by the broker
+        :param granted_qos: Granted QoS by the broker, ReasonCodes for MQTT v5
+        :param properties: MQTT v5 properties of the SUBACK packet
         :return:
         """
         log.debug("Subscribed: {0} {1}".format(str(mid), str(granted_qos)))
@@ -114,7 +213,9 @@ class Mqtt():
 
     def __init__(self, url, port, identity=None, tls_conf=None, qos_details=None, client_id=None,
                  clean_session=False, userdata=None, protocol="MQTTv311", transport="tcp", keep_alive=60,
-                 enable_authentication=False, conn_disconn_timeout=int(read_liota_config('MQTT_CFG', 'mqtt_conn_disconn_timeout'))):
+                 enable_authentication=False, conn_disconn_timeout=int(read_liota_config('MQTT_CFG', 'mqtt_conn_disconn_timeout')),
+                 in_flight_window=None, callback_executor=None, comms_stats=None, session_expiry=None,
+                 message_expiry=None, topic_aliases=True):
 
         """
         :param url: MQTT Broker URL or IP
@@ -127,7 +228,8 @@ class Mqtt():
         :param userdata: userdata is user defined data of any type that is passed as the "userdata"
                          parameter to callbacks.
 
-        :param protocol: allows explicit setting of the MQTT version to use for this client
+        :param protocol: allows explicit setting of the MQTT version to use for this client.  "MQTTv311" by
+                         default, "MQTTv5" requires paho-mqtt 1.5 or newer.
         :param transport: Set transport to "websockets" to use WebSockets as the transport
                           mechanism. Set to "tcp" to use raw TCP, which is the default.
 
@@ -136,7 +238,27 @@ class Mqtt():
         :param username: Username for authentication
         :param password: Password for authentication
         :param conn_disconn_timeout: Connect-Disconnect-Timeout
+        :param in_flight_window: Maximum number of QoS 1 and 2 messages waiting for their acknowledgement.  Further
+                                 publishes fail fast or wait for a given timeout, see publish_async().  Defaults to the queue_size of
+                                 qos_details, beyond which paho rejects messages, or unlimited if it is 0 or not set.
+        :param callback_executor: CallbackExecutor Object running subscription callbacks, in order per topic, instead
+                                  of paho's network thread.  Callbacks run on the network thread if None, so they
+                                  must not block.
+        :param comms_stats: CommsStats to count into, shared by the connections of an MqttDccComms.  A new one if
+                            None.
+        :param session_expiry: MQTTv5 only.  Seconds the broker keeps the session after the connection is lost.  If
+                               None, the session is kept like with MQTTv311: forever, or not at all with
+                               clean_session=True.
+        :param message_expiry: MQTTv5 only.  Default seconds after which the broker discards a published message not
+                               yet delivered to a subscriber, None keeps messages forever.
+        :param topic_aliases: MQTTv5 only.  Replace the topics of QoS 0 publishes by the numeric aliases the
+                              broker allows, see TopicAliases.
         """
+        if protocol == "MQTTv5":
+            if Properties is None:
+                raise ValueError("MQTTv5 requires paho-mqtt 1.5 or newer")
+        elif session_expiry is not None or message_expiry is not None:
+            raise ValueError("Session and message expiry require MQTTv5")
         self.url = url
         self.port = port
         self.identity = identity
@@ -150,10 +272,48 @@ class Mqtt():
         self.keep_alive = keep_alive
         self.enable_authentication = enable_authentication
         self._conn_disconn_timeout = conn_disconn_timeout
-        self._paho_client = paho.Client(self.client_id, self.clean_session, self.userdata,
+        self._v5 = protocol == "MQTTv5"
+        self.session_expiry = session_expiry
+        self.message_expiry = message_expiry
+        self._topic_aliases = TopicAliases() if self._v5 and topic_aliases else None
+        # Held while an alias is chosen and the message handed to paho, so a reconnect can not come in between
+        self._alias_lock = threading.Lock()
+        # (alias, message expiry) -> PUBLISH Properties, never modified once handed to paho
+        self._publish_properties = {}
+        self.alias_publishes = 0
+        self.alias_saved_bytes = 0
+        # MQTT v5 replaces clean_session by the clean_start flag of connect()
+        self._paho_client = paho.Client(self.client_id, None if self._v5 else self.clean_session, self.userdata,
                                         protocol=getattr(paho, self.protocol), transport=self.transport)
         self._connect_result_code = sys.maxsize
         self._disconnect_result_code = sys.maxsize
+        # Set by on_connect and on_disconnect, so connect_soc() and disconnect() wait without polling
+        self._connect_event = threading.Event()
+        self._disconnect_event = threading.Event()
+        # Seconds the last connect_soc() waited for the broker's CONNACK
+        self.connect_time = None
+        if in_flight_window is None and qos_details is not None and qos_details.queue_size > 0:
+            in_flight_window = qos_details.queue_size
+        self.in_flight_window = in_flight_window
+        self.callback_executor = callback_executor
+        # Message ID -> (Future, QoS, time handed to paho) of the messages waiting for on_publish
+        self._pending_publishes = {}
+        self._early_publishes = set()
+        self._publish_lock = threading.Lock()
+        self._publish_cond = threading.Condition(self._publish_lock)
+        # QoS 1 and 2 messages handed to paho and not acknowledged yet
+        self._in_flight = 0
+        self._saturation_warned = False
+        self.published = 0
+        self.completed_publishes = 0
+        self.failed_publishes = 0
+        self.window_waits = 0
+        self.window_rejects = 0
+        self.ack_latency = LatencyHistogram()
+        self.comms_stats = comms_stats if comms_stats is not None else CommsStats(self.get_state)
+        self.connected = False
+        self._was_connected = False
+        self._closed = False
         self._paho_client.on_message = self.on_message
         self._paho_client.on_publish = self.on_publish
         self._paho_client.on_subscribe = self.on_subscribe
@@ -162,7 +322,7 @@ class Mqtt():
         self.sub_dict = {}
         self.connect_soc()
 
-    def on_connect(self, client, userdata, flags, rc):
+    def on_connect(self, client, userdata, flags, rc, properties=None):
         """
         Invoked on successful connection to a broker after connection request
 
@@ -170,15 +330,70 @@ class Mqtt():
         :param userdata: The private user data as set in Client() or userdata_set()
         :param flags: Response flags sent by the broker
         :param rc: The connection result
+        :param properties: MQTT v5 properties of the CONNACK packet
         :return:
         """
         self._connect_result_code = rc
         self._disconnect_result_code = sys.maxsize
-        log.info("Connected with result code : {0} : {1} ".format(str(rc), paho.connack_string(rc)))
+        if rc == 0:
+            if self._topic_aliases is not None:
+                self._reset_topic_aliases(getattr(properties, "TopicAliasMaximum", 0))
+            if self._was_connected:
+                self.comms_stats.reconnected()
+            self._was_connected = True
+            self.connected = True
+        else:
+            self.comms_stats.failed()
+        self._connect_event.set()
+        log.info("Connected with result code : {0} : {1} ".format(str(rc), _result_string(rc)))
         for topic in self.sub_dict:
             self.subscribe(topic, self.sub_dict.get(topic)[0], self.sub_dict.get(topic)[1])
             log.info("Re-Subscribed to topic : {0} after re-connection".format(topic))
 
+    def _reset_topic_aliases(self, maximum):
+        """
+        Starts over with the aliases allowed on a new connection, or without aliases once disconnected.
+
+        :param maximum: Topic Alias Maximum of the broker
+        :return:
+        """
+        with self._alias_lock:
+            self._topic_aliases.reset(maximum)
+        if maximum:
+            log.debug("Broker allows {0} topic aliases".format(maximum))
+
+    def _connect_properties(self):
+        """
+        :return: Properties of the MQTT v5 CONNECT packet
+        """
+        properties = Properties(PacketTypes.CONNECT)
+        session_expiry = self.session_expiry
+        if session_expiry is None:
+            # 0xFFFFFFFF never expires
+            session_expiry = 0 if self.clean_session else 0xFFFFFFFF
+        if session_expiry:
+            properties.SessionExpiryInterval = session_expiry
+        return properties
+
+    def _properties(self, alias, message_expiry):
+        """
+        :param alias: Topic alias or None
+        :param message_expiry: Message expiry interval in seconds or None
+        :return: Properties of an MQTT v5 PUBLISH packet, None if there are none
+        """
+        if alias is None and message_expiry is None:
+            return None
+        key = (alias, message_expiry)
+        properties = self._publish_properties.get(key)
+        if properties is None:
+            properties = _PublishProperties(PacketTypes.PUBLISH)
+            if alias is not None:
+                properties.TopicAlias = alias
+            if message_expiry is not None:
+                properties.MessageExpiryInterval = message_expiry
+            self._publish_properties[key] = properties
+        return properties
+
     def connect_soc(self):
         """
         Establishes connection with MQTT Broker
@@ -186,92 +401,7 @@ class Mqtt():
         """
         # Set up TLS support
         if self.tls_conf:
-
-            if self.identity is None:
-                raise ValueError("Identity required to be set")
-
-            # Creating the tls context
-            if ssl is None:
-                raise ValueError("This platform has no SSL/TLS")
-
-            # Validate CA certificate path
-            if self.identity.root_ca_cert is None and not hasattr(ssl.SSLContext, 'load_default_certs'):
-                raise ValueError("Error : CA certificate path is missing")
-            else:
-                if self.identity.root_ca_cert and not (os.path.exists(self.identity.root_ca_cert)):
-                    raise ValueError("Error : Wrong CA certificate path")
-
-            if self.tls_conf.tls_version is None:
-                tls_version = ssl.PROTOCOL_TLSv1_2
-                # If the python version supports it, use highest TLS version automatically
-                if hasattr(ssl, "PROTOCOL_TLS"):
-                    tls_version = ssl.PROTOCOL_TLS
-            else:
-                tls_version = getattr(ssl, self.tls_conf.tls_version)
-            context = ssl.SSLContext(tls_version)
-
-            # Validate client certificate path
-            if self.identity.cert_file:
-                if os.path.exists(self.identity.cert_file):
-                    client_cert_available = True
-                else:
-                    raise ValueError("Error : Wrong client certificate path")
-            else:
-                client_cert_available = False
-
-            # Validate client key file path
-            if self.identity.key_file:
-                if os.path.exists(self.identity.key_file):
-                    client_key_available = True
-                else:
-                    raise ValueError("Error : Wrong client key path.")
-            else:
-                client_key_available = False
-
-            '''
-                Multiple conditions for certificate validations
-                # 1. Both Client certificate and key file should be present
-                # 2. If client certificate is not there throw an error
-                # 3. If client key is not there throw an error
-                # 4. If both are not there proceed without client certificate and key
-            '''
-            if client_cert_available and client_key_available:
-                context.load_cert_chain(self.identity.cert_file, self.identity.key_file)
-            elif not client_cert_available and client_key_available:
-                raise ValueError("Error : Client key found, but client certificate not found")
-            elif client_cert_available and not client_key_available:
-                raise ValueError("Error : Client certificate found, but client key not found")
-            else:
-                log.info("Client Certificate and Client Key are not provided")
-
-            if getattr(ssl, self.tls_conf.cert_required) == ssl.CERT_NONE and hasattr(context, 'check_hostname'):
-                context.check_hostname = False
-
-            context.verify_mode = ssl.CERT_REQUIRED if self.tls_conf.cert_required is None else getattr(ssl,
-                                                                                                        self.tls_conf.cert_required)
-
-            if self.identity.root_ca_cert is not None:
-                context.load_verify_locations(self.identity.root_ca_cert)
-            else:
-                context.load_default_certs()
-
-            if self.tls_conf.cipher is not None:
-                context.set_ciphers(self.tls_conf.ciphers)
-
-            # Setting the verify_flags to VERIFY_CRL_CHECK_CHAIN in this mode
-            # certificate revocation lists (CRLs) of all certificates in the
-            # peer cert chain are checked if the path of CRLs in PEM or DER format
-            # is specified
-            crl_path = read_liota_config('CRL_PATH', 'crl_path')
-            if crl_path and crl_path != "None" and crl_path != "":
-                if os.path.exists(crl_path):
-                    context.verify_flags = ssl.VERIFY_CRL_CHECK_CHAIN
-                    context.load_verify_locations(cafile=crl_path)
-                else:
-                    raise ValueError("Error : Wrong Client CRL path {0}".format(crl_path))
-
-            # Setting the tls context
-            self._paho_client.tls_set_context(context)
+            self._paho_client.tls_set_context(self._get_ssl_context())
 
             if getattr(ssl, self.tls_conf.cert_required) != ssl.CERT_NONE:
                 # Default to secure, sets context.check_hostname attribute
@@ -305,14 +435,18 @@ class Mqtt():
             self._paho_client.message_retry_set(self.qos_details.retry)
 
         # Connect with MQTT Broker
-        self._paho_client.connect(host=self.url, port=self.port, keepalive=self.keep_alive)
+        self._connect_event.clear()
+        start = time.time()
+        if self._v5:
+            self._paho_client.connect(host=self.url, port=self.port, keepalive=self.keep_alive,
+                                      clean_start=self.clean_session, properties=self._connect_properties())
+        else:
+            self._paho_client.connect(host=self.url, port=self.port, keepalive=self.keep_alive)
 
         # Start network loop to handle auto-reconnect
         self._paho_client.loop_start()
-        ten_ms_count = 0
-        while (ten_ms_count != self._conn_disconn_timeout * 100) and (self._connect_result_code == sys.maxsize):
-            ten_ms_count += 1
-            time.sleep(0.01)
+        _wait_for(self._connect_event, self._conn_disconn_timeout)
+        self.connect_time = time.time() - start
         if self._connect_result_code == sys.maxsize:
             log.error("Connection timeout.")
             #  Stopping background network loop as connection establishment failed.
@@ -320,16 +454,124 @@ class Mqtt():
             raise Exception("Connection Timeout")
         elif self._connect_result_code == 0:
             log.info("Connected to MQTT Broker.")
-            log.info("Connect time consumption: " + str(float(ten_ms_count) * 10) + "ms.")
+            log.info("Connect time consumption: {0:.1f}ms.".format(self.connect_time * 1000))
         else:
             log.error("Connection error with result code : {0} : {1} ".
-                      format(str(self._connect_result_code), paho.connack_string(self._connect_result_code)))
+                      format(str(self._connect_result_code), _result_string(self._connect_result_code)))
             #  Stopping background network loop as connection establishment failed.
             self._paho_client.loop_stop()
             raise Exception("Connection error with result code : {0} : {1} ".
-                            format(str(self._connect_result_code), paho.connack_string(self._connect_result_code)))
+                            format(str(self._connect_result_code), _result_string(self._connect_result_code)))
+
+    def _get_ssl_context(self):
+        """
+        Returns the SSLContext for the Identity and TLSConf of this object.  Building a context loads certificates
+        and CRLs from disk, so contexts are shared by all Mqtt objects with the same configuration and files.
+
+        :return: SSLContext Object
+        """
+        if self.identity is None:
+            raise ValueError("Identity required to be set")
+
+        # Creating the tls context
+        if ssl is None:
+            raise ValueError("This platform has no SSL/TLS")
+
+        # Validate CA certificate path
+        if self.identity.root_ca_cert is None and not hasattr(ssl.SSLContext, 'load_default_certs'):
+            raise ValueError("Error : CA certificate path is missing")
+        else:
+            if self.identity.root_ca_cert and not (os.path.exists(self.identity.root_ca_cert)):
+                raise ValueError("Error : Wrong CA certificate path")
+
+        if self.tls_conf.tls_version is None:
+            tls_version = ssl.PROTOCOL_TLSv1_2
+            # If the python version supports it, use highest TLS version automatically
+            if hasattr(ssl, "PROTOCOL_TLS"):
+                tls_version = ssl.PROTOCOL_TLS
+        else:
+            tls_version = getattr(ssl, self.tls_conf.tls_version)
+
+        # Validate client certificate path
+        if self.identity.cert_file:
+            if os.path.exists(self.identity.cert_file):
+                client_cert_available = True
+            else:
+                raise ValueError("Error : Wrong client certificate path")
+        else:
+            client_cert_available = False
+
+        # Validate client key file path
+        if self.identity.key_file:
+            if os.path.exists(self.identity.key_file):
+                client_key_available = True
+            else:
+                raise ValueError("Error : Wrong client key path.")
+        else:
+            client_key_available = False
+
+        crl_path = read_liota_config('CRL_PATH', 'crl_path')
+        if not crl_path or crl_path == "None":
+            crl_path = None
+        if crl_path is not None and not os.path.exists(crl_path):
+            raise ValueError("Error : Wrong Client CRL path {0}".format(crl_path))
+
+        key = (tls_version, self.tls_conf.cert_required, self.tls_conf.cipher, crl_path) + tuple(
+            (path, os.path.getmtime(path) if path else None)
+            for path in (self.identity.root_ca_cert, self.identity.cert_file, self.identity.key_file, crl_path))
+        with _ssl_contexts_lock:
+            context = _ssl_contexts.get(key)
+            if context is None:
+                context = self._build_ssl_context(tls_version, client_cert_available, client_key_available,
+                                                  crl_path)
+                _ssl_contexts[key] = context
+            else:
+                log.debug("Reusing cached SSLContext")
+        return context
+
+    def _build_ssl_context(self, tls_version, client_cert_available, client_key_available, crl_path):
+        context = ssl.SSLContext(tls_version)
+
+        '''
+            Multiple conditions for certificate validations
+            # 1. Both Client certificate and key file should be present
+            # 2. If client certificate is not there throw an error
+            # 3. If client key is not there throw an error
+            # 4. If both are not there proceed without client certificate and key
+        '''
+        if client_cert_available and client_key_available:
+            context.load_cert_chain(self.identity.cert_file, self.identity.key_file)
+        elif not client_cert_available and client_key_available:
+            raise ValueError("Error : Client key found, but client certificate not found")
+        elif client_cert_available and not client_key_available:
+            raise ValueError("Error : Client certificate found, but client key not found")
+        else:
+            log.info("Client Certificate and Client Key are not provided")
+
+        if getattr(ssl, self.tls_conf.cert_required) == ssl.CERT_NONE and hasattr(context, 'check_hostname'):
+            context.check_hostname = False
+
+        context.verify_mode = ssl.CERT_REQUIRED if self.tls_conf.cert_required is None else getattr(ssl,
+                                                                                                    self.tls_conf.cert_required)
+
+        if self.identity.root_ca_cert is not None:
+            context.load_verify_locations(self.identity.root_ca_cert)
+        else:
+            context.load_default_certs()
 
-    def publish(self, topic, message, qos, retain=False):
+        if self.tls_conf.cipher is not None:
+            context.set_ciphers(self.tls_conf.cipher)
+
+        # Setting the verify_flags to VERIFY_CRL_CHECK_CHAIN in this mode
+        # certificate revocation lists (CRLs) of all certificates in the
+        # peer cert chain are checked if the path of CRLs in PEM or DER format
+        # is specified
+        if crl_path is not None:
+            context.verify_flags = ssl.VERIFY_CRL_CHECK_CHAIN
+            context.load_verify_locations(cafile=crl_path)
+        return context
+
+    def publish(self, topic, message, qos, retain=False, timeout=0, message_expiry=None):
         """
         Publishes message to the MQTT Broker
 
@@ -337,13 +579,159 @@ class Mqtt():
         :param message: Message to be published
         :param qos: Publish QoS
         :param retain: Message to be retained or not
+        :param timeout: Seconds to wait while the in-flight window is full, see publish_async()
+        :param message_expiry: MQTTv5 only.  Message expiry interval in seconds, the message_expiry of this object
+                               if None
         :return:
         """
-        mess_info = self._paho_client.publish(topic, message, qos, retain)
-        if mess_info.rc == 0:
-            log.debug("Published Message ID:{0} with result code:{1}, Topic:{2}, Payload:{3}, QoS:{4}".format(mess_info.mid, mess_info.rc, topic, message, qos))
+        future = self.publish_async(topic, message, qos, retain, timeout, message_expiry)
+        if future.done() and future.exception() is not None:
+            raise future.exception()
+
+    def publish_async(self, topic, message, qos, retain=False, timeout=0, message_expiry=None):
+        """
+        Publishes message to the MQTT Broker without waiting for its delivery
+
+        :param topic: Publish topic
+        :param message: Message to be published
+        :param qos: Publish QoS
+        :param retain: Message to be retained or not
+        :param timeout: Seconds to wait for the acknowledgement of an in-flight message while in_flight_window QoS 1
+                        or 2 messages are in flight.  0 fails fast, like paho once its queue is full, None waits as
+                        long as needed, which is forever while the broker is unreachable.  Publishing from a paho
+                        callback always fails fast, since acknowledgements are handled by the same thread.
+        :param message_expiry: MQTTv5 only.  Message expiry interval in seconds, the message_expiry of this object
+                               if None
+        :return: Future resolved with the Message ID once the message is sent for QoS 0, or acknowledged by the
+                 broker for QoS 1 and 2.  It fails with FutureTimeoutError if the in-flight window stayed full.
+        """
+        future = Future()
+        if qos > 0 and not self._acquire_in_flight_slot(timeout):
+            self.comms_stats.failed()
+            future.set_exception(FutureTimeoutError("In-flight window of {0} messages is full".format(
+                self.in_flight_window)))
+            return future
+        sent = time.time()
+        if self._v5:
+            mess_info = self._publish_v5(topic, message, qos, retain, message_expiry)
         else:
-            raise Exception("MQTT Publish exception Message ID:{0} with result code:{1}, Topic:{2}, Payload:{3}, QoS:{4}".format(mess_info.mid, mess_info.rc, topic, message, qos))
+            mess_info = self._paho_client.publish(topic, message, qos, retain)
+        # paho keeps QoS 1 and 2 messages published while disconnected and sends them after reconnecting
+        if mess_info.rc != 0 and not (qos > 0 and mess_info.rc == paho.MQTT_ERR_NO_CONN):
+            self.comms_stats.failed()
+            with self._publish_cond:
+                self.failed_publishes += 1
+                if qos > 0:
+                    self._in_flight -= 1
+                    self._publish_cond.notify()
+            future.set_exception(Exception("MQTT Publish exception Message ID:{0} with result code:{1}, Topic:{2}, Payload:{3}, QoS:{4}".format(mess_info.mid, mess_info.rc, topic, message, qos)))
+            return future
+        log.debug("Published Message ID:{0} with result code:{1}, Topic:{2}, Payload:{3}, QoS:{4}".format(mess_info.mid, mess_info.rc, topic, message, qos))
+        self.comms_stats.sent(_payload_size(message))
+        with self._publish_cond:
+            self.published += 1
+            published = mess_info.mid in self._early_publishes
+            if published:
+                self._early_publishes.discard(mess_info.mid)
+                self._complete_publish(qos, sent)
+            else:
+                self._pending_publishes[mess_info.mid] = (future, qos, sent)
+        if published:
+            future.set_result(mess_info.mid)
+        return future
+
+    def _publish_v5(self, topic, message, qos, retain, message_expiry):
+        """
+        Hands an MQTT v5 message to paho, replacing the topic of a QoS 0 message by an alias if possible.  paho sends
+        QoS 1 and 2 messages again after a reconnect, when their aliases would be stale, so they keep their topic.
+
+        :return: paho's MQTTMessageInfo
+        """
+        if message_expiry is None:
+            message_expiry = self.message_expiry
+        if self._topic_aliases is None or qos > 0:
+            return self._paho_client.publish(topic, message, qos, retain, self._properties(None, message_expiry))
+        with self._alias_lock:
+            packet_topic, alias = self._topic_aliases.get(topic)
+            mess_info = self._paho_client.publish(packet_topic, message, qos, retain,
+                                                  self._properties(alias, message_expiry))
+            if alias is None or mess_info.rc != 0:
+                return mess_info
+            if packet_topic:
+                self._topic_aliases.announced(topic)
+                return mess_info
+            self.alias_publishes += 1
+            # The alias property takes 3 bytes
+            self.alias_saved_bytes += len(topic) - 3
+        return mess_info
+
+    def _acquire_in_flight_slot(self, timeout):
+        """
+        :param timeout: Seconds to wait for a free slot in the in-flight window, None waits forever
+        :return: False if the window stayed full
+        """
+        with self._publish_cond:
+            if self.in_flight_window:
+                if self._in_flight >= self.in_flight_window:
+                    if timeout == 0 or threading.current_thread() is self._paho_client._thread:
+                        self.window_rejects += 1
+                        self.failed_publishes += 1
+                        return False
+                    self.window_waits += 1
+                    deadline = None if timeout is None else time.time() + timeout
+                    while self._in_flight >= self.in_flight_window:
+                        remaining = None if deadline is None else deadline - time.time()
+                        if remaining is not None and remaining <= 0:
+                            self.window_rejects += 1
+                            self.failed_publishes += 1
+                            return False
+                        self._publish_cond.wait(remaining)
+            self._in_flight += 1
+            self._check_saturation()
+            return True
+
+    def _check_saturation(self):
+        """
+        Warns once the paho outgoing queue is about to overflow, and again only after it drained to half.  Call with
+        _publish_cond held.
+        """
+        queue_size = self.qos_details.queue_size if self.qos_details is not None else 0
+        if not queue_size:
+            return
+        saturation = float(self._in_flight) / queue_size
+        if saturation >= 0.9 and not self._saturation_warned:
+            self._saturation_warned = True
+            log.warning("MQTT outgoing queue is {0:.0%} full: {1} of {2} messages waiting for acknowledgement".format(
+                saturation, self._in_flight, queue_size))
+        elif saturation <= 0.5:
+            self._saturation_warned = False
+
+    def publish_stats(self):
+        """
+        :return: Dict of publish counters, the QoS 1 and 2 messages in flight, the age in seconds of the oldest of
+                 them, the saturation of paho's outgoing queue (None if unlimited), the MQTT v5 publishes sent with
+                 only a topic alias and the bytes they saved, and a snapshot of the acknowledgement latency histogram
+        """
+        queue_size = self.qos_details.queue_size if self.qos_details is not None else 0
+        with self._publish_cond:
+            in_flight = self._in_flight
+            sent_times = [sent for _, qos, sent in self._pending_publishes.itervalues() if qos > 0]
+            stats = {
+                "published": self.published,
+                "completed": self.completed_publishes,
+                "failed": self.failed_publishes,
+                "in_flight": in_flight,
+                "oldest_in_flight_age": time.time() - min(sent_times) if sent_times else None,
+                "in_flight_window": self.in_flight_window,
+                "window_waits": self.window_waits,
+                "window_rejects": self.window_rejects,
+                "queue_size": queue_size or None,
+                "queue_saturation": float(in_flight) / queue_size if queue_size else None,
+                "alias_publishes": self.alias_publishes,
+                "alias_saved_bytes": self.alias_saved_bytes,
+            }
+        stats["ack_latency"] = self.ack_latency.snapshot()
+        return stats
 
     def subscribe(self, topic, qos, callback):
         """
@@ -357,11 +745,19 @@ class Mqtt():
         try:
             self.sub_dict.setdefault(topic, [qos, callback])
             subscribe_response = self._paho_client.subscribe(topic, qos)
-            self._paho_client.message_callback_add(topic, callback)
+            if self.callback_executor is not None:
+                callback = self.callback_executor.wrap(callback, lambda client, userdata, msg: msg.topic)
+            self._paho_client.message_callback_add(topic, self._counting(callback))
             log.info("Topic subscribed with information: " + str(subscribe_response))
         except Exception:
             log.exception("MQTT subscribe exception traceback..")
 
+    def _counting(self, callback):
+        def on_message(client, userdata, msg):
+            self.comms_stats.received(_payload_size(msg.payload))
+            callback(client, userdata, msg)
+        return on_message
+
     def unsubscribe(self, topic):
         """
         Unsubscribes to a topic
@@ -382,16 +778,16 @@ class Mqtt():
         Disconnects from MQTT Broker
         :return:
         """
+        self._disconnect_event.clear()
+        self._closed = True
+        start = time.time()
         self._paho_client.disconnect()
-        ten_ms_count = 0
-        while (ten_ms_count != self._conn_disconn_timeout * 100) and (self._disconnect_result_code == sys.maxsize):
-            ten_ms_count += 1
-            time.sleep(0.01)
+        _wait_for(self._disconnect_event, self._conn_disconn_timeout)
         if self._disconnect_result_code == sys.maxsize:
             raise Exception("Disconnection Timeout")
         elif self._disconnect_result_code == 0:
             log.info("Disconnected from MQTT Broker.")
-            log.info("Disconnect time consumption: " + str(float(ten_ms_count) * 10) + "ms.")
+            log.info("Disconnect time consumption: {0:.1f}ms.".format((time.time() - start) * 1000))
             #  Disconnect is successful.  Stopping background network loop.
             self._paho_client.loop_stop()
         else:
@@ -406,6 +802,16 @@ class Mqtt():
         """
         return self._paho_client._client_id
 
+    def get_state(self):
+        """
+        :return: Connection state, one of the states of liota.lib.utilities.comms_stats
+        """
+        if self._closed:
+            return CLOSED
+        if self.connected:
+            return CONNECTED
+        return DISCONNECTED if self._was_connected else CONNECTING
+
 
 class QoSDetails:
     """
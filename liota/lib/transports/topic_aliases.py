@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+
+class TopicAliases(object):
+    """
+    Topic aliases of one MQTT v5 connection.  A topic is given the next free alias on its first publish, until the
+    broker's Topic Alias Maximum is reached; later topics are always published in full.  The first publish carries the
+    full topic along with the alias to announce it, later ones only the alias.
+
+    Aliases are only used for QoS 0 messages.  paho sends those in the order they are published and never sends them
+    again, while it keeps QoS 1 and 2 messages with their properties and sends them again on the next connection,
+    where their aliases are unknown or stand for other topics.
+
+    Aliases do not survive the connection, reset() starts over on every connect and disconnect.  Not thread-safe.
+    """
+
+    def __init__(self, maximum=0):
+        """
+        :param maximum: Topic Alias Maximum of the broker, 0 disables aliases
+        """
+        self.maximum = 0
+        self._aliases = {}
+        self._topics = []
+        self.reset(maximum)
+
+    def reset(self, maximum):
+        """
+        Forgets all aliases, since a new connection starts without any.
+
+        :param maximum: Topic Alias Maximum of the broker for the new connection, 0 while disconnected
+        :return:
+        """
+        self.maximum = maximum
+        self._aliases = {}
+        self._topics = []
+
+    def get(self, topic):
+        """
+        :param topic: Topic of a QoS 0 publish
+        :return: Tuple of the topic to put in the PUBLISH packet, empty once the alias was announced, and the alias,
+                 None if all aliases are taken
+        """
+        entry = self._aliases.get(topic)
+        if entry is None:
+            if len(self._topics) >= self.maximum:
+                return topic, None
+            self._topics.append(topic)
+            entry = self._aliases[topic] = [len(self._topics), False]
+        if entry[1]:
+            return "", entry[0]
+        return topic, entry[0]
+
+    def announced(self, topic):
+        """
+        Records that paho accepted a publish carrying both topic and alias.
+
+        :param topic: Topic of the publish
+        :return:
+        """
+        entry = self._aliases.get(topic)
+        if entry is not None:
+            entry[1] = True
+
+    def topic(self, alias):
+        """
+        :param alias: Topic alias of the current connection
+        :return: Topic the alias stands for, None if unknown
+        """
+        if 0 < alias <= len(self._topics):
+            return self._topics[alias - 1]
+        return None
+
+    def __len__(self):
+        return len(self._topics)
@@ -33,11 +33,19 @@
 import json
 import logging
 import os
+import random
 import ssl
 import sys
-from websocket import create_connection
+import threading
+import time
+import zlib
+from collections import deque
+from websocket import create_connection, ABNF, WebSocketConnectionClosedException, WebSocketProtocolException
 import Queue
 
+from liota.lib.utilities.comms_stats import CommsStats, CONNECTED, DISCONNECTED, CLOSED
+from liota.lib.utilities.future import Future
+
 log = logging.getLogger(__name__)
 
 
@@ -46,12 +54,18 @@ class WebSocket():
 
     """
 
-    def __init__(self, url, verify_cert, identity):
+    def __init__(self, url, verify_cert, identity, binary=False):
         self.url = url
         self.verify_cert = verify_cert
         self.identity = identity
+        self.opcode = ABNF.OPCODE_BINARY if binary else ABNF.OPCODE_TEXT
+        self.ws = None
+        self.comms_stats = CommsStats(self._state)
         self.connect_soc()
 
+    def _state(self):
+        return CONNECTED if self.ws is not None and self.ws.connected else DISCONNECTED
+
     def connect_soc(self):
         try:
             self.WebSocketConnection()
@@ -99,6 +113,7 @@ class WebSocket():
                     log.error("Stream Closed")
                     raise Exception("No message received from the server, please check the connection.")
                 log.debug("RX {0}".format(msg))
+                self.comms_stats.received(len(msg))
                 queue.put(msg)
         except Exception:
             self.close()
@@ -106,21 +121,27 @@ class WebSocket():
     def send(self, msg):
         log.debug("Sending data to DCC")
         log.debug("TX Sending message {0}".format(msg))
+        start = time.time()
         try:
-            self.ws.send(msg)
+            self.ws.send(msg, self.opcode)
+            self.comms_stats.sent(len(msg), time.time() - start)
         except:
+            self.comms_stats.failed()
             # TODO: Retry logic required to be re-designed
             attempts = 1
             while attempts < 4:
                 try:
                     log.debug("Exception while sending data, applying retry logic.")
                     self.connect_soc()
+                    self.comms_stats.reconnected()
                     log.info("Created New Websocket")
                     log.debug("TX Sending message {0}".format(msg))
-                    self.ws.send(msg)
+                    self.ws.send(msg, self.opcode)
+                    self.comms_stats.sent(len(msg), time.time() - start)
                     break
                 except:
                     # Three times retry websocket connection for publishing data
+                    self.comms_stats.failed()
                     log.info("{0} attempt".format(attempts))
                     attempts += 1
                     if attempts == 4:
@@ -135,3 +156,388 @@ class WebSocket():
         if self.ws is not None:
             self.ws.close()
         log.debug("Connection closed, cleanup done")
+
+
+# permessage-deflate (RFC 7692) offer sent with the opening handshake.  Keeping the compression context between
+# messages is what makes small, repetitive JSON messages compress well.
+_DEFLATE_OFFER = "Sec-WebSocket-Extensions: permessage-deflate"
+# Empty stored block every compressed message ends with; it is stripped by the sender and restored by the receiver
+_DEFLATE_TRAILER = "\x00\x00\xff\xff"
+
+
+class _Connection(object):
+    """
+    A WebSocket connection with its negotiated permessage-deflate state.  The compression contexts belong to the
+    connection and start over with every new one.
+    """
+
+    def __init__(self, ws, compress_level):
+        self.ws = ws
+        self.compress_level = compress_level
+        params = [p.strip() for p in (ws.getheaders() or {}).get("sec-websocket-extensions", "").split(";")]
+        self.deflate = params[0] == "permessage-deflate"
+        self.compressor = None
+        if self.deflate and "client_no_context_takeover" not in params:
+            self.compressor = self._new_compressor()
+        # A decompressor that keeps its window also inflates messages sent without context takeover
+        self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+    def _new_compressor(self):
+        return zlib.compressobj(self.compress_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    def compress(self, data):
+        compressor = self.compressor or self._new_compressor()
+        data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data[:-len(_DEFLATE_TRAILER)]
+
+    def decompress(self, data):
+        return self.decompressor.decompress(data + _DEFLATE_TRAILER)
+
+
+class AsyncWebSocket(object):
+    """
+    WebSocket transport which never blocks its caller on the network.
+
+    Messages are put on a bounded outbound queue and written by a dedicated writer thread.  Every message keeps its own
+    frame, but all frames queued at the time are coalesced into a single socket write.  permessage-deflate is
+    negotiated with the server and used for messages of at least compress_threshold bytes.  A lost connection is
+    re-established in the background with exponential backoff and jitter while messages keep being queued; when the
+    queue is full the oldest messages are dropped.
+    """
+
+    def __init__(self, url, verify_cert, identity, queue_size=1000, max_batch=64, compression=True,
+                 compress_threshold=64, compress_level=6, connect_timeout=10, min_backoff=0.5, max_backoff=60,
+                 binary=False):
+        """
+        :param url: WebSocket server URL
+        :param verify_cert: Boolean value to verify certificate or not
+        :param identity: Identity Object
+        :param queue_size: Maximum number of messages waiting to be written
+        :param max_batch: Maximum number of messages coalesced into one socket write
+        :param compression: Whether to offer permessage-deflate to the server
+        :param compress_threshold: Messages shorter than this many bytes are sent uncompressed
+        :param compress_level: zlib compression level
+        :param connect_timeout: Seconds a connection attempt may take
+        :param min_backoff: Seconds before the first reconnection attempt
+        :param max_backoff: Maximum seconds between reconnection attempts
+        :param binary: Send binary frames instead of text frames
+        """
+        self.url = url
+        self.verify_cert = verify_cert
+        self.identity = identity
+        self.opcode = ABNF.OPCODE_BINARY if binary else ABNF.OPCODE_TEXT
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.connect_timeout = connect_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._sslopt = self._get_sslopt()
+        self._conn = None
+        self._closed = False
+        # Queued (message, Future or None, time queued) tuples, oldest first
+        self._queue = deque()
+        # Number of messages taken off the queue by the writer and not written yet
+        self._writing = 0
+        self._cond = threading.Condition(threading.Lock())
+        self.comms_stats = CommsStats(self._state)
+        self.payload_bytes = 0
+        self.writes = 0
+        self.connect_failures = 0
+        self.dropped_messages = 0
+        try:
+            self._connect()
+        except Exception:
+            self.connect_failures += 1
+            self.comms_stats.failed()
+            log.exception("WebSocket exception, please check the WebSocket address. Retrying in the background.")
+        for target, name in ((self._write_loop, "AsyncWebSocketWriter"), (self._reconnect, "AsyncWebSocketReconnect")):
+            thread = threading.Thread(target=target, name=name)
+            thread.daemon = True
+            thread.start()
+
+    def _get_sslopt(self):
+        if not self.verify_cert:
+            return {"cert_reqs": ssl.CERT_NONE}
+        if self.identity is None:
+            log.error("Identity object is missing")
+            raise ValueError("Identity object is missing")
+        if not self.identity.root_ca_cert:
+            log.error("Error : CA certificate path is missing")
+            raise ValueError("Error : CA certificate path is missing")
+        if not os.path.isfile(self.identity.root_ca_cert):
+            log.error("Error : Wrong CA certificate path.")
+            raise ValueError("Error : Wrong CA certificate path.")
+        return {"cert_reqs": ssl.CERT_REQUIRED, "ca_certs": self.identity.root_ca_cert}
+
+    def _connect(self, reconnect=False):
+        header = [_DEFLATE_OFFER] if self.compression else []
+        ws = create_connection(self.url, timeout=self.connect_timeout, enable_multithread=True, sslopt=self._sslopt,
+                               header=header)
+        ws.settimeout(None)
+        conn = _Connection(ws, self.compress_level)
+        with self._cond:
+            if self._closed:
+                ws.close()
+                return
+            if reconnect:
+                # Counted before the writer can use the connection
+                self.comms_stats.reconnected()
+            self._conn = conn
+            self._cond.notify_all()
+        log.info("WebSocket connected to {0}, permessage-deflate {1}".format(
+            self.url, "enabled" if conn.deflate else "disabled"))
+
+    def _reconnect(self):
+        attempt = 0
+        while True:
+            with self._cond:
+                while self._conn is not None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            delay = min(self.max_backoff, self.min_backoff * 2 ** attempt)
+            time.sleep(random.uniform(delay / 2.0, delay))
+            try:
+                self._connect(reconnect=True)
+            except Exception as e:
+                attempt = min(attempt + 1, 32)
+                self.connect_failures += 1
+                self.comms_stats.failed()
+                log.warning("Reconnecting to {0} failed: {1}".format(self.url, e))
+            else:
+                attempt = 0
+
+    def _state(self):
+        if self._closed:
+            return CLOSED
+        return CONNECTED if self._conn is not None else DISCONNECTED
+
+    def _drop_connection(self, conn):
+        """
+        Must be called with self._cond held.  Does nothing if conn was already replaced.
+        """
+        if self._conn is not conn:
+            return
+        if not self._closed:
+            log.warning("Lost WebSocket connection to {0}".format(self.url))
+        self._conn = None
+        conn.ws.abort()
+        conn.ws.shutdown()
+        self._cond.notify_all()
+
+    def _trim_queue(self):
+        while len(self._queue) > self.queue_size:
+            _, future, _ = self._queue.popleft()
+            self.dropped_messages += 1
+            if future is not None:
+                future.set_exception(IOError("Message dropped from full WebSocket queue"))
+
+    def _frame(self, conn, message):
+        rsv1 = 0
+        if conn.deflate and len(message) >= self.compress_threshold:
+            message = conn.compress(message)
+            rsv1 = 1
+        return ABNF(1, rsv1, 0, 0, self.opcode, 1, message).format()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and (self._conn is None or not self._queue):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                conn = self._conn
+                batch = [self._queue.popleft() for _ in xrange(min(self.max_batch, len(self._queue)))]
+                self._writing = len(batch)
+            messages = [message.encode("utf-8") if isinstance(message, unicode) else message
+                        for message, _, _ in batch]
+            data = "".join(self._frame(conn, message) for message in messages)
+            try:
+                with conn.ws.lock:
+                    conn.ws.sock.sendall(data)
+            except Exception as e:
+                log.debug("WebSocket write failed: {0}".format(e))
+                self.comms_stats.failed()
+                with self._cond:
+                    # Written again in order over the next connection
+                    self._queue.extendleft(reversed(batch))
+                    self._trim_queue()
+                    self._writing = 0
+                    self._drop_connection(conn)
+                continue
+            now = time.time()
+            self.comms_stats.sent(len(data), messages=len(batch))
+            for _, _, queued in batch:
+                self.comms_stats.send_latency.record(now - queued)
+            with self._cond:
+                # Counted once written, a failed batch is framed again
+                self.payload_bytes += sum(len(message) for message in messages)
+                self.writes += 1
+                self._writing = 0
+                self._cond.notify_all()
+            for _, future, _ in batch:
+                if future is not None:
+                    future.set_result(None)
+
+    def _recv_frame(self, conn):
+        """
+        Reads one frame.  websocket-client rejects every frame with RSV1 set, which marks a compressed message, so the
+        frame is validated with RSV1 cleared and RSV1 is only accepted once permessage-deflate was negotiated.
+        """
+        buf = conn.ws.frame_buffer
+        if buf.has_received_header():
+            buf.recv_header()
+        fin, rsv1, rsv2, rsv3, opcode, has_mask, _ = buf.header
+        if buf.has_received_length():
+            buf.recv_length()
+        if buf.has_received_mask():
+            buf.recv_mask()
+        payload = buf.recv_strict(buf.length)
+        if has_mask:
+            payload = ABNF.mask(buf.mask, payload)
+        buf.clear()
+        if rsv1 and not conn.deflate:
+            raise WebSocketProtocolException("Compressed frame received without permessage-deflate")
+        frame = ABNF(fin, 0, rsv2, rsv3, opcode, has_mask, payload)
+        frame.validate(buf.skip_utf8_validation)
+        frame.rsv1 = rsv1
+        return frame
+
+    def _recv_message(self, conn):
+        fragments = None
+        compressed = False
+        while True:
+            frame = self._recv_frame(conn)
+            if frame.opcode in (ABNF.OPCODE_TEXT, ABNF.OPCODE_BINARY):
+                if fragments is not None:
+                    raise WebSocketProtocolException("Illegal frame")
+                fragments = [frame.data]
+                compressed = frame.rsv1
+            elif frame.opcode == ABNF.OPCODE_CONT:
+                if fragments is None or frame.rsv1:
+                    raise WebSocketProtocolException("Illegal frame")
+                fragments.append(frame.data)
+            elif frame.opcode == ABNF.OPCODE_CLOSE:
+                conn.ws.send_close()
+                raise WebSocketConnectionClosedException("Connection closed by the server")
+            elif frame.opcode == ABNF.OPCODE_PING:
+                conn.ws.pong(frame.data)
+                continue
+            else:
+                continue
+            if frame.fin:
+                data = "".join(fragments)
+                return conn.decompress(data) if compressed else data
+
+    def receive(self, queue):
+        """
+        Puts every message received from the server on queue.  Keeps receiving over reconnected connections and only
+        returns once closed.
+
+        :param queue: Queue receiving the messages
+        :return:
+        """
+        log.info("Stream Opened")
+        while True:
+            with self._cond:
+                while self._conn is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                conn = self._conn
+            try:
+                while True:
+                    msg = self._recv_message(conn)
+                    log.debug("RX {0}".format(msg))
+                    self.comms_stats.received(len(msg))
+                    queue.put(msg)
+            except Exception as e:
+                log.debug("WebSocket receive failed: {0}".format(e))
+                with self._cond:
+                    self._drop_connection(conn)
+
+    def send(self, msg):
+        """
+        Queues msg to be sent to the server without waiting for the network.
+
+        :param msg: Message to be sent
+        :return:
+        """
+        log.debug("TX Queueing message {0}".format(msg))
+        self._send(msg, None)
+
+    def send_async(self, msg):
+        """
+        :param msg: Message to be sent
+        :return: Future resolved once msg was written to the socket, or failed if it was dropped from the queue
+        """
+        future = Future()
+        self._send(msg, future)
+        return future
+
+    def _send(self, msg, future):
+        with self._cond:
+            if self._closed:
+                raise IOError("WebSocket is closed")
+            self._queue.append((msg, future, time.time()))
+            self._trim_queue()
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Waits until every queued message was written to the socket.
+
+        :param timeout: Maximum seconds to wait, or None to wait indefinitely
+        :return: True if the queue was flushed
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while (self._queue or self._writing) and not self._closed:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return not self._queue and not self._writing
+
+    def stats(self):
+        """
+        :return: dict of the CommsStats counters, with bytes_sent counting compressed frames, plus the uncompressed
+                 payload bytes, socket writes, queued and dropped messages and failed connection attempts
+        """
+        stats = self.comms_stats.snapshot()
+        with self._cond:
+            stats.update({
+                "deflate": self._conn is not None and self._conn.deflate,
+                "queued_messages": len(self._queue),
+                "payload_bytes": self.payload_bytes,
+                "writes": self.writes,
+                "connect_failures": self.connect_failures,
+                "dropped_messages": self.dropped_messages
+            })
+        return stats
+
+    def close(self):
+        """
+        Closes the connection.  Messages still queued are discarded.
+        :return:
+        """
+        with self._cond:
+            self._closed = True
+            conn, self._conn = self._conn, None
+            pending, self._queue = self._queue, deque()
+            self._cond.notify_all()
+        if conn is not None:
+            # Not waiting for the server's close frame, the receiving thread may be reading from the same socket
+            try:
+                conn.ws.send_close()
+            except Exception:
+                pass
+            conn.ws.abort()
+            conn.ws.shutdown()
+        for _, future, _ in pending:
+            if future is not None:
+                future.set_exception(IOError("WebSocket closed"))
+        log.debug("Connection closed, cleanup done")
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import logging
+import threading
+import zlib
+from collections import defaultdict
+from Queue import Queue, Full
+
+log = logging.getLogger(__name__)
+
+
+class CallbackExecutor(object):
+    """
+    Runs callbacks, e.g., MQTT subscription callbacks, on a few worker threads instead of the thread delivering them,
+    so slow callbacks never block network I/O.
+
+    Callbacks submitted with the same key, e.g., the topic of a message, always run on the same worker, in the order
+    they were submitted.  Each worker has a bounded queue; callbacks submitted while it is full are dropped and
+    counted per key.
+    """
+
+    def __init__(self, num_workers=2, queue_size=1000, name="CallbackWorker"):
+        """
+        :param num_workers: Number of worker threads
+        :param queue_size: Maximum number of callbacks waiting for each worker
+        :param name: Prefix of worker thread names
+        """
+        self.num_workers = num_workers
+        self.queue_size = queue_size
+        self._queues = [Queue(maxsize=queue_size) for _ in range(num_workers)]
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.dropped_by_key = defaultdict(int)
+        self._workers = []
+        for i, queue in enumerate(self._queues):
+            worker = threading.Thread(target=self._run, args=(queue,), name="%s-%d" % (name, i + 1))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Schedules fn(*args, **kwargs) on the worker of key without blocking.
+
+        :param key: String whose callbacks run in order, e.g., a topic
+        :return: False if the worker's queue was full and the callback was dropped
+        """
+        queue = self._queues[(zlib.crc32(key) & 0xffffffff) % self.num_workers]
+        try:
+            queue.put_nowait((fn, args, kwargs))
+        except Full:
+            with self._stats_lock:
+                self.dropped += 1
+                self.dropped_by_key[key] += 1
+                dropped = self.dropped_by_key[key]
+            # Log the first drop of a key and every 100th after it, not every one while overloaded
+            if dropped % 100 == 1:
+                log.warning("Callback queue is full, dropped {0} callbacks for {1}".format(dropped, key))
+            return False
+        with self._stats_lock:
+            self.submitted += 1
+        return True
+
+    def wrap(self, callback, key_fn):
+        """
+        :param callback: Function to run on the workers
+        :param key_fn: Function returning the key from the arguments of a call
+        :return: Function submitting callback with its arguments instead of calling it
+        """
+        def submit(*args):
+            self.submit(key_fn(*args), callback, *args)
+        return submit
+
+    def _run(self, queue):
+        while True:
+            task = queue.get()
+            if task is None:
+                break
+            fn, args, kwargs = task
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                log.exception("Exception in callback")
+                with self._stats_lock:
+                    self.failed += 1
+            else:
+                with self._stats_lock:
+                    self.completed += 1
+
+    def stats(self):
+        """
+        :return: Dict of callback counters, drops per key and the number of callbacks waiting for each worker
+        """
+        with self._stats_lock:
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "dropped_by_key": dict(self.dropped_by_key),
+                "queued": [queue.qsize() for queue in self._queues]
+            }
+
+    def shutdown(self):
+        """
+        Stops the workers once the queued callbacks ran.
+        :return:
+        """
+        for queue in self._queues:
+            queue.put(None)
+        for worker in self._workers:
+            worker.join()
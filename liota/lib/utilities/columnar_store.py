@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+
+from liota.lib.utilities.utility import mkdir
+
+log = logging.getLogger(__name__)
+
+_SEGMENT_SUFFIX = ".seg"
+_INDEX_SUFFIX = ".idx"
+# Every block starts with this magic followed by the length of its JSON header
+_BLOCK_MAGIC = "LCB1"
+_BLOCK_PREFIX = struct.Struct("<4sI")
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _encode_column(typecode, items):
+    """
+    :param typecode: "q" for 64 bit integers or "d" for doubles
+    :param items: List of numbers
+    :return: Little-endian binary column
+    """
+    return struct.pack("<%d%s" % (len(items), typecode), *items)
+
+
+def _decode_column(typecode, data):
+    return struct.unpack("<%d%s" % (len(data) // 8, typecode), data)
+
+
+def _value_type(values):
+    """
+    :return: "q" if all values fit in 64 bit integers, "d" if they are all numbers, "json" otherwise
+    """
+    if all(isinstance(value, (int, long)) and not isinstance(value, bool) and _INT64_MIN <= value <= _INT64_MAX
+           for value in values):
+        return "q"
+    if all(isinstance(value, (int, long, float)) and not isinstance(value, bool) for value in values):
+        return "d"
+    return "json"
+
+
+class _SeriesIndex(object):
+    """
+    The blocks of one series in one segment sorted by their first timestamp, so that the blocks overlapping a time
+    range are found by bisection.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.blocks = []
+        # max_ends[i] is the latest timestamp of blocks[:i + 1], so it never decreases
+        self.max_ends = []
+
+    def add(self, block):
+        i = bisect_right(self.starts, block["min"])
+        self.starts.insert(i, block["min"])
+        self.blocks.insert(i, block)
+        # Blocks are almost always written in time order, so this only appends
+        del self.max_ends[i:]
+        for later in self.blocks[i:]:
+            self.max_ends.append(later["max"] if not self.max_ends else max(self.max_ends[-1], later["max"]))
+
+    def overlapping(self, start, end):
+        """
+        :return: List of the blocks with samples between start and end, None for an open range
+        """
+        first = 0 if start is None else bisect_left(self.max_ends, start)
+        last = len(self.blocks) if end is None else bisect_right(self.starts, end)
+        return [block for block in self.blocks[first:last] if start is None or block["max"] >= start]
+
+
+class _Segment(object):
+    """
+    A segment file and the in-memory copy of its time index.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path[:-len(_SEGMENT_SUFFIX)] + _INDEX_SUFFIX
+        # List of block index entries: {"series", "min", "max", "count", "offset", "length"} in file order
+        self.blocks = []
+        # series -> _SeriesIndex
+        self.series = {}
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+        self.created = None
+        self.min_ts = None
+        self.max_ts = None
+
+    def add_block(self, block):
+        self.blocks.append(block)
+        self.series.setdefault(block["series"], _SeriesIndex()).add(block)
+        self.min_ts = block["min"] if self.min_ts is None else min(self.min_ts, block["min"])
+        self.max_ts = block["max"] if self.max_ts is None else max(self.max_ts, block["max"])
+
+
+class ColumnarStore(object):
+    """
+    Append-only store of time series in rotating, compressed, columnar segment files.
+
+    Samples are buffered per series and written as blocks holding one delta-encoded timestamp column and one value
+    column (64 bit integers, doubles or JSON), each compressed with zlib.  Buffered samples are written at the
+    latest flush_interval seconds after they were appended.  Every segment has an index file listing the series and
+    time range of its blocks, which is kept in memory sorted by time, so reading a time range only decompresses the
+    blocks overlapping it.  Segments are rotated by age and size, and whole segments are deleted to enforce the
+    retention limits.
+    """
+
+    def __init__(self, directory, block_rows=1024, flush_interval=60, segment_duration=3600,
+                 max_segment_bytes=64 * 1024 * 1024, retention_seconds=None, retention_bytes=None,
+                 compression_level=6, comms_stats=None):
+        """
+        :param directory: Directory holding the segment and index files
+        :param block_rows: Number of buffered samples of a series that are written as one block
+        :param flush_interval: Seconds after which buffered samples are written even if block_rows is not reached
+        :param segment_duration: Seconds after which a new segment is started
+        :param max_segment_bytes: Size in bytes after which a new segment is started
+        :param retention_seconds: Segments whose samples are all older than this are deleted, None keeps them
+        :param retention_bytes: Oldest segments are deleted while all segments together are larger, None keeps them
+        :param compression_level: zlib compression level
+        :param comms_stats: CommsStats counting the samples and bytes written to the segments, or None
+        """
+        mkdir(directory)
+        self.directory = directory
+        self.block_rows = block_rows
+        self.flush_interval = flush_interval
+        self.segment_duration = segment_duration
+        self.max_segment_bytes = max_segment_bytes
+        self.retention_seconds = retention_seconds
+        self.retention_bytes = retention_bytes
+        self.compression_level = compression_level
+        self.comms_stats = comms_stats
+        self._lock = threading.Lock()
+        self._flush_cond = threading.Condition(self._lock)
+        self._closed = False
+        # series -> list of (timestamp, value) not written yet
+        self._buffers = {}
+        self._last_flush = time.time()
+        self._segments = self._load_segments()
+        self._next_sequence = max([int(os.path.basename(segment.path).split("-")[2][:-len(_SEGMENT_SUFFIX)])
+                                   for segment in self._segments] or [-1]) + 1
+        self._active = None
+        self._active_file = None
+        self._flush_thread = None
+        if flush_interval > 0:
+            self._flush_thread = threading.Thread(target=self._flush_periodically, name="ColumnarStoreFlush")
+            self._flush_thread.daemon = True
+            self._flush_thread.start()
+
+    def _load_segments(self):
+        segments = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(_SEGMENT_SUFFIX):
+                continue
+            segment = _Segment(os.path.join(self.directory, name))
+            try:
+                with open(segment.index_path) as f:
+                    for line in f:
+                        block = json.loads(line)
+                        # Blocks whose data did not reach the disk before a crash are ignored
+                        if block["offset"] + block["length"] <= segment.size:
+                            segment.add_block(block)
+            except (IOError, ValueError):
+                log.warning("Rebuilding index of segment {0}".format(segment.path))
+                segment = _Segment(segment.path)
+                for block in self._scan_segment(segment):
+                    segment.add_block(block)
+                self._write_index(segment)
+            segments.append(segment)
+        return segments
+
+    def _scan_segment(self, segment):
+        blocks = []
+        with open(segment.path, "rb") as f:
+            offset = 0
+            while True:
+                prefix = f.read(_BLOCK_PREFIX.size)
+                if len(prefix) < _BLOCK_PREFIX.size:
+                    break
+                magic, header_length = _BLOCK_PREFIX.unpack(prefix)
+                if magic != _BLOCK_MAGIC:
+                    break
+                try:
+                    header = json.loads(f.read(header_length))
+                except ValueError:
+                    break
+                length = _BLOCK_PREFIX.size + header_length + header["ts_length"] + header["value_length"]
+                if offset + length > segment.size:
+                    break
+                f.seek(offset + length)
+                blocks.append({"series": header["series"], "min": header["min"], "max": header["max"],
+                               "count": header["count"], "offset": offset, "length": length})
+                offset += length
+        return blocks
+
+    def _write_index(self, segment):
+        with open(segment.index_path, "w") as f:
+            for block in segment.blocks:
+                f.write(json.dumps(block) + "\n")
+
+    def append(self, series, samples):
+        """
+        :param series: Series name
+        :param samples: List of (timestamp in milliseconds, value) tuples
+        :return:
+        """
+        with self._lock:
+            buf = self._buffers.setdefault(series, [])
+            buf.extend(samples)
+            if len(buf) >= self.block_rows:
+                self._write_block(series, self._buffers.pop(series))
+            if time.time() - self._last_flush >= self.flush_interval:
+                self._flush_buffers()
+
+    def flush(self):
+        """
+        Writes all buffered samples to the active segment.
+        :return:
+        """
+        with self._lock:
+            self._flush_buffers()
+
+    def _flush_periodically(self):
+        with self._flush_cond:
+            while not self._closed:
+                remaining = self._last_flush + self.flush_interval - time.time()
+                if remaining > 0:
+                    self._flush_cond.wait(remaining)
+                    continue
+                try:
+                    self._flush_buffers()
+                except Exception:
+                    self._last_flush = time.time()
+                    if self.comms_stats is not None:
+                        self.comms_stats.failed()
+                    log.exception("Could not write buffered samples to {0}".format(self.directory))
+
+    def _flush_buffers(self):
+        for series in sorted(self._buffers):
+            self._write_block(series, self._buffers[series])
+        self._buffers = {}
+        self._last_flush = time.time()
+        if self._active_file is not None:
+            self._active_file.flush()
+            self._active_index_file.flush()
+
+    def _write_block(self, series, samples):
+        if not samples:
+            return
+        samples = sorted(samples, key=lambda sample: sample[0])
+        timestamps = [int(sample[0]) for sample in samples]
+        deltas = [timestamps[0]] + [timestamps[i] - timestamps[i - 1] for i in range(1, len(timestamps))]
+        values = [sample[1] for sample in samples]
+        value_type = _value_type(values)
+        if value_type == "json":
+            value_data = json.dumps(values)
+        else:
+            value_data = _encode_column(value_type, values)
+        ts_data = zlib.compress(_encode_column("q", deltas),
+                                self.compression_level)
+        value_data = zlib.compress(value_data, self.compression_level)
+        header = json.dumps({"series": series, "count": len(samples), "min": timestamps[0], "max": timestamps[-1],
+                             "value_type": value_type, "ts_length": len(ts_data), "value_length": len(value_data)})
+        segment = self._get_active_segment(timestamps[0])
+        block = {"series": series, "min": timestamps[0], "max": timestamps[-1], "count": len(samples),
+                 "offset": segment.size,
+                 "length": _BLOCK_PREFIX.size + len(header) + len(ts_data) + len(value_data)}
+        self._active_file.write(_BLOCK_PREFIX.pack(_BLOCK_MAGIC, len(header)) + header + ts_data + value_data)
+        self._active_index_file.write(json.dumps(block) + "\n")
+        segment.size += block["length"]
+        segment.add_block(block)
+        if self.comms_stats is not None:
+            self.comms_stats.sent(block["length"], messages=len(samples))
+
+    def _get_active_segment(self, first_ts):
+        if self._active is not None and (time.time() - self._active.created >= self.segment_duration or
+                                         self._active.size >= self.max_segment_bytes):
+            self._close_active_segment()
+            self._enforce_retention()
+        if self._active is None:
+            path = os.path.join(self.directory, "segment-%015d-%06d%s" % (first_ts, self._next_sequence,
+                                                                            _SEGMENT_SUFFIX))
+            self._next_sequence += 1
+            self._active = _Segment(path)
+            self._active.created = time.time()
+            self._active_file = open(path, "ab")
+            self._active_index_file = open(self._active.index_path, "a")
+            self._segments.append(self._active)
+        return self._active
+
+    def _close_active_segment(self):
+        if self._active_file is not None:
+            self._active_file.close()
+            self._active_index_file.close()
+        self._active = None
+        self._active_file = None
+        self._active_index_file = None
+
+    def enforce_retention(self):
+        """
+        Deletes the segments outside of the retention limits.
+        :return: Number of deleted segments
+        """
+        with self._lock:
+            return self._enforce_retention()
+
+    def _enforce_retention(self):
+        expired = []
+        # oldest data first
+        closed = sorted((segment for segment in self._segments if segment is not self._active),
+                        key=lambda segment: segment.max_ts)
+        if self.retention_seconds is not None:
+            oldest_ts = (time.time() - self.retention_seconds) * 1000
+            expired.extend(segment for segment in closed
+                           if segment.max_ts is None or segment.max_ts < oldest_ts)
+        if self.retention_bytes is not None:
+            total = sum(segment.size for segment in self._segments if segment not in expired)
+            for segment in closed:
+                if total <= self.retention_bytes:
+                    break
+                if segment not in expired:
+                    expired.append(segment)
+                    total -= segment.size
+        for segment in expired:
+            log.info("Deleting segment {0} outside of the retention limits".format(segment.path))
+            self._segments.remove(segment)
+            for path in (segment.path, segment.index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        return len(expired)
+
+    def series(self):
+        """
+        :return: Sorted list of the names of all stored series
+        """
+        with self._lock:
+            names = set(self._buffers)
+            for segment in self._segments:
+                names.update(segment.series)
+        return sorted(names)
+
+    def read(self, series, start=None, end=None):
+        """
+        :param series: Series name
+        :param start: First timestamp in milliseconds to return, None for the oldest sample
+        :param end: Last timestamp in milliseconds to return, None for the newest sample
+        :return: List of (timestamp, value) tuples sorted by timestamp
+        """
+        with self._lock:
+            if self._active_file is not None:
+                self._active_file.flush()
+            blocks = [(segment.path, block) for segment in self._segments if series in segment.series and
+                      (start is None or segment.max_ts >= start) and (end is None or segment.min_ts <= end)
+                      for block in segment.series[series].overlapping(start, end)]
+            samples = [sample for sample in self._buffers.get(series, [])
+                       if (start is None or sample[0] >= start) and (end is None or sample[0] <= end)]
+        for path, block in blocks:
+            for sample in self._read_block(path, block):
+                if (start is None or sample[0] >= start) and (end is None or sample[0] <= end):
+                    samples.append(sample)
+        samples.sort(key=lambda sample: sample[0])
+        return samples
+
+    def _read_block(self, path, block):
+        with open(path, "rb") as f:
+            f.seek(block["offset"])
+            data = f.read(block["length"])
+        _, header_length = _BLOCK_PREFIX.unpack(data[:_BLOCK_PREFIX.size])
+        position = _BLOCK_PREFIX.size + header_length
+        header = json.loads(data[_BLOCK_PREFIX.size:position])
+        ts_data = zlib.decompress(data[position:position + header["ts_length"]])
+        position += header["ts_length"]
+        value_data = zlib.decompress(data[position:position + header["value_length"]])
+        timestamps = []
+        ts = 0
+        for delta in _decode_column("q", ts_data):
+            ts += delta
+            timestamps.append(ts)
+        if header["value_type"] in ("q", "d"):
+            values = list(_decode_column(header["value_type"], value_data))
+        else:
+            values = json.loads(value_data)
+        return zip(timestamps, values)
+
+    def export(self, fileobj, series=None, start=None, end=None):
+        """
+        Writes samples as CSV lines of series,timestamp,value.
+
+        :param fileobj: File object to write to
+        :param series: List of series names, None for all series
+        :param start: First timestamp in milliseconds to export, None for the oldest sample
+        :param end: Last timestamp in milliseconds to export, None for the newest sample
+        :return: Number of exported samples
+        """
+        count = 0
+        for name in series if series is not None else self.series():
+            for ts, value in self.read(name, start, end):
+                fileobj.write("%s,%d,%s\n" % (name, ts, json.dumps(value)))
+                count += 1
+        return count
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._flush_cond.notify()
+            self._flush_buffers()
+            self._close_active_segment()
+        if self._flush_thread is not None:
+            self._flush_thread.join()
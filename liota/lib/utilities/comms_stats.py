@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import threading
+
+from liota.lib.utilities.histogram import LatencyHistogram
+
+#: Connection states reported by CommsStats
+CONNECTING = "connecting"
+CONNECTED = "connected"
+DISCONNECTED = "disconnected"
+CLOSED = "closed"
+UNKNOWN = "unknown"
+
+
+class CommsStats(object):
+    """
+    Statistics every DCCComms keeps about its transport: messages and bytes sent and received, the send latency
+    distribution, errors, reconnects and the connection state.
+
+    Counting a message takes a lock and a histogram update, cheap enough to stay enabled in production.  The
+    connection state is not counted but asked from the transport when a snapshot is taken.
+    """
+
+    def __init__(self, state=None):
+        """
+        :param state: Callable returning the current connection state, e.g. CONNECTED.  UNKNOWN if None.
+        """
+        self._state = state
+        self._lock = threading.Lock()
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.messages_received = 0
+        self.bytes_received = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.send_latency = LatencyHistogram()
+
+    def sent(self, size, latency=None, messages=1):
+        """
+        :param size: Bytes written to the network
+        :param latency: Seconds from the send request until it completed, not recorded if None
+        :param messages: Number of messages sent together
+        :return:
+        """
+        with self._lock:
+            self.messages_sent += messages
+            self.bytes_sent += size
+        if latency is not None:
+            self.send_latency.record(latency)
+
+    def received(self, size):
+        """
+        :param size: Bytes of the received message
+        :return:
+        """
+        with self._lock:
+            self.messages_received += 1
+            self.bytes_received += size
+
+    def failed(self, errors=1):
+        """
+        Counts failed sends and failed connection attempts.
+
+        :param errors: Number of errors
+        :return:
+        """
+        with self._lock:
+            self.errors += errors
+
+    def reconnected(self):
+        with self._lock:
+            self.reconnects += 1
+
+    @property
+    def state(self):
+        return self._state() if self._state is not None else UNKNOWN
+
+    def snapshot(self):
+        """
+        :return: dict of the counters, the current connection state and a snapshot of the send latency histogram
+        """
+        with self._lock:
+            stats = {
+                "messages_sent": self.messages_sent,
+                "bytes_sent": self.bytes_sent,
+                "messages_received": self.messages_received,
+                "bytes_received": self.bytes_received,
+                "errors": self.errors,
+                "reconnects": self.reconnects
+            }
+        stats["state"] = self.state
+        stats["send_latency"] = self.send_latency.snapshot()
+        return stats
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+"""
+Payload compressors used by CompressedDccComms.
+
+A compressed frame starts with a flag byte naming the compressor, followed by the compressed payload; flag 0 marks a
+payload sent as is.  zlib is always available, LZ4 only if the lz4 package is installed.
+"""
+
+import logging
+import zlib
+from abc import ABCMeta, abstractmethod
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+log = logging.getLogger(__name__)
+
+#: Flag byte of a payload sent uncompressed
+FLAG_NONE = 0
+
+
+class Compressor(object):
+    """
+    Abstract base class for payload compressors.
+    """
+    __metaclass__ = ABCMeta
+
+    #: Name the compressor is selected with
+    name = None
+    #: Flag byte marking frames compressed with this compressor
+    flag = None
+
+    @abstractmethod
+    def compress(self, data):
+        """
+        :param data: Payload string
+        :return: Compressed payload string
+        """
+        pass
+
+    @abstractmethod
+    def decompress(self, data):
+        """
+        :param data: Compressed payload string
+        :return: Original payload string
+        """
+        pass
+
+
+class ZlibCompressor(Compressor):
+    """
+    zlib (deflate) from the standard library.
+    """
+    name = "zlib"
+    flag = 1
+
+    def __init__(self, level=6):
+        """
+        :param level: zlib compression level, 1 (fastest) to 9 (smallest)
+        """
+        self.level = level
+
+    def compress(self, data):
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+
+class Lz4Compressor(Compressor):
+    """
+    LZ4 frame format using lz4.  Compresses less than zlib, at a fraction of the CPU cost.
+    """
+    name = "lz4"
+    flag = 2
+
+    def __init__(self, level=0):
+        """
+        :param level: LZ4 compression level, 0 for the fast mode
+        """
+        if lz4_frame is None:
+            raise ValueError("lz4 compressor requires the lz4 package")
+        self.level = level
+
+    def compress(self, data):
+        return lz4_frame.compress(data, compression_level=self.level)
+
+    def decompress(self, data):
+        return lz4_frame.decompress(data)
+
+
+COMPRESSORS = dict((compressor_class.name, compressor_class) for compressor_class in (ZlibCompressor, Lz4Compressor))
+
+
+def get_compressor(compressor=None):
+    """
+    :param compressor: Compressor object, name of a compressor in COMPRESSORS or None for zlib
+    :return: Compressor object
+    """
+    if compressor is None:
+        return ZlibCompressor()
+    if isinstance(compressor, Compressor):
+        return compressor
+    if compressor not in COMPRESSORS:
+        raise ValueError("Unknown compressor {0}, expected one of {1}".format(compressor,
+                                                                          ", ".join(sorted(COMPRESSORS))))
+    return COMPRESSORS[compressor]()
+
+
+def unpack(frame):
+    """
+    Restores the payload of a frame built by CompressedDccComms.
+
+    :param frame: Frame starting with its flag byte
+    :return: Original payload
+    """
+    flag = ord(frame[0])
+    if flag == FLAG_NONE:
+        return frame[1:]
+    for compressor_class in COMPRESSORS.itervalues():
+        if compressor_class.flag == flag:
+            return compressor_class().decompress(frame[1:])
+    raise ValueError("Unknown compression flag {0}".format(flag))
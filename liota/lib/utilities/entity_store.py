@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import json
+import logging
+import os
+import sqlite3
+from threading import Lock
+
+from liota.lib.utilities.utility import mkdir
+
+log = logging.getLogger(__name__)
+
+
+def write_json_file(file_path, doc, **kwargs):
+    """
+    Atomically replaces a JSON file: the document is written to a temporary file which is then renamed,
+    so readers never observe a partially written file.
+
+    :param file_path: Destination file path
+    :param doc: JSON serializable document
+    :param kwargs: Keyword arguments for json.dump
+    :return:
+    """
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(doc, f, **kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp_path, file_path)
+
+
+class EntityStore(object):
+    """
+    Indexed, crash-safe local store of JSON documents backed by an embedded SQLite database.
+
+    Documents are grouped in namespaces and addressed by key, so that reading or updating one document is a single
+    indexed operation regardless of how many documents are stored.  Every update marks its document as not exported;
+    export_files() writes only those documents as <key>.json files for agents that consume the legacy file layout.
+    Deleting documents marks their namespace as changed until it is exported again.
+    """
+
+    def __init__(self, db_path):
+        """
+        :param db_path: Path of the SQLite database file
+        """
+        mkdir(os.path.dirname(db_path))
+        self.db_path = db_path
+        self._lock = Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        # Write-ahead logging keeps the database consistent if the process or the system crashes mid-update
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS documents ("
+                           "namespace TEXT NOT NULL, "
+                           "key TEXT NOT NULL, "
+                           "value TEXT NOT NULL, "
+                           "version INTEGER NOT NULL, "
+                           "exported_version INTEGER NOT NULL, "
+                           "PRIMARY KEY (namespace, key))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_not_exported "
+                           "ON documents (namespace) WHERE version != exported_version")
+        # Namespaces with documents deleted since their last export, and how many deletions happened
+        self._conn.execute("CREATE TABLE IF NOT EXISTS namespace_deletions ("
+                           "namespace TEXT PRIMARY KEY, "
+                           "deletions INTEGER NOT NULL)")
+        self._conn.commit()
+        log.debug("Opened entity store {0}".format(db_path))
+
+    def get(self, namespace, key):
+        """
+        :param namespace: Namespace of the document
+        :param key: Key of the document
+        :return: Document or None if it does not exist
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM documents WHERE namespace = ? AND key = ?",
+                                     (namespace, key)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, namespace, key, doc):
+        """
+        Inserts or replaces a document and marks it as not exported.
+
+        :param namespace: Namespace of the document
+        :param key: Key of the document
+        :param doc: JSON serializable document
+        :return:
+        """
+        value = json.dumps(doc, sort_keys=True)
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute("UPDATE documents SET value = ?, version = version + 1 "
+                                            "WHERE namespace = ? AND key = ?", (value, namespace, key))
+                if cursor.rowcount == 0:
+                    self._conn.execute("INSERT INTO documents VALUES (?, ?, ?, 1, 0)", (namespace, key, value))
+
+    def delete(self, namespace, key):
+        """
+        Deletes a document and marks its namespace as changed.
+
+        :param namespace: Namespace of the document
+        :param key: Key of the document
+        :return: True if the document existed
+        """
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute("DELETE FROM documents WHERE namespace = ? AND key = ?", (namespace, key))
+                self._mark_deleted(namespace, cursor)
+        return cursor.rowcount > 0
+
+    def clear(self, namespace):
+        """
+        Removes every document of a namespace and marks it as changed.
+
+        :param namespace: Namespace
+        :return:
+        """
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute("DELETE FROM documents WHERE namespace = ?", (namespace,))
+                self._mark_deleted(namespace, cursor)
+
+    def _mark_deleted(self, namespace, cursor):
+        # Must be called with self._lock held, in the transaction of the DELETE that ran on cursor
+        if cursor.rowcount > 0:
+            self._conn.execute("INSERT OR IGNORE INTO namespace_deletions VALUES (?, 0)", (namespace,))
+            self._conn.execute("UPDATE namespace_deletions SET deletions = deletions + 1 WHERE namespace = ?",
+                               (namespace,))
+
+    def _deletions(self, namespace):
+        # Must be called with self._lock held
+        row = self._conn.execute("SELECT deletions FROM namespace_deletions WHERE namespace = ?",
+                                 (namespace,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def _clear_deletions(self, namespace, deletions):
+        # Must be called with self._lock held, in a transaction.  Deletions after the export read keep the flag.
+        self._conn.execute("DELETE FROM namespace_deletions WHERE namespace = ? AND deletions = ?",
+                           (namespace, deletions))
+
+    def items(self, namespace):
+        """
+        :param namespace: Namespace
+        :return: List of (key, document) tuples ordered by key
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM documents WHERE namespace = ? ORDER BY key",
+                                      (namespace,)).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def export_items(self, namespace):
+        """
+        Reads a namespace that is exported as a whole, e.g. into a single file.
+
+        :param namespace: Namespace
+        :return: Tuple of the list of (key, document) tuples ordered by key, and the snapshot to pass to
+                 mark_exported() once they are written
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value, version FROM documents WHERE namespace = ? ORDER BY key",
+                                      (namespace,)).fetchall()
+            deletions = self._deletions(namespace)
+        items = [(key, json.loads(value)) for key, value, _ in rows]
+        return items, ([(version, namespace, key) for key, _, version in rows], deletions)
+
+    def count(self, namespace):
+        """
+        :param namespace: Namespace
+        :return: Number of documents in the namespace
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents WHERE namespace = ?",
+                                      (namespace,)).fetchone()[0]
+
+    def export_files(self, namespace, directory, only_changed=True, **kwargs):
+        """
+        Writes documents of a namespace as <directory>/<key>.json files.
+
+        :param namespace: Namespace
+        :param directory: Destination directory
+        :param only_changed: Write only documents updated since their last export
+        :param kwargs: Keyword arguments for json.dump
+        :return: Number of files written
+        """
+        query = "SELECT key, value, version FROM documents WHERE namespace = ?"
+        if only_changed:
+            query += " AND version != exported_version"
+        with self._lock:
+            rows = self._conn.execute(query, (namespace,)).fetchall()
+            deletions = self._deletions(namespace)
+        if rows:
+            mkdir(directory)
+        exported = []
+        for key, value, version in rows:
+            try:
+                write_json_file(os.path.join(directory, key + '.json'), json.loads(value), **kwargs)
+                exported.append((version, namespace, key))
+            except (IOError, OSError):
+                log.exception("Could not export {0} of {1}".format(key, namespace))
+        with self._lock:
+            with self._conn:
+                # Documents updated while exporting keep their newer version and are exported next time
+                self._conn.executemany("UPDATE documents SET exported_version = version "
+                                       "WHERE version = ? AND namespace = ? AND key = ?", exported)
+                # Files of deleted documents are left in place
+                self._clear_deletions(namespace, deletions)
+        return len(exported)
+
+    def has_changes(self, namespace):
+        """
+        :param namespace: Namespace
+        :return: True if any document of the namespace was updated or deleted since its last export
+        """
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents WHERE namespace = ? AND version != exported_version "
+                                      "UNION ALL SELECT 1 FROM namespace_deletions WHERE namespace = ? LIMIT 1",
+                                      (namespace, namespace)).fetchone() is not None
+
+    def mark_exported(self, namespace, snapshot=None):
+        """
+        Marks the documents of a namespace as exported.  Used when a namespace is exported as a whole.
+
+        :param namespace: Namespace
+        :param snapshot: Snapshot returned by export_items() with the documents that were written.  Documents updated
+                         or deleted since then stay changed.  Every document is marked if None.
+        :return:
+        """
+        with self._lock:
+            with self._conn:
+                if snapshot is None:
+                    self._conn.execute("UPDATE documents SET exported_version = version WHERE namespace = ?",
+                                       (namespace,))
+                    self._conn.execute("DELETE FROM namespace_deletions WHERE namespace = ?", (namespace,))
+                else:
+                    exported, deletions = snapshot
+                    self._conn.executemany("UPDATE documents SET exported_version = version "
+                                           "WHERE version = ? AND namespace = ? AND key = ?", exported)
+                    self._clear_deletions(namespace, deletions)
+
+    def import_files(self, namespace, directory):
+        """
+        Loads <key>.json files of a directory into a namespace, e.g. to migrate files written by older versions.
+
+        :param namespace: Namespace
+        :param directory: Source directory
+        :return: Number of documents imported
+        """
+        if not os.path.isdir(directory):
+            return 0
+        imported = 0
+        for file_name in os.listdir(directory):
+            if not file_name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, file_name)) as f:
+                    doc = json.load(f)
+            except (IOError, ValueError):
+                log.warn("Skipped unreadable file {0} while importing {1}".format(file_name, namespace))
+                continue
+            self.put(namespace, file_name[:-len('.json')], doc)
+            imported += 1
+        if imported:
+            self.mark_exported(namespace)
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -59,3 +59,13 @@ class Filter:
         :return: Filtered value or None
         """
         pass
+
+    def filter_many(self, values):
+        """
+        Filters a batch of collected values one by one.  Child classes may override it to filter them at once.
+
+        :param values: Collected values
+        :return: List of the filtered values that were not filtered out, in order
+        """
+        filtered = (self.filter(v) for v in values)
+        return [v for v in filtered if v is not None]
@@ -30,10 +30,15 @@
 #  THE POSSIBILITY OF SUCH DAMAGE.                                            #
 # ----------------------------------------------------------------------------#
 
+from itertools import compress
 import logging
 from numbers import Number
 
 from aenum import UniqueEnum
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from liota.lib.utilities.filters.filter import Filter
 
@@ -79,9 +84,48 @@ class Type(UniqueEnum):
     AT_LEAST = 11
 
 
+# Types checked without going through the Number ABC, whose isinstance() check is much slower than a filter
+_NUMBER_TYPES = frozenset([int, long, float])
+
+# Filter type -> (function of lower and upper bound returning the predicate of a value passing the filter,
+#                 function of a NumPy array, lower and upper bound returning the mask of the values passing it)
+_PREDICATES = {
+    #  Accept filters - bounded at both ends
+    Type.CLOSED: (lambda l, u: lambda v: l <= v <= u,
+                  lambda a, l, u: (l <= a) & (a <= u)),
+    Type.OPEN: (lambda l, u: lambda v: l < v < u,
+                lambda a, l, u: (l < a) & (a < u)),
+    Type.CLOSED_OPEN: (lambda l, u: lambda v: l <= v < u,
+                       lambda a, l, u: (l <= a) & (a < u)),
+    Type.OPEN_CLOSED: (lambda l, u: lambda v: l < v <= u,
+                       lambda a, l, u: (l < a) & (a <= u)),
+    #  Reject filters - bounded at both ends
+    Type.CLOSED_REJECT: (lambda l, u: lambda v: not l <= v <= u,
+                         lambda a, l, u: ~((l <= a) & (a <= u))),
+    Type.OPEN_REJECT: (lambda l, u: lambda v: not l < v < u,
+                       lambda a, l, u: ~((l < a) & (a < u))),
+    Type.CLOSED_OPEN_REJECT: (lambda l, u: lambda v: not l <= v < u,
+                              lambda a, l, u: ~((l <= a) & (a < u))),
+    Type.OPEN_CLOSED_REJECT: (lambda l, u: lambda v: not l < v <= u,
+                              lambda a, l, u: ~((l < a) & (a <= u))),
+    #  Filters - bounded at one end
+    Type.LESS_THAN: (lambda l, u: lambda v: v < l,
+                     lambda a, l, u: a < l),
+    Type.AT_MOST: (lambda l, u: lambda v: v <= l,
+                   lambda a, l, u: a <= l),
+    Type.GREATER_THAN: (lambda l, u: lambda v: v > u,
+                        lambda a, l, u: a > u),
+    Type.AT_LEAST: (lambda l, u: lambda v: v >= u,
+                    lambda a, l, u: a >= u),
+}
+
+
 class RangeFilter(Filter):
     """
     A simple lightweight filter, that filters values based on the specified filter type (range).
+
+    The filter type and bounds are compiled into a single predicate when the filter is created, so they must not be
+    changed afterwards.
     """
 
     def __init__(self, filter_type, lower_bound, upper_bound):
@@ -98,6 +142,9 @@ class RangeFilter(Filter):
         self._validate(lower_bound, upper_bound)
         self.lower_bound = lower_bound
         self.upper_bound = upper_bound
+        predicate, mask = _PREDICATES[filter_type]
+        self._accepts = predicate(lower_bound, upper_bound)
+        self._mask = mask
 
     def _validate(self, lower_bound, upper_bound):
         """
@@ -130,54 +177,26 @@ class RangeFilter(Filter):
         :param v: Collected value
         :return: Filtered value or None
         """
-        result = None
-        log.info("Applying RangeFilter " + str(self.filter_type))
-        if not isinstance(v, Number):
+        if type(v) not in _NUMBER_TYPES and not isinstance(v, Number):
             log.warn("Value is not a number. Returning without applying filter")
             return v
+        return v if self._accepts(v) else None
 
-        # Accept filters - bounded at both ends
-        elif self.filter_type is Type.CLOSED and (self.lower_bound <= v <= self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.OPEN and (self.lower_bound < v < self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.CLOSED_OPEN and (self.lower_bound <= v < self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.OPEN_CLOSED and (self.lower_bound < v <= self.upper_bound):
-            result = v
-
-        # Reject filters - bounded at both ends
-        elif self.filter_type is Type.CLOSED_REJECT and (not self.lower_bound <= v <= self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.OPEN_REJECT and (not self.lower_bound < v < self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.CLOSED_OPEN_REJECT and (not self.lower_bound <= v < self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.OPEN_CLOSED_REJECT and (not self.lower_bound < v <= self.upper_bound):
-            result = v
-
-        # Filters - bounded at one end
-        elif self.filter_type is Type.LESS_THAN and (v < self.lower_bound):
-            result = v
-
-        elif self.filter_type is Type.AT_MOST and (v <= self.lower_bound):
-            result = v
-
-        elif self.filter_type is Type.GREATER_THAN and (v > self.upper_bound):
-            result = v
-
-        elif self.filter_type is Type.AT_LEAST and (v >= self.upper_bound):
-            result = v
-
-        if result is not None:
-            log.info("Value passed by filter : %s" % str(result))
-        else:
-            log.info("Value rejected by filter : %s" % str(v))
+    def filter_many(self, values):
+        """
+        Filters a batch of collected values at once, using NumPy if it is installed and the values are numbers.
 
-        return result
+        :param values: List or NumPy array of collected values
+        :return: Values passed by the filter, in order.  A NumPy array for a NumPy array, a list otherwise.
+        """
+        if numpy is not None:
+            array = values if isinstance(values, numpy.ndarray) else numpy.asarray(values)
+            if array.dtype.kind in "iuf":
+                mask = self._mask(array, self.lower_bound, self.upper_bound)
+                if array is values:
+                    return values[mask]
+                return list(compress(values, mask.tolist()))
+            elif array is values:
+                return numpy.array([v for v in values if self.filter(v) is not None], dtype=values.dtype)
+        accepts = self._accepts
+        return [v for v in values if (accepts(v) if type(v) in _NUMBER_TYPES else self.filter(v) is not None)]
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import logging
+import sys
+from Queue import Queue
+from threading import Condition, Lock, Thread
+
+log = logging.getLogger(__name__)
+
+
+class FutureTimeoutError(Exception):
+    """
+    Raised when the result of a Future is not available within the requested timeout.
+    """
+    pass
+
+
+class Future(object):
+    """
+    A minimal, thread-safe placeholder for the result of an asynchronous operation.
+
+    Results are set exactly once, either with set_result() or set_exception().  Callbacks added with
+    add_done_callback() run in the thread that completes the Future, or immediately if it is already done.
+    """
+
+    def __init__(self):
+        self._condition = Condition(Lock())
+        self._done = False
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def done(self):
+        """
+        :return: True if a result or an exception has been set.
+        """
+        with self._condition:
+            return self._done
+
+    def result(self, timeout=None):
+        """
+        Wait for the Future to complete and return its result.
+
+        :param timeout: Seconds to wait.  None waits forever.
+        :return: Result of the operation.  Re-raises the exception if the operation failed.
+        """
+        with self._condition:
+            if not self._done:
+                self._condition.wait(timeout)
+            if not self._done:
+                raise FutureTimeoutError("Result not available within {0} seconds".format(timeout))
+            if self._exc_info is not None:
+                raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+            return self._result
+
+    def exception(self, timeout=None):
+        """
+        Wait for the Future to complete and return its exception, or None if it succeeded.
+
+        :param timeout: Seconds to wait.  None waits forever.
+        :return: Exception object or None
+        """
+        with self._condition:
+            if not self._done:
+                self._condition.wait(timeout)
+            if not self._done:
+                raise FutureTimeoutError("Result not available within {0} seconds".format(timeout))
+            return self._exc_info[1] if self._exc_info is not None else None
+
+    def add_done_callback(self, fn):
+        """
+        Attach a callable that will be called with this Future as its only argument once it completes.
+
+        :param fn: Callable
+        :return:
+        """
+        with self._condition:
+            if not self._done:
+                self._callbacks.append(fn)
+                return
+        self._invoke_callback(fn)
+
+    def set_result(self, result):
+        """
+        Complete the Future successfully.
+
+        :param result: Result of the operation
+        :return: True if this call completed the Future, False if it was already done
+        """
+        return self._complete(result, None)
+
+    def set_exception(self, exception):
+        """
+        Complete the Future with an exception.  If called from an except block, the traceback is preserved.
+
+        :param exception: Exception object
+        :return: True if this call completed the Future, False if it was already done
+        """
+        exc_info = sys.exc_info()
+        if exc_info[1] is not exception:
+            exc_info = (type(exception), exception, None)
+        return self._complete(None, exc_info)
+
+    def _complete(self, result, exc_info):
+        with self._condition:
+            if self._done:
+                return False
+            self._result = result
+            self._exc_info = exc_info
+            self._done = True
+            callbacks = self._callbacks
+            self._callbacks = []
+            self._condition.notify_all()
+        for fn in callbacks:
+            self._invoke_callback(fn)
+        return True
+
+    def _invoke_callback(self, fn):
+        try:
+            fn(self)
+        except Exception:
+            log.exception("Exception in Future callback")
+
+
+def wait_all(futures, timeout=None):
+    """
+    Wait for every Future in a list to complete.
+
+    :param futures: List of Future objects
+    :param timeout: Overall seconds to wait.  None waits forever.
+    :return: List of Futures that are still not done when the timeout expires
+    """
+    from time import time as _time
+    deadline = None if timeout is None else _time() + timeout
+    pending = []
+    for future in futures:
+        remaining = None if deadline is None else max(0, deadline - _time())
+        try:
+            future.exception(remaining)
+        except FutureTimeoutError:
+            pending.append(future)
+    return pending
+
+
+def gather(futures):
+    """
+    Combine several Futures into one without blocking.
+
+    :param futures: List of Future objects
+    :return: Future resolved with the list of their results once all of them completed, or with the exception of
+             the first failed Future in the list
+    """
+    futures = list(futures)
+    combined = Future()
+    remaining = [len(futures)]
+    lock = Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] != 0:
+                return
+        for future in futures:
+            if future.exception() is not None:
+                combined.set_exception(future.exception())
+                return
+        combined.set_result([future.result() for future in futures])
+
+    if not futures:
+        combined.set_result([])
+    for future in futures:
+        future.add_done_callback(on_done)
+    return combined
+
+
+def call_in_parallel(fns, name="ParallelCall"):
+    """
+    Call each function in its own daemon thread, e.g., to create several comms objects, each connecting in its
+    constructor, at the same time.
+
+    :param fns: List of functions taking no arguments
+    :param name: Prefix of thread names
+    :return: List of Futures for the return values of fns, in the same order
+    """
+    futures = []
+    for i, fn in enumerate(fns):
+        future = Future()
+
+        def run(future=future, fn=fn):
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+        thread = Thread(target=run, name="%s-%d" % (name, i + 1))
+        thread.daemon = True
+        thread.start()
+        futures.append(future)
+    return futures
+
+
+class CompletionExecutor(object):
+    """
+    A small pool of daemon threads that runs continuations of asynchronous operations, so that
+    threads which complete Futures (e.g. message dispatchers) never run user or file I/O code themselves.
+    """
+
+    def __init__(self, num_workers, name="CompletionWorker"):
+        """
+        :param num_workers: Number of worker threads
+        :param name: Prefix of worker thread names
+        """
+        self._tasks = Queue()
+        self._workers = []
+        for i in range(num_workers):
+            worker = Thread(target=self._run, name="%s-%d" % (name, i + 1))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedule fn(*args, **kwargs) on a worker thread.
+
+        :return: Future for the return value of fn
+        """
+        future = Future()
+        self._tasks.put((future, fn, args, kwargs))
+        return future
+
+    def _run(self):
+        while True:
+            future, fn, args, kwargs = self._tasks.get()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
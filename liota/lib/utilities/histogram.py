@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import bisect
+import threading
+
+# Upper bounds of the default buckets in seconds, from 1 ms to 60 s
+DEFAULT_LATENCY_BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30, 60)
+
+
+class LatencyHistogram(object):
+    """
+    Thread-safe histogram of latencies with fixed buckets, so recording is cheap and memory is constant no matter
+    how many latencies are recorded.  Percentiles are estimated as the upper bound of the bucket they fall in.
+    """
+
+    def __init__(self, bounds=DEFAULT_LATENCY_BOUNDS):
+        """
+        :param bounds: Ascending upper bounds of the buckets in seconds.  Larger latencies are counted in an
+                       additional overflow bucket.
+        """
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.bounds) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
+
+    def record(self, latency):
+        """
+        :param latency: Latency in seconds
+        :return:
+        """
+        index = bisect.bisect_left(self.bounds, latency)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += latency
+            if latency > self._max:
+                self._max = latency
+
+    def percentile(self, percent):
+        """
+        :param percent: Percentile between 0 and 100
+        :return: Upper bound of the bucket holding the percentile, the maximum for the overflow bucket, or None if
+                 nothing was recorded
+        """
+        with self._lock:
+            return self._percentile(percent)
+
+    def _percentile(self, percent):
+        if self._count == 0:
+            return None
+        rank = percent / 100.0 * self._count
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank and count > 0:
+                return self.bounds[index] if index < len(self.bounds) else self._max
+        return self._max
+
+    def snapshot(self):
+        """
+        :return: Dict of count, mean, max, p50, p90 and p99 in seconds, and the bucket counts keyed by upper bound
+                 ("+Inf" for the overflow bucket)
+        """
+        with self._lock:
+            buckets = dict(zip(self.bounds, self._counts))
+            buckets["+Inf"] = self._counts[-1]
+            return {
+                "count": self._count,
+                "mean": self._sum / self._count if self._count else None,
+                "max": self._max if self._count else None,
+                "p50": self._percentile(50),
+                "p90": self._percentile(90),
+                "p99": self._percentile(99),
+                "buckets": buckets
+            }
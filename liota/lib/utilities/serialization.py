@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+"""
+Serialization codecs used by DCCs to encode the messages they publish and decode the messages they receive.
+
+Stdlib JSON is always available.  The fast JSON, MessagePack and CBOR codecs are used only if ujson (or
+simplejson), msgpack or cbor2 are installed.
+"""
+
+import json
+import logging
+from abc import ABCMeta, abstractmethod
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+log = logging.getLogger(__name__)
+
+
+class Codec(object):
+    """
+    Abstract base class for serialization codecs.
+    """
+    __metaclass__ = ABCMeta
+
+    #: Name the codec is selected with
+    name = None
+    #: True if encoded messages are binary and not text
+    binary = False
+
+    @abstractmethod
+    def encode(self, obj):
+        """
+        :param obj: Dict, list or scalar to encode
+        :return: Encoded message string
+        """
+        pass
+
+    @abstractmethod
+    def decode(self, data):
+        """
+        :param data: Encoded message string
+        :return: Decoded object
+        """
+        pass
+
+
+class JsonCodec(Codec):
+    """
+    JSON using the standard library.
+    """
+    name = "json"
+
+    def encode(self, obj):
+        return json.dumps(obj)
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class FastJsonCodec(Codec):
+    """
+    JSON using ujson, or simplejson with its C speedups, whichever is installed.  Falls back to the standard
+    library if neither is.
+    """
+    name = "fast_json"
+
+    def __init__(self):
+        if ujson is not None:
+            self._backend = ujson
+        elif simplejson is not None:
+            self._backend = simplejson
+        else:
+            log.warning("Neither ujson nor simplejson is installed, fast_json codec uses the json module")
+            self._backend = json
+
+    def encode(self, obj):
+        return self._backend.dumps(obj)
+
+    def decode(self, data):
+        return self._backend.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """
+    MessagePack using msgpack.
+    """
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        if msgpack is None:
+            raise ValueError("msgpack codec requires the msgpack package")
+
+    def encode(self, obj):
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def decode(self, data):
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except TypeError:
+            # msgpack older than 0.5.2
+            return msgpack.unpackb(data, encoding="utf-8")
+
+
+class CborCodec(Codec):
+    """
+    CBOR using cbor2.
+    """
+    name = "cbor"
+    binary = True
+
+    def __init__(self):
+        if cbor2 is None:
+            raise ValueError("cbor codec requires the cbor2 package")
+
+    def encode(self, obj):
+        return cbor2.dumps(obj)
+
+    def decode(self, data):
+        return cbor2.loads(data)
+
+
+CODECS = dict((codec_class.name, codec_class) for codec_class in (JsonCodec, FastJsonCodec, MsgpackCodec,
+                                                                   CborCodec))
+
+
+def get_codec(codec=None):
+    """
+    :param codec: Codec object, name of a codec in CODECS or None for JSON
+    :return: Codec object
+    """
+    if codec is None:
+        return JsonCodec()
+    if isinstance(codec, Codec):
+        return codec
+    if codec not in CODECS:
+        raise ValueError("Unknown codec {0}, expected one of {1}".format(codec, ", ".join(sorted(CODECS))))
+    return CODECS[codec]()
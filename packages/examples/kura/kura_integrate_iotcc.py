@@ -39,6 +39,7 @@ import copy
 from liota.entities.devices.simulated_device import SimulatedDevice
 from liota.entities.metrics.metric import Metric
 from liota.device_comms.mqtt_device_comms import MqttDeviceComms
+from liota.lib.utilities.callback_executor import CallbackExecutor
 from liota.core.package_manager import LiotaPackage
 from liota.lib.utilities.utility import get_default_network_interface, get_disk_name
 
@@ -218,13 +219,17 @@ class PackageClass(LiotaPackage):
         self.iotcc = registry.get("iotcc_mqtt")
         self.iotcc_edge_system = copy.copy(registry.get("iotcc_mqtt_edge_system"))
 
+        # sub_callback registers devices and sleeps between retries, so it runs on a worker thread instead of
+        # blocking paho's network thread.  A single worker keeps it from running concurrently with itself.
+        self.callback_executor = CallbackExecutor(num_workers=1, queue_size=1000, name="KuraCallback")
         self.mqtt_dev_comms = MqttDeviceComms(self.broker_ip, self.broker_port,
                                               identity=None,
                                               tls_conf=None, qos_details=None,
                                               client_id="pulse", clean_session=True,
                                               userdata={"self": self, "registry": registry},
                                               protocol="MQTTv311", transport="tcp",
-                                              keep_alive=60, enable_authentication=False, conn_disconn_timeout=10)
+                                              keep_alive=60, enable_authentication=False, conn_disconn_timeout=10,
+                                              callback_executor=self.callback_executor)
 
         self.mqtt_dev_comms.subscribe(self.broker_topic, 0, sub_callback)
 
@@ -256,3 +261,6 @@ class PackageClass(LiotaPackage):
         except Exception:
             log.info("Disconnect failed.")
             raise
+        finally:
+            # No more messages arrive once disconnected, run the queued callbacks and stop the workers
+            self.callback_executor.shutdown()
@@ -83,4 +83,4 @@ class PackageClass(LiotaPackage):
 
         :return:
         """
-        self.graphite.comms.client.close()
+        self.graphite.comms._disconnect()
@@ -107,4 +107,5 @@ class PackageClass(LiotaPackage):
         # Un-register edge system
         if config['ShouldUnregisterOnUnload'] == "True":
             self.iotcc.unregister(self.iotcc_edge_system)
+        self.iotcc.close()
         self.iotcc.comms.client.disconnect()
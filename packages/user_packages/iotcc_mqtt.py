@@ -172,6 +172,8 @@ class PackageClass(LiotaPackage):
         # from Pulse IoT Control Center so comment the below logic if the unregsitration of the device is not required
         # to be done on the package unload
         self.iotcc.unregister(self.iotcc_edge_system)
+        # Exporting the entity files changed by the unregistration
+        self.iotcc.close()
         # Disconnecting MQTT
         self.iotcc.comms.client.disconnect()
         log.info("Cleanup completed successfully")
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+"""
+An in-process stand-in for the IoTCC server.  It implements the DCCComms interface expected by IotControlCenter
+and answers every request after a configurable round trip time, from its own thread, like a remote server would.
+"""
+
+import heapq
+import json
+import threading
+import time
+import uuid
+import Queue
+
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.lib.utilities.identity import Identity
+
+
+class FakeIotccComms(DCCComms):
+
+    def __init__(self, rtt=0.005):
+        """
+        :param rtt: Simulated round trip time in seconds of every request
+        """
+        self.rtt = rtt
+        self.identity = Identity(None, "bench_user", "bench_password", None, None)
+        self.userdata = Queue.Queue()
+        self.requests = 0
+        self.max_outstanding = 0
+        self._pending = []
+        self._cond = threading.Condition()
+        self._connect()
+
+    def _connect(self):
+        self.client = threading.Thread(target=self._respond, name="FakeIotccServer")
+        self.client.daemon = True
+        self.client.start()
+
+    def _disconnect(self):
+        pass
+
+    def receive(self, msg_attr=None):
+        pass
+
+    def send(self, message, msg_attr=None):
+        request = json.loads(message)
+        with self._cond:
+            self.requests += 1
+            heapq.heappush(self._pending, (time.time() + self.rtt, self.requests, request))
+            self.max_outstanding = max(self.max_outstanding, len(self._pending))
+            self._cond.notify()
+
+    def _respond(self):
+        while True:
+            with self._cond:
+                while not self._pending or self._pending[0][0] > time.time():
+                    self._cond.wait(self._pending[0][0] - time.time() if self._pending else None)
+                _, _, request = heapq.heappop(self._pending)
+            self.userdata.put(json.dumps(self._response(request)))
+
+    def _response(self, request):
+        body = request["body"]
+        response = {"transactionID": request["transactionID"], "version": request["version"],
+                    "type": request["type"].replace("_request", "_response")}
+        if request["type"] == "create_or_find_resource_request":
+            response["body"] = {"uuid": str(uuid.uuid5(uuid.NAMESPACE_URL, body["id"].encode("utf-8"))), "id": body["id"]}
+        elif request["type"] == "get_properties_request":
+            response["body"] = {"id": body["id"], "propertyList": []}
+        else:
+            response["body"] = {"result": "succeeded"}
+        return response
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+"""
+A minimal MQTT 3.1.1 and 5 broker stand-in for tests and benchmarks.  It accepts any CONNECT, acknowledges PUBLISH
+(QoS 1 and 2), SUBSCRIBE, UNSUBSCRIBE and PINGREQ, counts what it receives and forwards nothing.  Each connection is
+served by its own thread; CONNACKs can be delayed to stand in for the round trip and authentication time of a remote
+broker.  MQTT 5 clients are offered topic aliases, and a connection using an alias it never announced is dropped.
+"""
+
+import socket
+import ssl
+import struct
+import threading
+import time
+
+
+class FakeMqttBroker(object):
+
+    def __init__(self, connack_delay=0.0, certfile=None, keyfile=None, topic_alias_maximum=0):
+        """
+        :param connack_delay: Seconds before a CONNECT is acknowledged
+        :param certfile: Server certificate, enables TLS together with keyfile
+        :param keyfile: Server key
+        :param topic_alias_maximum: Topic aliases MQTT 5 clients may use per connection
+        """
+        self.connack_delay = connack_delay
+        self.topic_alias_maximum = topic_alias_maximum
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.connections = 0
+        self.publishes = 0
+        self.publish_bytes = 0
+        self.alias_errors = 0
+        self.client_ids = []
+        self._lock = threading.Lock()
+        self._server = socket.socket()
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen(64)
+        self.port = self._server.getsockname()[1]
+        thread = threading.Thread(target=self._accept, name="FakeMqttBroker")
+        thread.daemon = True
+        thread.start()
+
+    def close(self):
+        self._server.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except socket.error:
+                return
+            thread = threading.Thread(target=self._serve, args=(conn,), name="FakeMqttBrokerConnection")
+            thread.daemon = True
+            thread.start()
+
+    @staticmethod
+    def _read_exactly(conn, size):
+        data = ""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+    def _read_packet(self, conn):
+        first = ord(self._read_exactly(conn, 1))
+        length = 0
+        multiplier = 1
+        while True:
+            byte = ord(self._read_exactly(conn, 1))
+            length += (byte & 0x7f) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        return first, self._read_exactly(conn, length)
+
+    @staticmethod
+    def _read_varint(data, offset):
+        value = 0
+        multiplier = 1
+        while True:
+            byte = ord(data[offset])
+            offset += 1
+            value += (byte & 0x7f) * multiplier
+            if not byte & 0x80:
+                return value, offset
+            multiplier *= 128
+
+    def _topic_alias(self, body, offset):
+        """
+        :return: TopicAlias of the MQTT 5 PUBLISH properties starting at offset, None if there is none
+        """
+        length, offset = self._read_varint(body, offset)
+        end = offset + length
+        while offset < end:
+            identifier = ord(body[offset])
+            if identifier == 0x23:
+                return struct.unpack("!H", body[offset + 1:offset + 3])[0]
+            elif identifier == 0x02:
+                # MessageExpiryInterval
+                offset += 5
+            else:
+                break
+        return None
+
+    def _serve(self, conn):
+        try:
+            if self.certfile:
+                conn = ssl.wrap_socket(conn, server_side=True, certfile=self.certfile, keyfile=self.keyfile)
+            with self._lock:
+                self.connections += 1
+            level = 4
+            aliases = {}
+            while True:
+                first, body = self._read_packet(conn)
+                packet_type = first >> 4
+                if packet_type == 1:
+                    # CONNECT: protocol name, level, flags, keep alive, client id
+                    name_length = struct.unpack("!H", body[:2])[0]
+                    level = ord(body[2 + name_length])
+                    offset = 2 + name_length + 4
+                    if level == 5:
+                        properties_length, offset = self._read_varint(body, offset)
+                        offset += properties_length
+                    id_length = struct.unpack("!H", body[offset:offset + 2])[0]
+                    with self._lock:
+                        self.client_ids.append(body[offset + 2:offset + 2 + id_length])
+                    if self.connack_delay:
+                        time.sleep(self.connack_delay)
+                    if level == 5 and self.topic_alias_maximum:
+                        # TopicAliasMaximum property
+                        conn.sendall("\x20\x06\x00\x00\x03\x22" + struct.pack("!H", self.topic_alias_maximum))
+                    elif level == 5:
+                        conn.sendall("\x20\x03\x00\x00\x00")
+                    else:
+                        conn.sendall("\x20\x02\x00\x00")
+                elif packet_type == 3:
+                    qos = (first >> 1) & 3
+                    topic_length = struct.unpack("!H", body[:2])[0]
+                    offset = 2 + topic_length + (2 if qos else 0)
+                    if level == 5:
+                        topic = body[2:2 + topic_length]
+                        alias = self._topic_alias(body, offset)
+                        if alias is not None and alias > self.topic_alias_maximum or not topic and alias not in aliases:
+                            with self._lock:
+                                self.alias_errors += 1
+                            break
+                        if alias is not None and topic:
+                            aliases[alias] = topic
+                    with self._lock:
+                        self.publishes += 1
+                        self.publish_bytes += len(body)
+                    if qos:
+                        packet_id = body[2 + topic_length:4 + topic_length]
+                        conn.sendall(("\x40\x02" if qos == 1 else "\x50\x02") + packet_id)
+                elif packet_type == 6:
+                    conn.sendall("\x70\x02" + body[:2])
+                elif packet_type == 8:
+                    granted = []
+                    offset = 2
+                    if level == 5:
+                        properties_length, offset = self._read_varint(body, offset)
+                        offset += properties_length
+                    while offset < len(body):
+                        topic_length = struct.unpack("!H", body[offset:offset + 2])[0]
+                        offset += 2 + topic_length
+                        # The MQTT 5 subscription options carry the QoS in their lowest bits
+                        granted.append(chr(ord(body[offset]) & 3))
+                        offset += 1
+                    properties = "\x00" if level == 5 else ""
+                    conn.sendall(chr(0x90) + chr(2 + len(properties) + len(granted)) + body[:2] + properties +
+                                 "".join(granted))
+                elif packet_type == 10:
+                    if level == 5:
+                        # Empty properties and one success reason code per topic
+                        topics = 0
+                        properties_length, offset = self._read_varint(body, 2)
+                        offset += properties_length
+                        while offset < len(body):
+                            offset += 2 + struct.unpack("!H", body[offset:offset + 2])[0]
+                            topics += 1
+                        conn.sendall(chr(0xb0) + chr(3 + topics) + body[:2] + "\x00" + "\x00" * topics)
+                    else:
+                        conn.sendall("\xb0\x02" + body[:2])
+                elif packet_type == 12:
+                    conn.sendall("\xd0\x00")
+                elif packet_type == 14:
+                    break
+        except (EOFError, socket.error, ssl.SSLError):
+            pass
+        finally:
+            conn.close()
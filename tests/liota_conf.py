@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+"""
+Liota reads liota.conf when its modules are imported, so setup_liota_conf() must be called before importing anything
+from liota.  It writes a copy of config/liota.conf into a temporary directory, with every file path redirected into
+that directory, and points LIOTA_CONF at it.  Used by the tests and the benchmarks.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_liota_conf(overrides=None):
+    """
+    :param overrides: Dict of {(section, option): value} to change in the generated liota.conf
+    :return: Path of the temporary directory holding liota.conf and all files written by liota
+    """
+    work_dir = tempfile.mkdtemp(prefix="liota_")
+    with open(os.path.join(_REPO_ROOT, "config", "liota.conf")) as f:
+        conf = f.read()
+    conf = conf.replace("/usr/lib/liota", work_dir).replace("/var/log/liota", os.path.join(work_dir, "log"))
+    conf = conf.replace("/etc/liota/logging.json", os.path.join(work_dir, "missing_logging.json"))
+    for (section, option), value in (overrides or {}).items():
+        pattern = r"(\[%s\][^\[]*?^%s\s*=).*?$" % (re.escape(section), re.escape(option))
+        conf = re.sub(pattern, r"\g<1> %s" % value, conf, flags=re.M | re.S)
+    with open(os.path.join(work_dir, "liota.conf"), "w") as f:
+        f.write(conf)
+    os.environ["LIOTA_CONF"] = work_dir
+    return work_dir
+
+
+def cleanup(work_dir):
+    shutil.rmtree(work_dir, ignore_errors=True)
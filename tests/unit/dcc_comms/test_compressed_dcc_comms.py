@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import base64
+import json
+import Queue
+import unittest
+
+import mock
+
+from liota.dcc_comms.compressed_dcc_comms import CompressedDccComms
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.lib.utilities import compression
+
+
+class CompressedDccCommsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inner = mock.create_autospec(DCCComms)
+        self.inner.client = "client"
+        self.inner.identity = "identity"
+        self.inner.binary = True
+        self.inner.userdata = Queue.Queue()
+        self.inner.stats.return_value = {"state": "connected"}
+        self.comms = CompressedDccComms(self.inner)
+        self.message = json.dumps([{"uuid": "6b0d3f0e-8a1c-4f3e-9d2a-0000000000%02d" % i, "value": i}
+                                   for i in range(20)])
+
+    def sent(self):
+        return self.inner.send.call_args[0][0]
+
+    def test_repetitive_payload_is_compressed(self):
+        self.comms.send(self.message, "attr")
+        frame = self.sent()
+        self.assertEquals(ord(frame[0]), compression.ZlibCompressor.flag)
+        self.assertEquals(self.inner.send.call_args[0][1], "attr")
+        self.assertEquals(compression.unpack(frame), self.message)
+        stats = self.comms.stats()["compression"]
+        self.assertEquals((stats["messages"], stats["compressed_messages"]), (1, 1))
+        self.assertEquals((stats["bytes_in"], stats["bytes_out"]), (len(self.message), len(frame)))
+        self.assertTrue(stats["ratio"] < 0.5)
+
+    def test_short_and_incompressible_payloads_are_sent_as_is(self):
+        for message in ("short", "".join(chr(i) for i in range(256))):
+            self.comms.send(message)
+            self.assertEquals(self.sent(), chr(compression.FLAG_NONE) + message)
+            self.assertEquals(compression.unpack(self.sent()), message)
+        self.assertEquals(self.comms.stats()["compression"]["compressed_messages"], 0)
+        self.assertEquals(self.comms.stats()["state"], "connected")
+
+    def test_delegates_to_wrapped_comms(self):
+        self.assertEquals(self.comms.identity, "identity")
+        self.comms.send_async(self.message)
+        self.assertEquals(compression.unpack(self.inner.send_async.call_args[0][0]), self.message)
+        self.comms._disconnect()
+        self.inner._disconnect.assert_called_once_with()
+
+    def test_text_only_comms_get_base64_frames(self):
+        self.inner.binary = False
+        self.comms.send(self.message)
+        frame = base64.b64decode(self.sent())
+        self.assertEquals(ord(frame[0]), compression.ZlibCompressor.flag)
+        self.assertEquals(compression.unpack(frame), self.message)
+        self.assertEquals(self.comms.stats()["compression"]["bytes_out"], len(self.sent()))
+
+    def test_received_frames_are_unpacked(self):
+        for binary in (True, False):
+            self.inner.binary = binary
+            self.comms.send(self.message)
+            self.inner.userdata.put(self.sent())
+            self.inner.userdata.put("not a frame")
+            self.assertEquals(self.comms.userdata.get(True), self.message)
+            self.assertEquals(self.comms.userdata.get_nowait(), "not a frame")
+            self.assertTrue(self.comms.userdata.empty())
+
+    def test_sub_callback_gets_unpacked_payload(self):
+        received = []
+        msg_attr = mock.Mock(sub_callback=lambda client, userdata, msg: received.append(msg.payload))
+        self.comms.receive(msg_attr)
+        self.comms.send(self.message)
+        self.inner.receive.call_args[0][0].sub_callback("client", None, mock.Mock(payload=self.sent()))
+        self.assertEquals(received, [self.message])
+
+    @unittest.skipIf(compression.lz4_frame is None, "lz4 is not installed")
+    def test_lz4(self):
+        comms = CompressedDccComms(self.inner, "lz4")
+        comms.send(self.message)
+        self.assertEquals(ord(self.sent()[0]), compression.Lz4Compressor.flag)
+        self.assertEquals(compression.unpack(self.sent()), self.message)
+
+    @unittest.skipIf(compression.lz4_frame is not None, "lz4 is installed")
+    def test_lz4_missing(self):
+        self.assertRaises(ValueError, CompressedDccComms, self.inner, "lz4")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import gzip
+import threading
+import time
+import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from StringIO import StringIO
+
+from liota.dcc_comms.http_dcc_comms import HttpDccComms
+from liota.lib.utilities.identity import Identity
+
+
+class _StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.GzipFile(fileobj=StringIO(body)).read()
+        self.server.requests.append((self.path, dict(self.headers), body))
+        self.server.connections.add(self.client_address)
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpDccCommsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _StandInServer(("127.0.0.1", 0), _StandInHandler)
+        self.server.requests = []
+        self.server.connections = set()
+        self.server.status = 204
+        threading.Thread(target=self.server.serve_forever, args=(0.01,)).start()
+        self.url = "http://127.0.0.1:%d/write?db=liota&precision=ms" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_batches_are_gzipped_over_one_connection(self):
+        comms = HttpDccComms(self.url, identity=Identity(None, "user", "secret", None, None), pool_size=1,
+                             max_batch_bytes=20, flush_interval=60)
+        for i in range(3):
+            comms.send("m value=%d %d\n" % (i, i))
+        comms.send_async("m value=3 3\n").result(5)
+        self.assertEquals([body for _, _, body in self.server.requests],
+                          ["m value=0 0\nm value=1 1\n", "m value=2 2\nm value=3 3\n"])
+        path, headers, _ = self.server.requests[0]
+        self.assertEquals(path, "/write?db=liota&precision=ms")
+        self.assertEquals(headers["authorization"], "Basic dXNlcjpzZWNyZXQ=")
+        self.assertEquals(len(self.server.connections), 1)
+        self.assertEquals(comms.connections_opened, 1)
+
+    def test_batch_is_sent_after_flush_interval(self):
+        comms = HttpDccComms(self.url, flush_interval=0.05)
+        future = comms.send_async("m value=1 1\n")
+        self.assertEquals(future.result(5), None)
+        self.assertEquals(len(self.server.requests), 1)
+
+    def test_error_status_fails_the_batch(self):
+        self.server.status = 400
+        comms = HttpDccComms(self.url, flush_interval=0)
+        self.assertRaises(Exception, comms.send, "m value=1 1\n")
+
+    def test_unavailable_server_keeps_the_batch(self):
+        self.server.status = 503
+        comms = HttpDccComms(self.url, flush_interval=0, retry_interval=0.05, max_queued_bytes=24)
+        comms.send("m value=1 1\n")
+        # kept with the failed batch until retry_interval passed
+        future = comms.send_async("m value=2 2\n")
+        self.assertFalse(future.done())
+        self.server.status = 204
+        time.sleep(0.05)
+        # the oldest message no longer fits in max_queued_bytes
+        comms.send("m value=3 3\n")
+        self.assertEquals(future.result(5), None)
+        self.assertEquals(self.server.requests[-1][2], "m value=2 2\nm value=3 3\n")
+        stats = comms.stats()
+        self.assertEquals((stats["errors"], stats["dropped_messages"], stats["queued_bytes"]), (1, 1, 0))
+
+    def test_rejected_timer_batch_is_raised_by_next_send(self):
+        self.server.status = 400
+        comms = HttpDccComms(self.url, flush_interval=0.01, max_batch_bytes=1024)
+        comms.send("m value=1 1\n")
+        deadline = time.time() + 5
+        while comms.stats()["dropped_messages"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.server.status = 204
+        self.assertRaises(Exception, comms.send, "m value=2 2\n")
+        comms.flush()
+        self.assertEquals(self.server.requests[-1][2], "m value=2 2\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import os
+import unittest
+
+import mock
+
+from tests import liota_conf
+
+# liota.lib.transports.mqtt reads liota.conf when it is imported
+_import_dir = liota_conf.setup_liota_conf()
+
+from liota.dcc_comms.mqtt_dcc_comms import MqttDccComms
+from liota.lib.transports.mqtt import MqttMessagingAttributes
+from liota.lib.utilities.utility import LiotaConfigPath
+
+
+def tearDownModule():
+    liota_conf.cleanup(_import_dir)
+    os.environ.pop("LIOTA_CONF", None)
+    LiotaConfigPath.path_liota_config = ''
+
+
+class MqttDccCommsTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch("liota.dcc_comms.mqtt_dcc_comms.Mqtt", side_effect=self._new_mqtt)
+        self.mqtt = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.failing_client_ids = set()
+        self.transports = {}
+
+    def _new_mqtt(self, url, port, identity, tls_conf, qos_details, client_id, *args, **kwargs):
+        if client_id in self.failing_client_ids:
+            raise Exception("Connection refused")
+        transport = mock.Mock(name=client_id)
+        transport.get_client_id.return_value = client_id
+        self.transports[client_id] = transport
+        return transport
+
+    def _comms(self, connections):
+        return MqttDccComms("edge-system", "127.0.0.1", 1883, client_id="client", connections=connections)
+
+    def _attr(self, topic):
+        # set afterwards, MqttMessagingAttributes logs its topics as str
+        attr = MqttMessagingAttributes(pub_topic="topic", sub_topic="topic")
+        attr.pub_topic = attr.sub_topic = topic
+        return attr
+
+    def _publishing_client(self, comms, topic):
+        published = [client for client in comms.clients if client.publish.called]
+        for client in published:
+            client.publish.reset_mock()
+        comms.send("21.5", self._attr(topic))
+        published = [client for client in comms.clients if client.publish.called]
+        self.assertEquals(len(published), 1)
+        return published[0].get_client_id()
+
+    def test_topic_keeps_its_connection(self):
+        comms = self._comms(4)
+        self.assertEquals([client.get_client_id() for client in comms.clients],
+                          ["client", "client-1", "client-2", "client-3"])
+        topics = ["home/device-%d/temperature" % i for i in range(32)]
+        routes = [self._publishing_client(comms, topic) for topic in topics]
+        self.assertEquals([self._publishing_client(comms, topic) for topic in topics], routes)
+        self.assertEquals(len(set(routes)), 4)
+        # the routes only depend on the topic, so a restarted edge system uses the same connections
+        self.assertEquals([self._publishing_client(self._comms(4), topic) for topic in topics], routes)
+
+    def test_unicode_topic_is_routed_like_its_utf8_bytes(self):
+        comms = self._comms(4)
+        topic = u"home/caf\xe9/temperature"
+        self.assertEquals(self._publishing_client(comms, topic),
+                          self._publishing_client(comms, topic.encode("utf-8")))
+
+    def test_subscriptions_use_the_first_connection(self):
+        comms = self._comms(3)
+        callback = mock.Mock()
+        for i in range(5):
+            attr = self._attr("home/device-%d/actions" % i)
+            attr.sub_callback = callback
+            comms.receive(attr)
+        self.assertEquals(self.transports["client"].subscribe.call_count, 5)
+        self.assertFalse(self.transports["client-1"].subscribe.called)
+        self.assertFalse(self.transports["client-2"].subscribe.called)
+
+    def test_partial_connect_failure_disconnects_every_connected_client(self):
+        self.failing_client_ids.add("client-1")
+        self.assertRaises(Exception, self._comms, 4)
+        self.assertEquals(sorted(self.transports), ["client", "client-2", "client-3"])
+        for transport in self.transports.itervalues():
+            transport.disconnect.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import threading
+import time
+import unittest
+
+import mock
+
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.dcc_comms.rate_limited_dcc_comms import RateLimitedDccComms
+from liota.lib.utilities.future import Future
+
+
+class RateLimitedDccCommsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inner = mock.create_autospec(DCCComms)
+        self.inner.client = "client"
+        self.inner.stats.side_effect = lambda: {"state": "connected"}
+        self.sent = []
+        self.inner.send.side_effect = lambda message, msg_attr: self.sent.append((message, time.time()))
+        self.comms = None
+
+    def tearDown(self):
+        if self.comms is not None:
+            self.comms._disconnect()
+
+    def wrap(self, **options):
+        self.comms = RateLimitedDccComms(self.inner, **options)
+        return self.comms
+
+    def test_burst_is_sent_right_away(self):
+        comms = self.wrap(messages_per_second=1, burst_messages=3)
+        for i in range(3):
+            comms.send(str(i))
+        self.assertEquals([message for message, _ in self.sent], ["0", "1", "2"])
+        self.assertEquals(comms.stats()["rate_limit"]["throttled_messages"], 0)
+
+    def test_excess_messages_are_queued_and_smoothed(self):
+        comms = self.wrap(messages_per_second=50, burst_messages=1)
+        start = time.time()
+        for i in range(5):
+            comms.send(str(i), "attr")
+        self.assertTrue(comms.flush(2))
+        self.assertEquals([message for message, _ in self.sent], ["0", "1", "2", "3", "4"])
+        self.assertEquals(self.inner.send.call_args[0][1], "attr")
+        self.assertTrue(self.sent[-1][1] - start >= 0.07)
+        stats = comms.stats()["rate_limit"]
+        self.assertEquals((stats["messages_sent"], stats["throttled_messages"]), (5, 4))
+        self.assertTrue(stats["throttled_seconds"] > 0)
+        self.assertEquals(stats["throttle_delay"]["count"], 4)
+
+    def test_byte_rate(self):
+        comms = self.wrap(bytes_per_second=1000, burst_bytes=100)
+        comms.send("x" * 100)
+        comms.send("y" * 50)
+        self.assertEquals(len(self.sent), 1)
+        self.assertTrue(comms.flush(2))
+        self.assertTrue(self.sent[1][1] - self.sent[0][1] >= 0.04)
+
+    def test_send_async_resolves_with_wrapped_future(self):
+        delivered = Future()
+        self.inner.send_async.return_value = delivered
+        comms = self.wrap(messages_per_second=1000, burst_messages=1)
+        futures = [comms.send_async("a"), comms.send_async("b")]
+        self.assertTrue(comms.flush(2))
+        self.assertFalse(futures[1].done())
+        delivered.set_result("ack")
+        self.assertEquals([future.result(1) for future in futures], ["ack", "ack"])
+
+    def test_full_queue_blocks_instead_of_dropping(self):
+        comms = self.wrap(messages_per_second=20, burst_messages=1, queue_size=1)
+        comms.send("0")
+        comms.send("1")
+        sender = threading.Thread(target=comms.send, args=("2",))
+        sender.start()
+        sender.join(2)
+        self.assertTrue(comms.flush(2))
+        self.assertEquals([message for message, _ in self.sent], ["0", "1", "2"])
+        self.assertEquals(comms.stats()["rate_limit"]["blocked_sends"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import socket
+import time
+import unittest
+
+import mock
+
+from liota.dcc_comms.socket_comms import SocketDccComms, SocketPoolDccComms
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.01)
+
+
+class SocketDccCommsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = self.listen(0)
+        self.port = self.server.getsockname()[1]
+        self.comms = SocketDccComms("127.0.0.1", self.port, min_backoff=0.01, max_backoff=0.05)
+        self.conn = self.server.accept()[0]
+
+    def tearDown(self):
+        self.comms._disconnect()
+        self.conn.close()
+        self.server.close()
+
+    def listen(self, port):
+        server = socket.socket()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(("127.0.0.1", port))
+        server.listen(1)
+        server.settimeout(2)
+        return server
+
+    def receive(self, conn, size):
+        data = ""
+        conn.settimeout(2)
+        while len(data) < size:
+            data += conn.recv(size - len(data))
+        return data
+
+    def test_socket_options(self):
+        self.assertEquals(self.comms.client.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY), 1)
+        self.assertEquals(self.comms.client.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE), 1)
+
+    def test_buffered_messages_drain_on_reconnect(self):
+        # Check for the closed connection before every send, so that no message is written into it
+        self.comms.peer_check_interval = 0
+        self.comms.send("a 1 1\n")
+        self.assertEquals(self.receive(self.conn, 6), "a 1 1\n")
+
+        # The server goes away, messages are buffered until it is back
+        self.conn.close()
+        self.server.close()
+        wait_until(lambda: self.comms.send("b 2 2\n") or self.comms.client is None)
+        future = self.comms.send_async("c 3 3\n")
+        wait_until(lambda: self.comms.connect_failures > 0)
+        self.server = self.listen(self.port)
+        self.conn = self.server.accept()[0]
+        self.assertEquals(future.result(2), None)
+        self.assertEquals(self.receive(self.conn, 12), "b 2 2\nc 3 3\n")
+        stats = self.comms.stats()
+        self.assertEquals(stats["reconnects"], 1)
+        self.assertEquals(stats["messages_sent"], 3)
+        self.assertEquals(stats["bytes_sent"], 18)
+        self.assertEquals(stats["send_latency"]["count"], 3)
+        self.assertEquals(stats["state"], "connected")
+        self.assertTrue(stats["errors"] > 0)
+
+    def test_peer_is_checked_once_per_interval(self):
+        self.comms.peer_check_interval = 60
+        with mock.patch.object(self.comms, "_peer_closed", return_value=False) as peer_closed:
+            for i in range(100):
+                self.comms.send("a %d 1\n" % i)
+        self.assertEquals(peer_closed.call_count, 1)
+        self.assertEquals(self.receive(self.conn, 6), "a 0 1\n")
+
+    def test_full_buffer_drops_oldest_messages(self):
+        self.comms.buffer_size = 12
+        self.conn.close()
+        self.server.close()
+        wait_until(lambda: self.comms.send("a 1 1\n") or self.comms.client is None)
+        first = self.comms.send_async("b 2 2\n")
+        self.comms.send("c 3 3\n")
+        self.comms.send("d 4 4\n")
+        self.assertIsInstance(first.exception(0), IOError)
+        self.assertEquals(self.comms.dropped_messages, 2)
+        self.assertEquals(self.comms.buffered_bytes, 12)
+
+
+class SocketPoolDccCommsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(3)
+        self.server.settimeout(2)
+        self.pool = SocketPoolDccComms("127.0.0.1", self.server.getsockname()[1], pool_size=3,
+                                       health_check_interval=0, min_backoff=10)
+        self.conns = {}
+        for _ in range(3):
+            conn, address = self.server.accept()
+            conn.settimeout(0.2)
+            self.conns[address[1]] = conn
+
+    def tearDown(self):
+        self.pool._disconnect()
+        for conn in self.conns.itervalues():
+            conn.close()
+        self.server.close()
+
+    def received(self, connection):
+        conn = self.conns[connection.client.getsockname()[1]]
+        data = ""
+        try:
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+        except socket.timeout:
+            pass
+        return data.splitlines()
+
+    def test_series_keep_their_connection(self):
+        for ts in range(20):
+            for series in range(10):
+                self.pool.send("series.%d %d %d\n" % (series, ts, ts))
+        seen = set()
+        for connection in self.pool.client:
+            lines = self.received(connection)
+            by_series = {}
+            for line in lines:
+                name, value, _ = line.split()
+                by_series.setdefault(name, []).append(int(value))
+            for name, values in by_series.iteritems():
+                self.assertEquals(values, range(20))
+                self.assertNotIn(name, seen)
+                seen.add(name)
+        self.assertEquals(len(seen), 10)
+
+    def close_connection_of(self, message):
+        failed = self.pool._select(message)
+        self.conns[failed.client.getsockname()[1]].close()
+        time.sleep(0.05)
+        self.assertTrue(all(connection.check_health() for connection in self.pool.client if connection is not failed))
+        self.assertFalse(failed.check_health())
+        self.assertEquals(self.pool.healthy_connections(), 2)
+        return failed
+
+    def test_series_wait_for_their_connection(self):
+        failed = self.close_connection_of("series.1 1 1\n")
+        self.pool.send("series.1 1 1\n")
+        self.assertIs(self.pool._select("series.1 1 1\n"), failed)
+        self.assertEquals(failed.buffered_bytes, len("series.1 1 1\n"))
+
+    def test_failover_to_healthy_connection(self):
+        self.pool.failover = True
+        failed = self.close_connection_of("series.1 1 1\n")
+        self.assertIsNot(self.pool._select("series.1 1 1\n"), failed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import json
+import unittest
+
+import mock
+
+from liota.dccs.aws_iot import AWSIoT
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.entities.devices.simulated_device import SimulatedDevice
+from liota.entities.edge_systems.simulated_edge_system import SimulatedEdgeSystem
+from liota.entities.metrics.metric import Metric
+
+
+class TestDCCAWSIoT(unittest.TestCase):
+
+    def setUp(self):
+        self.aws = AWSIoT(mock.create_autospec(DCCComms), enclose_metadata=True)
+        self.reg_edge_system = self.aws.register(SimulatedEdgeSystem("EdgeSystem-1"))
+        self.reg_device = self.aws.register(SimulatedDevice("Device-1"))
+        self.reg_metric = self.aws.register(Metric(name="temperature", interval=5, sampling_function=lambda: 1))
+        self.aws.create_relationship(self.reg_edge_system, self.reg_device)
+        self.aws.create_relationship(self.reg_device, self.reg_metric)
+
+    def publish(self, *samples):
+        for sample in samples:
+            self.reg_metric.values.put(sample)
+        return json.loads(self.aws._format_data(self.reg_metric))
+
+    def test_payload(self):
+        self.assertEquals(self.publish((1000, 21.5), (2000, 22)), {
+            "edge_system_name": "EdgeSystem-1",
+            "device_name": "Device-1",
+            "metric_name": "temperature",
+            "unit": "null",
+            "metric_data": [{"value": 21.5, "timestamp": 1000}, {"value": 22, "timestamp": 2000}]
+        })
+
+    def test_payload_header_follows_relationship_changes(self):
+        self.publish((1000, 1))
+        self.aws.create_relationship(self.reg_edge_system, self.reg_metric)
+        payload = self.publish((2000, 2))
+        self.assertEquals(payload["edge_system_name"], "EdgeSystem-1")
+        self.assertFalse("device_name" in payload)
+
+    def test_payload_with_binary_codec(self):
+        self.aws.codec = mock.Mock(name="codec")
+        self.aws.codec.name = "msgpack"
+        self.aws.create_relationship(self.reg_device, self.reg_metric)
+        self.reg_metric.values.put((1000, 1))
+        self.aws._format_data(self.reg_metric)
+        payload = self.aws.codec.encode.call_args[0][0]
+        self.assertEquals(payload["metric_data"], [{"value": 1, "timestamp": 1000}])
+        self.assertEquals(payload["device_name"], "Device-1")
+
+
+class TestDCCAWSIoTAggregation(unittest.TestCase):
+
+    def setUp(self):
+        self.comms = mock.create_autospec(DCCComms)
+        self.comms.send_async.side_effect = lambda message, msg_attr: DCCComms.send_async(self.comms, message,
+                                                                                          msg_attr)
+        self.aws = AWSIoT(self.comms, enclose_metadata=True, aggregation_window=60, max_payload_size=1024)
+        self.reg_edge_system = self.aws.register(SimulatedEdgeSystem("EdgeSystem-1"))
+        self.reg_device = self.aws.register(SimulatedDevice("Device-1"))
+        self.aws.create_relationship(self.reg_edge_system, self.reg_device)
+        self.reg_metrics = []
+        for name in ("temperature", "humidity"):
+            reg_metric = self.aws.register(Metric(name=name, interval=5, sampling_function=lambda: 1))
+            self.aws.create_relationship(self.reg_device, reg_metric)
+            self.reg_metrics.append(reg_metric)
+
+    def sent_payloads(self):
+        return [json.loads(call[0][0]) for call in self.comms.send.call_args_list]
+
+    def test_metrics_of_a_device_are_published_together(self):
+        for reg_metric in self.reg_metrics:
+            reg_metric.values.put((1000, 1))
+            self.aws.publish(reg_metric)
+        self.assertFalse(self.comms.send.called)
+        self.aws.flush()
+        self.assertEquals(self.sent_payloads(), [{
+            "edge_system_name": "EdgeSystem-1",
+            "device_name": "Device-1",
+            "metrics": [
+                {"metric_name": "temperature", "unit": "null", "metric_data": [{"value": 1, "timestamp": 1000}]},
+                {"metric_name": "humidity", "unit": "null", "metric_data": [{"value": 1, "timestamp": 1000}]}
+            ]
+        }])
+
+    def test_publish_async_is_resolved_once_the_group_is_sent(self):
+        self.reg_metrics[0].values.put((1000, 1))
+        future = self.aws.publish_async(self.reg_metrics[0])
+        self.assertFalse(future.done())
+        self.aws.flush()
+        self.assertTrue(future.done())
+        self.assertEquals(future.exception(), None)
+
+    def test_metric_with_msg_attr_is_published_separately(self):
+        self.reg_metrics[0].msg_attr = mock.Mock()
+        self.reg_metrics[0].values.put((1000, 1))
+        self.aws.publish(self.reg_metrics[0])
+        self.comms.send.assert_called_once_with(mock.ANY, self.reg_metrics[0].msg_attr)
+
+    def test_payloads_stay_under_max_payload_size(self):
+        for i in range(100):
+            self.reg_metrics[0].values.put((1000 + i, i))
+        self.aws.publish(self.reg_metrics[0])
+        self.aws.flush()
+        payloads = [call[0][0] for call in self.comms.send.call_args_list]
+        self.assertTrue(len(payloads) > 1)
+        self.assertTrue(all(len(payload) <= 1024 for payload in payloads))
+        samples = [sample["value"] for payload in payloads for metric in json.loads(payload)["metrics"]
+                   for sample in metric["metric_data"]]
+        self.assertEquals(samples, range(100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import mock
+
+from liota.dccs.columnar_file import ColumnarFile
+from liota.dcc_comms.columnar_file_dcc_comms import ColumnarFileDccComms
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.entities.devices.simulated_device import SimulatedDevice
+from liota.entities.edge_systems.simulated_edge_system import SimulatedEdgeSystem
+from liota.entities.metrics.metric import Metric
+
+
+class TestDCCColumnarFile(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.comms = ColumnarFileDccComms(self.work_dir, block_rows=4)
+        self.columnar_file = ColumnarFile(self.comms)
+        reg_edge_system = self.columnar_file.register(SimulatedEdgeSystem("EdgeSystem-1"))
+        reg_device = self.columnar_file.register(SimulatedDevice("Device-1"))
+        self.reg_metric = self.columnar_file.register(Metric(name="temperature", interval=5,
+                                                             sampling_function=lambda: 1))
+        self.columnar_file.create_relationship(reg_edge_system, reg_device)
+        self.columnar_file.create_relationship(reg_device, self.reg_metric)
+
+    def tearDown(self):
+        self.comms._disconnect()
+        shutil.rmtree(self.work_dir)
+
+    def test_comms_type(self):
+        with self.assertRaises(TypeError):
+            ColumnarFile(mock.create_autospec(DCCComms))
+
+    def test_publish_and_read(self):
+        self.assertEquals(self.columnar_file.series_name(self.reg_metric), "EdgeSystem-1.Device-1.temperature")
+        for i in range(6):
+            self.reg_metric.values.put((1000 * i, i))
+        self.columnar_file.publish(self.reg_metric)
+        self.columnar_file.publish(self.reg_metric)
+        self.assertEquals(self.columnar_file.series(), ["EdgeSystem-1.Device-1.temperature"])
+        self.assertEquals(self.columnar_file.read("EdgeSystem-1.Device-1.temperature", 2000, 4000),
+                          [(2000, 2), (3000, 3), (4000, 4)])
+
+    def test_samples_persist_across_reconnect(self):
+        self.reg_metric.values.put((1000, 21.5))
+        self.columnar_file.publish(self.reg_metric)
+        self.comms._disconnect()
+        self.comms._connect()
+        out = StringIO()
+        self.assertEquals(self.columnar_file.export(out), 1)
+        self.assertEquals(out.getvalue(), "EdgeSystem-1.Device-1.temperature,1000,21.5\n")
+
+    def test_comms_stats(self):
+        self.assertEquals(self.comms.stats()["state"], "connected")
+        for i in range(6):
+            self.reg_metric.values.put((1000 * i, i))
+        self.columnar_file.publish(self.reg_metric)
+        self.comms._disconnect()
+        stats = self.comms.stats()
+        self.assertEquals((stats["messages_sent"], stats["errors"], stats["state"]), (6, 0, "closed"))
+        self.assertTrue(stats["bytes_sent"] > 0)
+        self.comms._connect()
+
+
+if __name__ == '__main__':
+    unittest.main()
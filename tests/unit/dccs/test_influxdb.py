@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import unittest
+
+import mock
+
+from liota.dccs.influxdb import InfluxDB
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.entities.devices.simulated_device import SimulatedDevice
+from liota.entities.edge_systems.simulated_edge_system import SimulatedEdgeSystem
+from liota.entities.metrics.metric import Metric
+
+
+class TestDCCInfluxDB(unittest.TestCase):
+
+    def setUp(self):
+        self.influxdb = InfluxDB(mock.create_autospec(DCCComms), tags={"site": "plant 1"})
+        reg_edge_system = self.influxdb.register(SimulatedEdgeSystem("EdgeSystem-1"))
+        self.reg_device = self.influxdb.register(SimulatedDevice("Device,1"))
+        self.reg_metric = self.influxdb.register(Metric(name="room temperature", interval=5,
+                                                        sampling_function=lambda: 1))
+        self.influxdb.create_relationship(reg_edge_system, self.reg_device)
+        self.influxdb.create_relationship(self.reg_device, self.reg_metric)
+
+    def test_line_protocol(self):
+        for sample in [(1000, 21.5), (2000, 22), (3000, True), (4000, 'say "hi"')]:
+            self.reg_metric.values.put(sample)
+        self.assertEquals(self.influxdb._format_data(self.reg_metric).splitlines(), [
+            'room\\ temperature,device=Device\\,1,edge_system=EdgeSystem-1,site=plant\\ 1 value=21.5 1000',
+            'room\\ temperature,device=Device\\,1,edge_system=EdgeSystem-1,site=plant\\ 1 value=22.0 2000',
+            'room\\ temperature,device=Device\\,1,edge_system=EdgeSystem-1,site=plant\\ 1 value=true 3000',
+            'room\\ temperature,device=Device\\,1,edge_system=EdgeSystem-1,site=plant\\ 1 value="say \\"hi\\"" 4000'
+        ])
+
+    def test_tags_follow_relationship_changes(self):
+        self.reg_metric.values.put((1000, 1.0))
+        self.influxdb._format_data(self.reg_metric)
+        self.influxdb.create_relationship(self.influxdb.register(SimulatedDevice("Device-2")), self.reg_metric)
+        self.reg_metric.values.put((2000, 1.0))
+        self.assertEquals(self.influxdb._format_data(self.reg_metric),
+                          'room\\ temperature,device=Device-2,site=plant\\ 1 value=1.0 2000\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
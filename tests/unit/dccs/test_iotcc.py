@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import json
+import os
+import Queue
+import time
+import unittest
+import uuid
+
+from tests import liota_conf
+
+# liota.dccs.iotcc reads liota.conf when it is imported
+_CONF_OVERRIDES = {("IOTCC_PATH", "iotcc_response_timeout"): 5,
+                   ("IOTCC_PATH", "iotcc_export_interval"): 3600}
+_import_dir = liota_conf.setup_liota_conf(_CONF_OVERRIDES)
+
+from tests.fake_iotcc import FakeIotccComms
+from liota.dccs.iotcc import IotControlCenter, Request
+from liota.entities.devices.simulated_device import SimulatedDevice
+from liota.entities.edge_systems.dell5k_edge_system import Dell5KEdgeSystem
+from liota.entities.metrics.metric import Metric
+from liota.lib.utilities.future import Future, FutureTimeoutError
+from liota.lib.utilities.utility import LiotaConfigPath
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("Condition not met within {0} seconds".format(timeout))
+        time.sleep(0.01)
+
+
+def tearDownModule():
+    liota_conf.cleanup(_import_dir)
+    os.environ.pop("LIOTA_CONF", None)
+    LiotaConfigPath.path_liota_config = ''
+
+
+class IotControlCenterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = liota_conf.setup_liota_conf(_CONF_OVERRIDES)
+        LiotaConfigPath.path_liota_config = os.path.join(self.work_dir, "liota.conf")
+
+    def tearDown(self):
+        liota_conf.cleanup(self.work_dir)
+
+    def _iotcc(self, registration_cache_ttl=None, rtt=0.001):
+        # every IotControlCenter needs its own connection, like one restarted with the same configuration
+        self.comms = FakeIotccComms(rtt=rtt)
+        iotcc = IotControlCenter(self.comms)
+        if registration_cache_ttl is not None:
+            iotcc._registration_cache_ttl = registration_cache_ttl
+        return iotcc
+
+    def test_register_many_pipelines_requests(self):
+        iotcc = self._iotcc(rtt=0.05)
+        devices = [SimulatedDevice("device-%d" % i, "TestDevice") for i in range(20)]
+        reg_devices = iotcc.register_many(devices)
+        self.assertEquals([reg_device.ref_entity for reg_device in reg_devices], devices)
+        self.assertEquals([reg_device.reg_entity_id for reg_device in reg_devices],
+                          [str(uuid.uuid5(uuid.NAMESPACE_URL, device.entity_id)) for device in devices])
+        self.assertEquals(self.comms.max_outstanding, 20)
+
+    def test_in_flight_window_bounds_outstanding_requests(self):
+        iotcc = self._iotcc(rtt=0.02)
+        iotcc._max_in_flight = 4
+        devices = [SimulatedDevice("device-%d" % i, "TestDevice") for i in range(20)]
+        reg_devices = iotcc.register_many(devices)
+        self.assertEquals(len(reg_devices), 20)
+        self.assertEquals(self.comms.max_outstanding, 4)
+        self.assertEquals(iotcc._in_flight, 0)
+
+    def test_failed_send_fails_only_its_future(self):
+        iotcc = self._iotcc()
+        send = self.comms.send
+
+        def send_or_fail(message, msg_attr=None):
+            if "device-1" in message:
+                raise IOError("Connection lost")
+            send(message, msg_attr)
+
+        self.comms.send = send_or_fail
+        futures = [iotcc.register_async(SimulatedDevice("device-%d" % i, "TestDevice")) for i in range(3)]
+        self.assertIsInstance(futures[1].exception(5), IOError)
+        self.assertEquals([futures[i].result(5).ref_entity.name for i in (0, 2)], ["device-0", "device-2"])
+        wait_until(lambda: iotcc._in_flight == 0)
+
+    def test_property_changes_are_coalesced(self):
+        iotcc = self._iotcc()
+        reg_device = iotcc.register(SimulatedDevice("device", "TestDevice"))
+        requests = self.comms.requests
+        futures = [iotcc.set_properties_async(reg_device, {"key-%d" % i: "value-%d" % i}) for i in range(5)]
+        iotcc.flush_properties(reg_device)
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEquals(self.comms.requests - requests, 1)
+        entity_file = iotcc._read_entity_file(reg_device.reg_entity_id)
+        self.assertEquals([entity_file["key-%d" % i] for i in range(5)], ["value-%d" % i for i in range(5)])
+
+    def test_coalesced_properties_are_flushed_after_the_delay(self):
+        iotcc = self._iotcc()
+        reg_device = iotcc.register(SimulatedDevice("device", "TestDevice"))
+        requests = self.comms.requests
+        first = iotcc.set_properties_async(reg_device, {"model": "LM35", "port": "GPIO-3"})
+        second = iotcc.set_properties_async(reg_device, {"model": "LM35-A2"})
+        self.assertFalse(first.done())
+        self.assertEquals((first.result(5), second.result(5)), (None, None))
+        self.assertEquals(self.comms.requests - requests, 1)
+        entity_file = iotcc._read_entity_file(reg_device.reg_entity_id)
+        self.assertEquals((entity_file["model"], entity_file["port"]), ("LM35-A2", "GPIO-3"))
+
+    def test_resumed_registration_takes_confirmed_uuid(self):
+        device = SimulatedDevice("device", "TestDevice")
+        iotcc = self._iotcc()
+        reg_entity_id = iotcc.register(device).reg_entity_id
+        # IoTCC no longer knows the cached UUID and registers the device again under another one
+        cached = iotcc._entity_store.get("registration", device.entity_id)
+        cached["uuid"] = "stale-uuid"
+        iotcc._entity_store.put("registration", device.entity_id, cached)
+
+        iotcc = self._iotcc(rtt=0.2)
+        reg_device = iotcc.register(device)
+        reg_metric = iotcc.register(Metric("temperature"))
+        iotcc.create_relationship(reg_device, reg_metric)
+        self.assertEquals((reg_device.reg_entity_id, reg_metric.reg_entity_id), ("stale-uuid", "stale-uuid"))
+        wait_until(lambda: reg_device.reg_entity_id == reg_entity_id)
+        self.assertEquals(reg_metric.reg_entity_id, reg_entity_id)
+        self.assertEquals(iotcc._entity_store.get("registration", device.entity_id)["uuid"], reg_entity_id)
+
+    def test_confirmed_registration_is_no_longer_deferred(self):
+        device = SimulatedDevice("device", "TestDevice")
+        iotcc = self._iotcc()
+        iotcc.set_properties(iotcc.register(device), {"model": "LM35"})
+
+        iotcc = self._iotcc()
+        reg_device = iotcc.register(device)
+        self.assertTrue(iotcc._is_resumed(reg_device))
+        # unchanged properties of a resumed entity are reconciled in background
+        self.assertTrue(iotcc.set_properties_async(reg_device, {"model": "LM35"}).done())
+        wait_until(lambda: not iotcc._is_resumed(reg_device))
+        self.assertEquals(iotcc._resumed_entities, {})
+        future = iotcc.set_properties_async(reg_device, {"model": "LM35"})
+        self.assertFalse(future.done())
+        iotcc.flush_properties(reg_device)
+        self.assertTrue(future.done())
+
+    def test_reboot_getprop_does_not_block_completion_threads(self):
+        devices = [SimulatedDevice("device-%d" % i, "TestDevice") for i in range(8)]
+        self._iotcc(registration_cache_ttl=0).register_many(devices)
+        # the entity files now predate the load time of a restarted IotControlCenter, so every registration
+        # fetches the properties IoTCC kept, more of them than there are completion threads
+        iotcc = self._iotcc(registration_cache_ttl=0)
+        iotcc.enable_reboot_getprop = "True"
+        reg_devices = iotcc.register_many(devices)
+        self.assertEquals([reg_device.ref_entity for reg_device in reg_devices], devices)
+        self.assertEquals(self.comms.requests, 16)
+
+    def test_close_exports_unregistered_edge_system(self):
+        iotcc = self._iotcc()
+        edge_system = Dell5KEdgeSystem("edge-system")
+        reg_edge_system = iotcc.register(edge_system)
+        iotcc.export_entity_files()
+        self.assertEquals(self._iotcc_json()["EdgeSystem"]["uuid"], reg_edge_system.reg_entity_id)
+        iotcc.unregister(reg_edge_system)
+        iotcc.close()
+        self.assertFalse("EdgeSystem" in self._iotcc_json())
+
+    def test_export_writes_only_changed_files(self):
+        iotcc = self._iotcc()
+        reg_edge_system = iotcc.register(Dell5KEdgeSystem("edge-system"))
+        reg_device = iotcc.register(SimulatedDevice("device", "TestDevice"))
+        iotcc.export_entity_files()
+        self.assertEquals(self._iotcc_json()["EdgeSystem"]["uuid"], reg_edge_system.reg_entity_id)
+        dev_file = os.path.join(iotcc.dev_file_path, reg_device.reg_entity_id + ".json")
+        with open(dev_file) as f:
+            self.assertEquals(json.load(f)["discovery"]["attributes"][:2],
+                              [{"IoTDeviceType": "TestDevice"}, {"IoTDeviceName": "device"}])
+        os.remove(dev_file)
+        iotcc.export_entity_files()
+        self.assertFalse(os.path.exists(dev_file))
+        iotcc.export_entity_files(only_changed=False)
+        self.assertTrue(os.path.exists(dev_file))
+
+    def test_responses_are_sharded_by_transaction_id(self):
+        iotcc = self._iotcc()
+        # shards nobody completes, to see where each response goes
+        iotcc._dispatch_shards = [Queue.Queue() for _ in range(3)]
+        for transaction_id in range(2, 14, 2):
+            with iotcc._req_ops_lock:
+                iotcc._req_dict[transaction_id] = Request(transaction_id, Future())
+            iotcc._recv_msg_queue.put(json.dumps({"transactionID": transaction_id}))
+        wait_until(lambda: sum(shard.qsize() for shard in iotcc._dispatch_shards) == 6)
+        shards = [[shard.get()[0].transaction_id for _ in range(shard.qsize())] for shard in iotcc._dispatch_shards]
+        self.assertEquals(shards, [[6, 12], [2, 8], [4, 10]])
+
+    def test_expired_requests_are_failed_and_reaped(self):
+        iotcc = self._iotcc()
+        request = Request(2, Future())
+        request.deadline = time.time() - 1
+        with iotcc._req_ops_lock:
+            iotcc._req_dict[2] = request
+        iotcc._expire_requests()
+        self.assertIsInstance(request.response_future.exception(0), FutureTimeoutError)
+        self.assertFalse(2 in iotcc._req_dict)
+        self.assertTrue(2 in iotcc._expired_ids)
+        # a late response is dropped, and the ID is forgotten once its late responses are no longer expected
+        iotcc._recv_msg_queue.put(json.dumps({"transactionID": 2}))
+        wait_until(lambda: 2 not in iotcc._expired_ids)
+        with iotcc._req_ops_lock:
+            iotcc._expired_ids[4] = time.time() - 1
+        iotcc._expire_requests()
+        self.assertEquals(iotcc._expired_ids, {})
+
+    def _iotcc_json(self):
+        with open(os.path.join(self.work_dir, "iotcc.json")) as f:
+            return json.load(f)["iotcc"]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import gzip
+import unittest
+import urllib2
+from StringIO import StringIO
+
+from liota.dccs.prometheus import Prometheus
+from liota.dcc_comms.prometheus_dcc_comms import PrometheusDccComms
+from liota.entities.devices.simulated_device import SimulatedDevice
+from liota.entities.edge_systems.simulated_edge_system import SimulatedEdgeSystem
+from liota.entities.metrics.metric import Metric
+
+
+class TestDCCPrometheus(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.comms = PrometheusDccComms(0, host="127.0.0.1")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.comms._disconnect()
+
+    def setUp(self):
+        self.comms._families.clear()
+        self.comms._dirty = set()
+        self.comms._body = None
+        self.prometheus = Prometheus(self.comms, labels={"site": 'plant "1"'})
+        self.reg_edge_system = self.prometheus.register(SimulatedEdgeSystem("EdgeSystem-1"))
+        self.reg_devices = []
+        self.reg_metrics = []
+        for name in ["Device-1", "Device-2"]:
+            reg_device = self.prometheus.register(SimulatedDevice(name))
+            reg_metric = self.prometheus.register(Metric(name="room.temperature", interval=5,
+                                                         sampling_function=lambda: 1))
+            self.prometheus.create_relationship(self.reg_edge_system, reg_device)
+            self.prometheus.create_relationship(reg_device, reg_metric)
+            self.reg_devices.append(reg_device)
+            self.reg_metrics.append(reg_metric)
+
+    def scrape(self, gzipped=False):
+        request = urllib2.Request("http://127.0.0.1:%d/metrics" % self.comms.port)
+        if gzipped:
+            request.add_header("Accept-Encoding", "gzip")
+        body = urllib2.urlopen(request).read()
+        if gzipped:
+            body = gzip.GzipFile(fileobj=StringIO(body)).read()
+        return sorted(body.splitlines())
+
+    def test_latest_samples_are_scraped(self):
+        for sample in [(2000, 22.5), (1000, 21), (3000, "n/a")]:
+            self.reg_metrics[0].values.put(sample)
+        self.prometheus.publish(self.reg_metrics[0])
+        self.reg_metrics[1].values.put((1000, True))
+        self.prometheus.publish(self.reg_metrics[1])
+        expected = [
+            '# TYPE room_temperature gauge',
+            'room_temperature{device="Device-1",edge_system="EdgeSystem-1",site="plant \\"1\\""} 22.5 2000',
+            'room_temperature{device="Device-2",edge_system="EdgeSystem-1",site="plant \\"1\\""} 1 1000',
+        ]
+        self.assertEquals(self.scrape(), expected)
+        self.assertEquals(self.scrape(gzipped=True), expected)
+
+        self.reg_metrics[0].values.put((4000, 23.0))
+        self.prometheus.publish(self.reg_metrics[0])
+        self.assertIn('room_temperature{device="Device-1",edge_system="EdgeSystem-1",site="plant \\"1\\""} 23.0 4000',
+                      self.scrape())
+
+    def test_series_follow_relationship_changes(self):
+        self.reg_metrics[0].values.put((1000, 1.0))
+        self.prometheus.publish(self.reg_metrics[0])
+        self.prometheus.create_relationship(self.reg_edge_system, self.reg_metrics[0])
+        self.reg_metrics[0].values.put((2000, 2.0))
+        self.prometheus.publish(self.reg_metrics[0])
+        self.assertEquals(self.scrape(), [
+            '# TYPE room_temperature gauge',
+            'room_temperature{edge_system="EdgeSystem-1",site="plant \\"1\\""} 2.0 2000',
+        ])
+
+        self.prometheus.unregister(self.reg_metrics[0])
+        self.assertEquals(self.scrape(), [])
+
+    def test_label_names_are_sanitized(self):
+        self.prometheus.labels = {"plant:site": "1"}
+        self.reg_metrics[0].values.put((1000, 1.0))
+        self.prometheus.publish(self.reg_metrics[0])
+        self.assertIn('room_temperature{device="Device-1",edge_system="EdgeSystem-1",plant_site="1"} 1.0 1000',
+                      self.scrape())
+
+    def test_series_changes_across_blocks(self):
+        lines = dict((i, "m{i=\"%d\"} %d 1000\n" % (i, i)) for i in range(300))
+        self.comms.send([("m", str(i), line) for i, line in lines.items()])
+        self.comms.render()
+        for i in (5, 150, 299):
+            del lines[i]
+        lines[7] = "m{i=\"7\"} 70 2000\n"
+        self.comms.send([("m", "5", None), ("m", "150", None), ("m", "299", None), ("m", "7", lines[7])])
+        body = self.comms.render()
+        self.assertTrue(body.startswith("# TYPE m gauge\n"))
+        self.assertEquals(sorted(body.splitlines()[1:]), sorted(line.strip() for line in lines.values()))
+
+    def test_comms_stats(self):
+        before = self.comms.stats()
+        self.assertEquals(before["state"], "connected")
+        line = "m{i=\"1\"} 1 1000\n"
+        self.comms.send([("m", "1", line), ("m", "1", None)])
+        stats = self.comms.stats()
+        self.assertEquals(stats["messages_sent"] - before["messages_sent"], 1)
+        self.assertEquals(stats["bytes_sent"] - before["bytes_sent"], len(line))
+
+
+if __name__ == '__main__':
+    unittest.main()
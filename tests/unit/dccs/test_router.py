@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import Queue
+import threading
+import unittest
+
+import mock
+
+from liota.dccs.influxdb import InfluxDB
+from liota.dccs.router import Route, Router
+from liota.dcc_comms.dcc_comms import DCCComms
+from liota.entities.devices.simulated_device import SimulatedDevice
+from liota.entities.edge_systems.simulated_edge_system import SimulatedEdgeSystem
+from liota.entities.metrics.metric import Metric
+
+
+class TestDCCRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.fast = InfluxDB(mock.create_autospec(DCCComms))
+        self.slow = InfluxDB(mock.create_autospec(DCCComms))
+        self.sending = threading.Event()
+        self.unblock = threading.Event()
+
+        def send(message, msg_attr):
+            self.sending.set()
+            self.unblock.wait()
+        self.slow.comms.send.side_effect = send
+        self.router = Router([
+            Route(self.fast, metric_name="temp*", name="fast"),
+            Route(self.slow, device_type="SimulatedDevice", queue_size=1, name="slow")
+        ])
+        self.reg_edge_system = self.router.register(SimulatedEdgeSystem("EdgeSystem-1"))
+        self.reg_device = self.router.register(SimulatedDevice("Device-1"))
+        self.router.create_relationship(self.reg_edge_system, self.reg_device)
+
+    def tearDown(self):
+        self.unblock.set()
+        self.router.stop()
+
+    def register_metric(self, name, reg_parent):
+        reg_metric = self.router.register(Metric(name=name, interval=5, sampling_function=lambda: 1))
+        self.router.create_relationship(reg_parent, reg_metric)
+        return reg_metric
+
+    def test_entities_are_registered_with_every_target(self):
+        reg_metric = self.register_metric("temperature", self.reg_device)
+        self.assertEquals(reg_metric.targets.keys(), [self.fast, self.slow])
+        self.assertIs(reg_metric.targets[self.fast].parent, self.reg_device.targets[self.fast])
+        self.assertIs(reg_metric.targets[self.slow].parent.parent, self.reg_edge_system.targets[self.slow])
+
+    def test_slow_target_does_not_block_others(self):
+        device_metric = self.register_metric("temperature", self.reg_device)
+        edge_system_metric = self.register_metric("humidity", self.reg_edge_system)
+
+        futures = []
+        for ts in range(1, 4):
+            device_metric.values.put((ts, 20.0))
+            futures.append(self.router.publish_async(device_metric))
+            self.sending.wait(1)
+        edge_system_metric.values.put((1, 50.0))
+        self.router.publish_async(edge_system_metric).result(1)
+
+        # Only the device's temperature reaches the fast target, without waiting for the slow one
+        futures[-1].exception(1)
+        self.assertEquals(self.fast.comms.send.call_args_list, [
+            mock.call('temperature,device=Device-1,edge_system=EdgeSystem-1 value=20.0 %d\n' % ts, None)
+            for ts in range(1, 4)])
+        # The slow target is busy with the first publish and queues one more, the last one is dropped
+        self.assertIsInstance(futures[2].exception(1), Queue.Full)
+
+        stats = self.router.stats()
+        self.assertEquals(stats["fast"]["published"], 3)
+        self.assertEquals(stats["slow"]["dropped"], 1)
+        self.unblock.set()
+        futures[1].result(1)
+        self.assertEquals(self.router.stats()["slow"]["published"], 2)
+
+    def test_routes_to_the_same_target_publish_once(self):
+        target = InfluxDB(mock.create_autospec(DCCComms))
+        router = Router([Route(target, metric_name="temp*", name="temperature"),
+                         Route(target, device_type="SimulatedDevice", name="devices")])
+        try:
+            reg_device = router.register(SimulatedDevice("Device-1"))
+            reg_metric = router.register(Metric(name="temperature", interval=5, sampling_function=lambda: 1))
+            router.create_relationship(reg_device, reg_metric)
+            for ts in range(1, 4):
+                reg_metric.values.put((ts, 20.0))
+                router.publish_async(reg_metric).result(1)
+        finally:
+            router.stop()
+        self.assertEquals(target.comms.send.call_args_list, [
+            mock.call('temperature,device=Device-1 value=20.0 %d\n' % ts, None) for ts in range(1, 4)])
+        stats = router.stats()
+        self.assertEquals((stats["temperature"]["published"], stats["devices"]["published"]), (3, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import os
+import time
+import unittest
+
+import mock
+
+from tests import liota_conf
+
+# liota.lib.transports.mqtt reads liota.conf when it is imported
+_import_dir = liota_conf.setup_liota_conf()
+
+from tests.fake_mqtt_broker import FakeMqttBroker
+from liota.lib.transports import mqtt
+from liota.lib.transports.mqtt import Mqtt
+from liota.lib.utilities.future import FutureTimeoutError
+from liota.lib.utilities.utility import LiotaConfigPath
+
+
+def tearDownModule():
+    liota_conf.cleanup(_import_dir)
+    os.environ.pop("LIOTA_CONF", None)
+    LiotaConfigPath.path_liota_config = ''
+
+
+class MqttPublishTest(unittest.TestCase):
+
+    def setUp(self):
+        self.broker = FakeMqttBroker()
+        self.client = Mqtt("127.0.0.1", self.broker.port, client_id="test-publish", clean_session=True,
+                           in_flight_window=2)
+
+    def tearDown(self):
+        self.client._paho_client.loop_stop()
+        self.broker.close()
+
+    def test_full_window_fails_fast_while_disconnected(self):
+        # The connection is lost without the client closing
+        self.client._paho_client.disconnect()
+        deadline = time.time() + 5
+        while self.client.connected:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        # paho keeps QoS 1 messages published while disconnected, until the window is full
+        self.client.publish("home/temperature", "21", 1)
+        self.client.publish("home/temperature", "22", 1)
+        started = time.time()
+        self.assertRaises(FutureTimeoutError, self.client.publish, "home/temperature", "23", 1)
+        self.assertLess(time.time() - started, 1)
+        stats = self.client.publish_stats()
+        self.assertEquals(stats["in_flight"], 2)
+        self.assertEquals(stats["window_rejects"], 1)
+        self.assertEquals(stats["failed"], 1)
+        self.assertEquals(self.client.comms_stats.errors, 1)
+        future = self.client.publish_async("home/temperature", "24", 1, timeout=0.05)
+        self.assertIsInstance(future.exception(0), FutureTimeoutError)
+        self.assertEquals(self.client.publish_stats()["failed"], 2)
+
+
+@unittest.skipIf(mqtt.Properties is None, "paho-mqtt before 1.5 has no MQTTv5")
+class MqttV5Test(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(mqtt.paho, "Client")
+        self.addCleanup(patcher.stop)
+        self.paho_client = patcher.start().return_value
+        self.mids = iter(range(1, 1000))
+        self.paho_client.publish.side_effect = lambda *args: mock.Mock(rc=0, mid=next(self.mids))
+        self.paho_client.loop_start.side_effect = lambda: self.connack(2)
+        self.client = Mqtt("127.0.0.1", 1883, client_id="test-v5", clean_session=True, protocol="MQTTv5",
+                           message_expiry=60)
+
+    def connack(self, topic_alias_maximum):
+        properties = mqtt.Properties(mqtt.PacketTypes.CONNACK)
+        properties.TopicAliasMaximum = topic_alias_maximum
+        self.paho_client.on_connect(self.paho_client, None, {}, 0, properties)
+
+    def published(self):
+        return [(args[0], args[2], getattr(args[4], "TopicAlias", None), args[4].MessageExpiryInterval)
+                for args, _ in self.paho_client.publish.call_args_list]
+
+    def test_connect_properties(self):
+        kwargs = self.paho_client.connect.call_args[1]
+        self.assertTrue(kwargs["clean_start"])
+        self.assertFalse(hasattr(kwargs["properties"], "SessionExpiryInterval"))
+
+    def test_qos0_topics_are_replaced_by_aliases(self):
+        for topic in ("home/temperature", "home/temperature", "home/humidity", "home/light", "home/temperature"):
+            self.client.publish(topic, "21", 0)
+        self.assertEquals(self.published(), [("home/temperature", 0, 1, 60), ("", 0, 1, 60),
+                                             ("home/humidity", 0, 2, 60), ("home/light", 0, None, 60),
+                                             ("", 0, 1, 60)])
+        self.assertEquals(self.client.alias_publishes, 2)
+
+    def test_qos1_messages_keep_their_topic(self):
+        self.client.publish("home/temperature", "21", 1)
+        self.client.publish("home/temperature", "22", 1)
+        self.assertEquals(self.published(), [("home/temperature", 1, None, 60)] * 2)
+
+    def test_aliases_start_over_on_reconnect(self):
+        self.client.publish("home/temperature", "21", 0)
+        self.paho_client.on_disconnect(self.paho_client, None, 1)
+        self.client.publish("home/temperature", "22", 0)
+        self.connack(2)
+        self.client.publish("home/humidity", "50", 0)
+        self.client.publish("home/temperature", "23", 0)
+        self.assertEquals(self.published(), [("home/temperature", 0, 1, 60), ("home/temperature", 0, None, 60),
+                                             ("home/humidity", 0, 1, 60), ("home/temperature", 0, 2, 60)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+import unittest
+
+from liota.lib.transports.topic_aliases import TopicAliases
+
+
+class TopicAliasesTest(unittest.TestCase):
+
+    def test_announcement_followed_at_once(self):
+        aliases = TopicAliases(2)
+        self.assertEquals(aliases.get("home/temperature"), ("home/temperature", 1))
+        self.assertEquals(aliases.get("home/temperature"), ("home/temperature", 1))
+        aliases.announced("home/temperature")
+        self.assertEquals(aliases.get("home/temperature"), ("", 1))
+        self.assertEquals(aliases.get("home/humidity"), ("home/humidity", 2))
+        self.assertEquals(aliases.get("home/light"), ("home/light", None))
+        self.assertEquals(aliases.topic(2), "home/humidity")
+        self.assertEquals(aliases.topic(3), None)
+
+    def test_reset_forgets_aliases(self):
+        aliases = TopicAliases(10)
+        aliases.get("home/temperature")
+        aliases.announced("home/temperature")
+        aliases.reset(0)
+        self.assertEquals(aliases.get("home/temperature"), ("home/temperature", None))
+        aliases.reset(10)
+        aliases.get("home/humidity")
+        self.assertEquals(aliases.get("home/temperature"), ("home/temperature", 2))
+        self.assertEquals(len(aliases), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import base64
+import hashlib
+import socket
+import struct
+import threading
+import time
+import unittest
+import zlib
+import Queue
+
+import mock
+from websocket import ABNF
+
+from liota.lib.transports.web_socket import AsyncWebSocket
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.01)
+
+
+class WebSocketServer(object):
+    """
+    Minimal WebSocket server accepting one connection at a time, with optional permessage-deflate.
+    """
+
+    def __init__(self, deflate=True):
+        self.deflate = deflate
+        self.messages = []
+        self.compressed = []
+        self.opcodes = []
+        self.conn = None
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.url = "ws://127.0.0.1:{0}/".format(self.server.getsockname()[1])
+        thread = threading.Thread(target=self._serve)
+        thread.daemon = True
+        thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn = self.server.accept()[0]
+            except socket.error:
+                return
+            request = ""
+            while not request.endswith("\r\n\r\n"):
+                request += conn.recv(1)
+            headers = dict(line.split(": ", 1) for line in request.split("\r\n")[1:] if line)
+            accept = base64.b64encode(hashlib.sha1(headers["Sec-WebSocket-Key"] +
+                                                   "258EAFA5-E914-47DA-95CA-C5AB0DC85B11").digest())
+            response = ["HTTP/1.1 101 Switching Protocols", "Upgrade: websocket", "Connection: Upgrade",
+                        "Sec-WebSocket-Accept: " + accept]
+            deflate = self.deflate and "permessage-deflate" in headers.get("Sec-WebSocket-Extensions", "")
+            if deflate:
+                response.append("Sec-WebSocket-Extensions: permessage-deflate")
+            conn.sendall("\r\n".join(response) + "\r\n\r\n")
+            self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            self.conn = conn
+            try:
+                while True:
+                    self._read_frame(conn)
+            except (socket.error, EOFError):
+                conn.close()
+
+    def _read(self, conn, size):
+        data = ""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise EOFError()
+            data += chunk
+        return data
+
+    def _read_frame(self, conn):
+        b1, b2 = struct.unpack("!BB", self._read(conn, 2))
+        length = b2 & 0x7f
+        if length == 126:
+            length = struct.unpack("!H", self._read(conn, 2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self._read(conn, 8))[0]
+        mask = self._read(conn, 4)
+        payload = ABNF.mask(mask, self._read(conn, length))
+        if b1 & 0x0f not in (ABNF.OPCODE_TEXT, ABNF.OPCODE_BINARY):
+            raise EOFError()
+        self.opcodes.append(b1 & 0x0f)
+        compressed = bool(b1 & 0x40)
+        if compressed:
+            payload = self.decompressor.decompress(payload + "\x00\x00\xff\xff")
+        self.compressed.append(compressed)
+        self.messages.append(payload)
+
+    def send(self, message, compressed=False):
+        if compressed:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+            message = (compressor.compress(message) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+        self.conn.sendall(ABNF(1, int(compressed), 0, 0, ABNF.OPCODE_TEXT, 0, message).format())
+
+    def close(self):
+        self.server.close()
+        if self.conn is not None:
+            self.conn.close()
+
+
+class AsyncWebSocketTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = WebSocketServer()
+        self.ws = None
+
+    def tearDown(self):
+        if self.ws is not None:
+            self.ws.close()
+        self.server.close()
+
+    def connect(self, **options):
+        self.ws = AsyncWebSocket(self.server.url, False, None, min_backoff=0.01, max_backoff=0.05, **options)
+        return self.ws
+
+    def test_messages_are_compressed_above_threshold(self):
+        ws = self.connect(compress_threshold=10)
+        messages = ["short"] + ['{"uuid": "%d", "value": 42.0}' % i for i in range(50)]
+        for message in messages:
+            ws.send(message)
+        self.assertTrue(ws.flush(2))
+        wait_until(lambda: len(self.server.messages) == len(messages))
+        self.assertEquals(self.server.messages, messages)
+        self.assertEquals(self.server.compressed, [False] + [True] * 50)
+        stats = ws.stats()
+        self.assertTrue(stats["deflate"])
+        self.assertTrue(stats["bytes_sent"] < stats["payload_bytes"])
+
+    def test_uncompressed_without_server_support(self):
+        self.server.deflate = False
+        ws = self.connect(compress_threshold=0)
+        ws.send_async("x" * 100).result(2)
+        wait_until(lambda: len(self.server.messages) == 1)
+        self.assertEquals(self.server.compressed, [False])
+        self.assertFalse(ws.stats()["deflate"])
+
+    def test_binary_frames(self):
+        ws = self.connect(binary=True)
+        message = "".join(chr(i) for i in range(256))
+        ws.send_async(message).result(2)
+        wait_until(lambda: len(self.server.messages) == 1)
+        self.assertEquals(self.server.messages, [message])
+        self.assertEquals(self.server.opcodes, [ABNF.OPCODE_BINARY])
+
+    def test_receives_compressed_messages(self):
+        ws = self.connect()
+        queue = Queue.Queue()
+        thread = threading.Thread(target=ws.receive, args=(queue,))
+        thread.daemon = True
+        thread.start()
+        wait_until(lambda: self.server.conn is not None)
+        self.server.send("plain")
+        self.server.send('{"type": "connection_response"}', compressed=True)
+        self.assertEquals(queue.get(timeout=2), "plain")
+        self.assertEquals(queue.get(timeout=2), '{"type": "connection_response"}')
+
+    def test_queued_messages_are_sent_after_reconnect(self):
+        ws = self.connect()
+        ws.send_async("first").result(2)
+        wait_until(lambda: len(self.server.messages) == 1)
+        connection = self.server.conn
+        connection.shutdown(socket.SHUT_RDWR)
+        queue = Queue.Queue()
+        thread = threading.Thread(target=ws.receive, args=(queue,))
+        thread.daemon = True
+        thread.start()
+        wait_until(lambda: self.server.conn is not connection)
+        ws.send_async("second").result(2)
+        wait_until(lambda: self.server.messages[-1:] == ["second"])
+        self.assertEquals(ws.stats()["reconnects"], 1)
+
+    def test_failed_writes_are_not_counted(self):
+        ws = self.connect()
+        ws.send_async("first").result(2)
+        queue = Queue.Queue()
+        thread = threading.Thread(target=ws.receive, args=(queue,))
+        thread.daemon = True
+        thread.start()
+        connection = self.server.conn
+        sock = ws._conn.ws.sock = mock.Mock(wraps=ws._conn.ws.sock)
+        sock.sendall.side_effect = lambda data: connection.shutdown(socket.SHUT_RDWR) or 1 / 0
+        ws.send_async("second").result(2)
+        wait_until(lambda: self.server.messages[-1:] == ["second"])
+        stats = ws.stats()
+        self.assertEquals(stats["errors"], 1)
+        self.assertEquals(stats["payload_bytes"], len("first") + len("second"))
+
+    def test_full_queue_drops_oldest(self):
+        # a bound socket that is not listening refuses connections; closing the server's listening socket does
+        # not, while its thread is blocked in accept()
+        refusing = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(refusing.close)
+        refusing.bind(("127.0.0.1", 0))
+        self.ws = AsyncWebSocket("ws://127.0.0.1:{0}/".format(refusing.getsockname()[1]), False, None, queue_size=2,
+                                 min_backoff=10)
+        futures = [self.ws.send_async(str(i)) for i in range(3)]
+        self.assertRaises(IOError, futures[0].result, 0)
+        self.assertFalse(futures[1].done())
+        self.assertEquals(self.ws.stats()["dropped_messages"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,6 +33,10 @@
 import unittest
 
 from liota.lib.utilities.filters.range_filter import RangeFilter, Type
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class RangeFilterTest(unittest.TestCase):
@@ -182,5 +186,25 @@ class RangeFilterTest(unittest.TestCase):
         self.assertEquals(out_range_value, None)
         self.assertEquals(in_range_value, self.more_than_upper_bound)
 
+    def test_filter_many_matches_filter(self):
+        """filter_many() passes the same values as filter(), keeping non-numbers"""
+        values = [self.less_than_lower_bound, self.lower_bound, self.middle_value, 15.5, self.upper_bound,
+                  self.more_than_upper_bound, "n/a"]
+        for filter_type in Type:
+            range_filter = RangeFilter(filter_type, self.lower_bound, self.upper_bound)
+            self.assertEquals(range_filter.filter_many(values),
+                              [v for v in values if range_filter.filter(v) is not None])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_filter_many_numpy(self):
+        """filter_many() filters NumPy arrays and lists of numbers with NumPy"""
+        values = [self.less_than_lower_bound, self.lower_bound, self.middle_value, self.upper_bound,
+                  self.more_than_upper_bound]
+        for filter_type in Type:
+            range_filter = RangeFilter(filter_type, self.lower_bound, self.upper_bound)
+            expected = [v for v in values if range_filter.filter(v) is not None]
+            self.assertEquals(range_filter.filter_many(numpy.array(values)).tolist(), expected)
+            self.assertEquals(range_filter.filter_many(values), expected)
+
 if __name__ == '__main__':
     unittest.main(verbosity=1)
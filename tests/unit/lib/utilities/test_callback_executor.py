@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import threading
+import unittest
+
+from liota.lib.utilities.callback_executor import CallbackExecutor
+
+
+class CallbackExecutorTest(unittest.TestCase):
+
+    def test_callbacks_of_a_key_run_in_order(self):
+        executor = CallbackExecutor(num_workers=3)
+        calls = []
+        for i in range(100):
+            for topic in ["a", "b", "c"]:
+                executor.submit(topic, calls.append, (topic, i))
+        executor.shutdown()
+        for topic in ["a", "b", "c"]:
+            self.assertEquals([i for t, i in calls if t == topic], range(100))
+        self.assertEquals(executor.stats()["completed"], 300)
+
+    def test_overflow_and_failures_are_counted(self):
+        executor = CallbackExecutor(num_workers=1, queue_size=2)
+        started = threading.Event()
+        unblock = threading.Event()
+
+        def slow():
+            started.set()
+            unblock.wait(1)
+
+        def fail():
+            raise ValueError("failed")
+        executor.submit("slow", slow)
+        started.wait(1)
+        self.assertTrue(executor.submit("topic", fail))
+        self.assertTrue(executor.submit("topic", fail))
+        self.assertFalse(executor.submit("topic", fail))
+        unblock.set()
+        executor.shutdown()
+        stats = executor.stats()
+        self.assertEquals((stats["submitted"], stats["completed"], stats["failed"], stats["dropped"]), (3, 1, 2, 1))
+        self.assertEquals(stats["dropped_by_key"], {"topic": 1})
+
+    def test_wrap(self):
+        executor = CallbackExecutor(num_workers=2)
+        calls = []
+        callback = executor.wrap(lambda client, userdata, msg: calls.append(msg), lambda client, userdata, msg: msg)
+        callback(None, None, "message")
+        executor.shutdown()
+        self.assertEquals(calls, ["message"])
+
+
+if __name__ == '__main__':
+    unittest.main()
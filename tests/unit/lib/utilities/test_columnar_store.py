@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from StringIO import StringIO
+
+from liota.lib.utilities.columnar_store import ColumnarStore
+
+
+class ColumnarStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.store = ColumnarStore(self.work_dir, block_rows=10)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.work_dir)
+
+    def reopen(self, **options):
+        self.store.close()
+        self.store = ColumnarStore(self.work_dir, block_rows=10, **options)
+
+    def test_read_range_across_blocks_and_buffer(self):
+        self.store.append("device.temperature", [(1000 * i, i * 0.5) for i in range(25)])
+        self.store.append("device.humidity", [(1000, 40)])
+        self.assertEquals(self.store.read("device.temperature", 8000, 12000),
+                          [(8000, 4.0), (9000, 4.5), (10000, 5.0), (11000, 5.5), (12000, 6.0)])
+        self.assertEquals(len(self.store.read("device.temperature")), 25)
+        self.assertEquals(self.store.series(), ["device.humidity", "device.temperature"])
+
+    def test_samples_persist_across_reopen(self):
+        self.store.append("device.temperature", [(1000 * i, i) for i in range(25)])
+        self.store.append("device.state", [(1000, "on"), (2000, "off")])
+        self.reopen()
+        self.assertEquals(len(self.store.read("device.temperature")), 25)
+        self.assertEquals(self.store.read("device.state"), [(1000, "on"), (2000, "off")])
+
+    def test_index_is_rebuilt_from_segments(self):
+        self.store.append("device.temperature", [(1000 * i, i) for i in range(25)])
+        self.store.close()
+        for name in os.listdir(self.work_dir):
+            if name.endswith(".idx"):
+                os.remove(os.path.join(self.work_dir, name))
+        self.reopen()
+        self.assertEquals(self.store.read("device.temperature", 20000), [(1000 * i, i) for i in range(20, 25)])
+
+    def test_retention(self):
+        self.reopen(max_segment_bytes=1, retention_seconds=3600)
+        now = int(time.time() * 1000)
+        self.store.append("device.temperature", [(1000 * i, i) for i in range(10)])
+        self.store.append("device.temperature", [(now + i, i) for i in range(10)])
+        self.store.append("device.temperature", [(now + 100 + i, i) for i in range(10)])
+        self.assertEquals(self.store.read("device.temperature")[0], (now, 0))
+        self.assertEquals(len([name for name in os.listdir(self.work_dir) if name.endswith(".seg")]), 2)
+
+    def test_out_of_order_blocks(self):
+        self.store.append("device.temperature", [(1000 * i, i) for i in range(20, 30)])
+        self.store.append("device.temperature", [(1000 * i, i) for i in range(0, 10)])
+        self.store.append("device.temperature", [(1000 * i, i) for i in range(5, 25, 2)])
+        self.store.append("device.temperature", [(1000 * i, i) for i in range(100, 110)])
+        self.assertEquals(self.store.read("device.temperature", 9000, 11000), [(9000, 9), (9000, 9), (11000, 11)])
+        self.assertEquals(self.store.read("device.temperature", 26000, 99000), [(1000 * i, i) for i in range(26, 30)])
+        self.assertEquals(self.store.read("device.temperature", 50000, 60000), [])
+
+    def test_integers_are_kept_exact(self):
+        values = [2 ** 62 + 1, -3, 2 ** 53 + 1]
+        self.store.append("device.counter", [(1000 * i, value) for i, value in enumerate(values)])
+        self.store.flush()
+        self.assertEquals([value for _, value in self.store.read("device.counter")], values)
+
+    def test_quiet_series_is_flushed_on_timer(self):
+        self.reopen(flush_interval=0.05)
+        self.store.append("device.temperature", [(1000, 1.5)])
+        deadline = time.time() + 5
+        while not any(name.endswith(".seg") and os.path.getsize(os.path.join(self.work_dir, name))
+                      for name in os.listdir(self.work_dir)):
+            self.assertTrue(time.time() < deadline)
+            time.sleep(0.01)
+        self.assertEquals(self.store.read("device.temperature"), [(1000, 1.5)])
+
+    def test_export(self):
+        self.store.append("device.temperature", [(1000, 1.5), (2000, 2)])
+        self.store.flush()
+        out = StringIO()
+        self.assertEquals(self.store.export(out), 2)
+        self.assertEquals(out.getvalue(), "device.temperature,1000,1.5\ndevice.temperature,2000,2.0\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import unittest
+
+from liota.lib.utilities.comms_stats import CommsStats, CONNECTED, UNKNOWN
+
+
+class CommsStatsTest(unittest.TestCase):
+
+    def test_snapshot(self):
+        state = [CONNECTED]
+        stats = CommsStats(lambda: state[0])
+        stats.sent(10, 0.003)
+        stats.sent(30, messages=2)
+        stats.received(5)
+        stats.failed()
+        stats.reconnected()
+        state[0] = "disconnected"
+        snapshot = stats.snapshot()
+        self.assertEquals((snapshot["messages_sent"], snapshot["bytes_sent"]), (3, 40))
+        self.assertEquals((snapshot["messages_received"], snapshot["bytes_received"]), (1, 5))
+        self.assertEquals((snapshot["errors"], snapshot["reconnects"]), (1, 1))
+        self.assertEquals(snapshot["state"], "disconnected")
+        self.assertEquals(snapshot["send_latency"]["count"], 1)
+        self.assertEquals(snapshot["send_latency"]["p50"], 0.005)
+
+    def test_state_unknown_without_callable(self):
+        self.assertEquals(CommsStats().snapshot()["state"], UNKNOWN)
+
+
+if __name__ == '__main__':
+    unittest.main()
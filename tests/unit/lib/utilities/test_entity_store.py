@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from liota.lib.utilities.entity_store import EntityStore
+
+
+class EntityStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.store = EntityStore(os.path.join(self.work_dir, "store", "entities.db"))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.work_dir)
+
+    def test_put_get_delete(self):
+        self.store.put("entity", "uuid-1", {"name": "device-1"})
+        self.store.put("entity", "uuid-1", {"name": "device-1", "model": "LM35"})
+        self.assertEquals(self.store.get("entity", "uuid-1"), {"name": "device-1", "model": "LM35"})
+        self.assertEquals(self.store.get("other", "uuid-1"), None)
+        self.assertTrue(self.store.delete("entity", "uuid-1"))
+        self.assertFalse(self.store.delete("entity", "uuid-1"))
+        self.assertEquals(self.store.count("entity"), 0)
+
+    def test_documents_survive_reopen(self):
+        self.store.put("entity", "uuid-1", {"name": "device-1"})
+        self.store.close()
+        self.store = EntityStore(self.store.db_path)
+        self.assertEquals(self.store.get("entity", "uuid-1"), {"name": "device-1"})
+
+    def test_export_only_changed_files(self):
+        export_dir = os.path.join(self.work_dir, "devs")
+        self.store.put("dev", "uuid-1", {"remove": False})
+        self.store.put("dev", "uuid-2", {"remove": False})
+        self.assertEquals(self.store.export_files("dev", export_dir), 2)
+        self.assertFalse(self.store.has_changes("dev"))
+        self.assertEquals(self.store.export_files("dev", export_dir), 0)
+
+        self.store.put("dev", "uuid-2", {"remove": True})
+        self.assertEquals(self.store.export_files("dev", export_dir), 1)
+        with open(os.path.join(export_dir, "uuid-2.json")) as f:
+            self.assertEquals(json.load(f), {"remove": True})
+        self.assertEquals(self.store.export_files("dev", export_dir, only_changed=False), 2)
+
+    def test_deletions_are_changes(self):
+        self.store.put("iotcc", "EdgeSystem", {"SystemName": "edge"})
+        self.store.mark_exported("iotcc")
+        self.assertTrue(self.store.delete("iotcc", "EdgeSystem"))
+        self.assertTrue(self.store.has_changes("iotcc"))
+        self.store.close()
+        self.store = EntityStore(self.store.db_path)
+        self.assertTrue(self.store.has_changes("iotcc"))
+        self.store.mark_exported("iotcc")
+        self.assertFalse(self.store.has_changes("iotcc"))
+        self.assertFalse(self.store.delete("iotcc", "EdgeSystem"))
+        self.assertFalse(self.store.has_changes("iotcc"))
+
+    def test_changes_during_export_stay_changed(self):
+        self.store.put("iotcc", "EdgeSystem", {"SystemName": "edge"})
+        self.store.put("iotcc", "device-1", {"DeviceName": "device-1"})
+        items, snapshot = self.store.export_items("iotcc")
+        self.assertEquals([key for key, _ in items], ["EdgeSystem", "device-1"])
+        # Updated and deleted after being read, before being marked as exported
+        self.store.put("iotcc", "device-2", {"DeviceName": "device-2"})
+        self.store.put("iotcc", "EdgeSystem", {"SystemName": "edge", "uuid": "uuid-1"})
+        self.store.mark_exported("iotcc", snapshot)
+        self.assertTrue(self.store.has_changes("iotcc"))
+        items, snapshot = self.store.export_items("iotcc")
+        self.store.delete("iotcc", "device-1")
+        self.store.mark_exported("iotcc", snapshot)
+        self.assertTrue(self.store.has_changes("iotcc"))
+        self.store.mark_exported("iotcc", self.store.export_items("iotcc")[1])
+        self.assertFalse(self.store.has_changes("iotcc"))
+
+    def test_import_files(self):
+        legacy_dir = os.path.join(self.work_dir, "entity")
+        os.makedirs(legacy_dir)
+        with open(os.path.join(legacy_dir, "uuid-1.json"), "w") as f:
+            json.dump({"name": "device-1"}, f)
+        with open(os.path.join(legacy_dir, "broken.json"), "w") as f:
+            f.write("{")
+        self.assertEquals(self.store.import_files("entity", legacy_dir), 1)
+        self.assertEquals(self.store.items("entity"), [("uuid-1", {"name": "device-1"})])
+        self.assertFalse(self.store.has_changes("entity"))
+
+if __name__ == '__main__':
+    unittest.main()
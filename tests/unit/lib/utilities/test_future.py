@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import threading
+import unittest
+
+from liota.lib.utilities.future import Future, FutureTimeoutError, CompletionExecutor, wait_all, gather, \
+    call_in_parallel
+
+
+class FutureTest(unittest.TestCase):
+
+    def test_result_set_from_other_thread(self):
+        future = Future()
+        threading.Timer(0.01, future.set_result, [42]).start()
+        self.assertEquals(future.result(1), 42)
+        self.assertTrue(future.done())
+
+    def test_result_timeout(self):
+        self.assertRaises(FutureTimeoutError, lambda: Future().result(0.01))
+
+    def test_exception_is_reraised(self):
+        future = Future()
+        future.set_exception(ValueError("failed"))
+        self.assertRaises(ValueError, future.result)
+        self.assertTrue(isinstance(future.exception(), ValueError))
+
+    def test_result_is_set_only_once(self):
+        future = Future()
+        self.assertTrue(future.set_result(1))
+        self.assertFalse(future.set_result(2))
+        self.assertEquals(future.result(), 1)
+
+    def test_done_callback(self):
+        calls = []
+        future = Future()
+        future.add_done_callback(lambda f: calls.append(f.result()))
+        future.set_result("done")
+        # Callbacks added after completion run immediately
+        future.add_done_callback(lambda f: calls.append(f.result()))
+        self.assertEquals(calls, ["done", "done"])
+
+    def test_wait_all_returns_pending(self):
+        done, pending = Future(), Future()
+        done.set_result(None)
+        self.assertEquals(wait_all([done, pending], 0.01), [pending])
+
+    def test_completion_executor(self):
+        executor = CompletionExecutor(2)
+        self.assertEquals(executor.submit(lambda a, b: a + b, 1, b=2).result(1), 3)
+        self.assertRaises(ZeroDivisionError, executor.submit(lambda: 1 / 0).result, 1)
+
+    def test_gather(self):
+        futures = [Future(), Future()]
+        combined = gather(futures)
+        futures[1].set_result(2)
+        self.assertFalse(combined.done())
+        futures[0].set_result(1)
+        self.assertEquals(combined.result(0), [1, 2])
+        failed = Future()
+        failed.set_exception(ValueError("failed"))
+        self.assertRaises(ValueError, gather([futures[0], failed]).result, 0)
+
+    def test_call_in_parallel(self):
+        barrier = threading.Event()
+
+        def wait():
+            return barrier.wait(1)
+
+        def fail():
+            raise ValueError("failed")
+        futures = call_in_parallel([wait, wait, barrier.set, fail])
+        self.assertEquals([future.result(1) for future in futures[:3]], [True, True, None])
+        self.assertIsInstance(futures[3].exception(1), ValueError)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import unittest
+
+from liota.lib.utilities.histogram import LatencyHistogram
+
+
+class LatencyHistogramTest(unittest.TestCase):
+
+    def test_snapshot(self):
+        histogram = LatencyHistogram(bounds=(0.01, 0.1, 1))
+        self.assertEquals(histogram.snapshot()["p50"], None)
+        for latency in [0.005] * 50 + [0.05] * 45 + [0.5] * 4 + [3.0]:
+            histogram.record(latency)
+        snapshot = histogram.snapshot()
+        self.assertEquals(snapshot["count"], 100)
+        self.assertAlmostEquals(snapshot["mean"], (0.25 + 2.25 + 2.0 + 3.0) / 100)
+        self.assertEquals(snapshot["max"], 3.0)
+        self.assertEquals((snapshot["p50"], snapshot["p90"], snapshot["p99"]), (0.01, 0.1, 1))
+        self.assertEquals(histogram.percentile(100), 3.0)
+        self.assertEquals(snapshot["buckets"], {0.01: 50, 0.1: 45, 1: 4, "+Inf": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------#
+#  Copyright © 2015-2016 VMware, Inc. All Rights Reserved.                    #
+#                                                                             #
+#  Licensed under the BSD 2-Clause License (the “License”); you may not use   #
+#  this file except in compliance with the License.                           #
+#                                                                             #
+#  The BSD 2-Clause License                                                   #
+#                                                                             #
+#  Redistribution and use in source and binary forms, with or without         #
+#  modification, are permitted provided that the following conditions are met:#
+#                                                                             #
+#  - Redistributions of source code must retain the above copyright notice,   #
+#      this list of conditions and the following disclaimer.                  #
+#                                                                             #
+#  - Redistributions in binary form must reproduce the above copyright        #
+#      notice, this list of conditions and the following disclaimer in the    #
+#      documentation and/or other materials provided with the distribution.   #
+#                                                                             #
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"#
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE  #
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE #
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE  #
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR        #
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF       #
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS   #
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN    #
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)    #
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF     #
+#  THE POSSIBILITY OF SUCH DAMAGE.                                            #
+# ----------------------------------------------------------------------------#
+
+import unittest
+
+from liota.lib.utilities import serialization
+from liota.lib.utilities.serialization import get_codec, Codec, JsonCodec
+
+PAYLOAD = {
+    "type": "add_stats",
+    "version": 20171118,
+    "body": {
+        "id": "device-1",
+        "metric_data": [{"statKey": "temperature", "timestamps": [1500000000000, 1500000005000],
+                         "data": [21.5, 22.0]}]
+    }
+}
+
+
+class SerializationTest(unittest.TestCase):
+
+    def assertRoundTrip(self, codec):
+        self.assertEquals(codec.decode(codec.encode(PAYLOAD)), PAYLOAD)
+
+    def test_default_codec_is_json(self):
+        codec = get_codec()
+        self.assertTrue(isinstance(codec, JsonCodec))
+        self.assertFalse(codec.binary)
+        self.assertRoundTrip(codec)
+
+    def test_codec_object_is_used_as_is(self):
+        codec = JsonCodec()
+        self.assertTrue(get_codec(codec) is codec)
+
+    def test_unknown_codec(self):
+        self.assertRaises(ValueError, get_codec, "xml")
+
+    def test_codec_is_abstract(self):
+        self.assertRaises(TypeError, Codec)
+
+    def test_fast_json(self):
+        self.assertRoundTrip(get_codec("fast_json"))
+
+    @unittest.skipIf(serialization.msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        self.assertRoundTrip(get_codec("msgpack"))
+
+    @unittest.skipIf(serialization.cbor2 is None, "cbor2 is not installed")
+    def test_cbor(self):
+        self.assertRoundTrip(get_codec("cbor"))
+
+    @unittest.skipIf(serialization.msgpack is not None, "msgpack is installed")
+    def test_msgpack_missing(self):
+        self.assertRaises(ValueError, get_codec, "msgpack")
+
+
+if __name__ == '__main__':
+    unittest.main()